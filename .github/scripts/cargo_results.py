@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Convert ``cargo test`` output into a pytest-json-report compatible structure.
+
+The output is read one line at a time. Both libtest JSON events
+(``-- --format json``) and the plain ``test name ... ok`` lines of a stable
+toolchain are understood. cargo announces each test binary before running
+it, e.g. ``Running unittests src/lib.rs (target/debug/deps/foo-1a2b...)`` or
+``Doc-tests foo``. Tests are scoped by that binary and its source, so
+identically named tests in different crates or targets stay apart::
+
+    foo:src/lib.rs::tests::parses_empty_input
+    foo:tests/cli.rs::parses_empty_input
+    foo:doc::src/lib.rs - parse (line 12)
+
+Per-test ``exec_time`` (``--report-time``) becomes the test duration. Tests
+that started but never finished, because the binary crashed or the run was
+killed, are reported as errors.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import results_format
+
+# Captured test output kept per failure; the panic message comes first.
+MAX_LONGREPR = 16384
+IGNORED_REASON = "Test marked with #[ignore]"
+UNFINISHED_REASON = "Test started but did not finish"
+
+_RUNNING = re.compile(
+    r"^\s*Running\s+(?:unittests\s+)?(?:(?P<source>\S+)\s+\((?P<path>[^)]+)\)"
+    r"|(?P<bare>\S+))\s*$"
+)
+_DOC_TESTS = re.compile(r"^\s*Doc-tests\s+(?P<crate>\S+)\s*$")
+_TEXT_RESULT = re.compile(
+    r"^test (?P<name>.+?) \.\.\. (?P<result>ok|FAILED|ignored|bench:.*?)"
+    r"(?:, (?P<reason>.*?))?(?: <(?P<time>[0-9.]+)s>)?\s*$"
+)
+# cargo appends a metadata hash to the file names of test binaries.
+_HASH_SUFFIX = re.compile(r"-[0-9a-f]{16}$")
+_EVENT_OUTCOMES = {"ok": "passed", "failed": "failed", "ignored": "skipped"}
+_TEXT_OUTCOMES = {"ok": "passed", "FAILED": "failed", "ignored": "skipped"}
+
+Record = Dict[str, object]
+
+
+def binary_scope(path: str, source: Optional[str] = None) -> str:
+    """``crate:source`` for a test binary path such as ``deps/foo-<hash>``."""
+    name = Path(path.replace("\\", "/")).name
+    if name.endswith(".exe"):
+        name = name[: -len(".exe")]
+    name = _HASH_SUFFIX.sub("", name)
+    return f"{name}:{source}" if source else name
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_LONGREPR:
+        return text
+    return text[:MAX_LONGREPR] + "\n... (output truncated)"
+
+
+class CargoTestParser:
+    """Collects test results from ``cargo test`` output fed line by line."""
+
+    def __init__(self) -> None:
+        self.scope = ""
+        self.tests: Dict[str, Record] = {}
+        self._running: Dict[str, None] = {}
+
+    def nodeid(self, name: str) -> str:
+        return f"{self.scope}::{name}" if self.scope else name
+
+    def _enter(self, scope: str) -> None:
+        self._abandon()
+        self.scope = scope
+
+    def _abandon(self) -> None:
+        # Tests of the previous binary that never reported a result.
+        for nodeid in self._running:
+            self.tests[nodeid] = {
+                "nodeid": nodeid,
+                "outcome": "error",
+                "longrepr": UNFINISHED_REASON,
+            }
+        self._running.clear()
+
+    def _record(
+        self,
+        name: str,
+        outcome: str,
+        duration: Optional[float] = None,
+        longrepr: Optional[str] = None,
+    ) -> None:
+        nodeid = self.nodeid(name)
+        self._running.pop(nodeid, None)
+        record: Record = {"nodeid": nodeid, "outcome": outcome}
+        if duration is not None:
+            record["duration"] = duration
+        if longrepr:
+            record["longrepr"] = _truncate(longrepr)
+        # A retried test reports again; the last result counts.
+        self.tests.pop(nodeid, None)
+        self.tests[nodeid] = record
+
+    def feed(self, line: str) -> None:
+        stripped = line.strip()
+        if stripped.startswith("{"):
+            try:
+                event = json.loads(stripped)
+            except json.JSONDecodeError:
+                return
+            if isinstance(event, dict):
+                self._event(event)
+            return
+
+        running = _RUNNING.match(line)
+        if running:
+            path = running.group("path") or running.group("bare")
+            self._enter(binary_scope(path, running.group("source")))
+            return
+        doc_tests = _DOC_TESTS.match(line)
+        if doc_tests:
+            self._enter(f"{doc_tests.group('crate')}:doc")
+            return
+        result = _TEXT_RESULT.match(line.rstrip("\r\n"))
+        if result:
+            outcome = _TEXT_OUTCOMES.get(result.group("result"), "passed")
+            time = result.group("time")
+            reason = result.group("reason")
+            if outcome == "skipped":
+                reason = reason or IGNORED_REASON
+            self._record(
+                result.group("name"),
+                outcome,
+                float(time) if time else None,
+                reason if outcome == "skipped" else None,
+            )
+
+    def _event(self, event: Dict[str, object]) -> None:
+        kind = event.get("type")
+        name = str(event.get("name") or "")
+        action = event.get("event")
+        if kind == "suite":
+            if action == "started":
+                self._abandon()
+            return
+        if not name:
+            return
+        if kind == "bench":
+            self._record(name, "passed")
+            return
+        if kind != "test":
+            return
+        if action == "started":
+            self._running[self.nodeid(name)] = None
+            return
+        outcome = _EVENT_OUTCOMES.get(str(action))
+        if outcome is None:
+            # e.g. "timeout", a warning that the test is still running.
+            return
+        exec_time = event.get("exec_time")
+        duration = float(exec_time) if isinstance(exec_time, (int, float)) else None
+        if outcome == "skipped":
+            longrepr = str(event.get("message") or IGNORED_REASON)
+        else:
+            longrepr = str(event.get("stdout") or event.get("message") or "")
+        self._record(name, outcome, duration, longrepr)
+
+    def finish(self) -> List[Record]:
+        self._abandon()
+        return list(self.tests.values())
+
+
+def parse_lines(lines: Iterable[str]) -> List[Record]:
+    parser = CargoTestParser()
+    for line in lines:
+        parser.feed(line)
+    return parser.finish()
+
+
+def convert(path: Path) -> Dict[str, object]:
+    tests: List[Record] = []
+    if path.exists():
+        with path.open("r", encoding="utf-8", errors="replace") as handle:
+            tests = parse_lines(handle)
+
+    counts: Dict[str, int] = {}
+    for test in tests:
+        outcome = str(test["outcome"])
+        counts[outcome] = counts.get(outcome, 0) + 1
+    summary = {
+        "total": len(tests),
+        "passed": counts.get("passed", 0),
+        "failed": counts.get("failed", 0),
+        "skipped": counts.get("skipped", 0),
+    }
+    if counts.get("error"):
+        summary["error"] = counts["error"]
+    return {
+        "summary": summary,
+        "tests": tests,
+        "exitcode": 0 if not (summary["failed"] or counts.get("error")) else 1,
+    }
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path, help="Captured cargo test output.")
+    parser.add_argument("output", type=Path, help="Destination JSON file.")
+    parser.add_argument(
+        "--compact-output",
+        type=Path,
+        default=None,
+        help="Optional path to also write the results in the compact layout.",
+    )
+    parser.add_argument(
+        "--legacy-output",
+        type=Path,
+        default=None,
+        help="Optional path to also write the results as test_data.json.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+
+    report = convert(args.input)
+
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compact_output or args.legacy_output:
+        table = results_format.from_report(report)
+        if args.compact_output:
+            results_format.write(table, args.compact_output)
+        if args.legacy_output:
+            args.legacy_output.write_text(
+                json.dumps(table.legacy(), indent=2), encoding="utf-8"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""Detect and convert test result files of any supported format.
+
+Each format registered in ``CONVERTERS`` pairs a sniffer, which looks only at
+the first ``HEAD_BYTES`` of a file, with a converter that returns a
+``results_format.ResultsTable``. The converters are the existing per-format
+modules:
+
+``results-stream``  JSON Lines written by ``results_stream.py``
+``trx``             Visual Studio TRX (``trx_to_pytest_json.py``)
+``junit``           JUnit XML from CTest, GoogleTest and others
+                    (``junit_results.py``)
+``cargo``           ``cargo test`` output, JSON events or text
+                    (``cargo_results.py``)
+``ctest``           CTest console output (``junit_results.py``)
+``jest``            Jest and Storybook test-runner JSON
+                    (``storybook_results_to_standard_json.py``)
+``pytest-json``     pytest-json-report files and the unittest helper's
+                    output, which shares their layout
+``normalised``      ``test_data.json`` or the compact layout
+
+``convert`` takes files and directories of mixed artifacts, converts them
+concurrently in a process pool and writes each in the compact layout, so a
+repository with several projects is converted in one step.
+
+With ``--output`` instead of ``--output-dir`` it writes the results of one
+test run: the first input holding any tests is used, so later inputs act as
+fallbacks. That file can also be written as ``test_data.json``, combined
+with warnings and deselected tests collected by other steps, and its counts
+appended to the step's GitHub outputs; the test workflows extract their
+results this way.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import re
+import sys
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+import cargo_results
+import junit_results
+import results_format
+import results_stream
+import storybook_results_to_standard_json as storybook_results
+import test_warnings
+import trx_to_pytest_json
+import worker_sizing
+
+HEAD_BYTES = 64 * 1024
+
+_CARGO_EVENT = re.compile(r'^\{\s*"type"\s*:\s*"(?:suite|test|bench)"', re.M)
+_CARGO_TEXT = re.compile(r"^\s*(?:Running|Doc-tests)\s|^running \d+ tests?$", re.M)
+_CTEST_TEXT = re.compile(r"^\s*\d+/\d+\s+Test\s+#\d+:", re.M)
+# Compiler warnings kept from build logs given with --warning-log.
+MAX_LOG_WARNINGS = 100
+# GitHub outputs written with --github-output: name and status counted.
+COUNT_OUTPUTS = (
+    ("failing_count", "failed"),
+    ("error_count", "error"),
+    ("skipped_count", "skipped"),
+    ("xfailed_count", "xfailed"),
+    ("xpassed_count", "xpassed"),
+)
+
+
+class ConversionError(ValueError):
+    """Raised when a file matches no registered format."""
+
+
+class Converter(NamedTuple):
+    name: str
+    sniff: Callable[[Path, str], bool]
+    convert: Callable[[Path], results_format.ResultsTable]
+
+
+def read_head(path: Path) -> str:
+    with path.open("rb") as handle:
+        head = handle.read(HEAD_BYTES)
+    return head.decode("utf-8", errors="replace").lstrip("\ufeff \t\r\n")
+
+
+def _is_xml(head: str) -> bool:
+    return head.startswith("<")
+
+
+def _convert_trx(path: Path) -> results_format.ResultsTable:
+    return trx_to_pytest_json.compact_table(trx_to_pytest_json.convert_trx(path))
+
+
+def _convert_junit(path: Path) -> results_format.ResultsTable:
+    parsed = junit_results.parse_file(str(path))
+    if parsed.error:
+        raise ConversionError(parsed.error)
+    return results_format.from_report({"tests": junit_results.merge([parsed])})
+
+
+def _convert_cargo(path: Path) -> results_format.ResultsTable:
+    return results_format.from_report(cargo_results.convert(path))
+
+
+def _convert_ctest(path: Path) -> results_format.ResultsTable:
+    return results_format.from_report({"tests": junit_results.read_ctest_output(path)})
+
+
+def report_table(report: Mapping[str, object]) -> results_format.ResultsTable:
+    """Table of a pytest-json-report payload, warnings included."""
+    table = results_format.from_report(report)
+    warnings = report.get("warnings")
+    if not isinstance(warnings, list):
+        warnings = []
+    plain = [str(item) for item in warnings if not isinstance(item, dict)]
+    structured = test_warnings.keys(test_warnings.from_report(report) or [])
+    table.warnings = sorted(set(plain) | set(structured))
+    return table
+
+
+def read_report(path: Path) -> Dict[str, object]:
+    report = json.loads(path.read_text(encoding="utf-8") or "{}")
+    if not isinstance(report, dict):
+        raise ConversionError("not a pytest-json-report object")
+    return report
+
+
+def _convert_pytest_json(path: Path) -> results_format.ResultsTable:
+    return report_table(read_report(path))
+
+
+# Sniffed in this order; the first match wins.
+CONVERTERS: List[Converter] = [
+    Converter(
+        "results-stream",
+        lambda path, head: results_stream.is_stream(path),
+        results_stream.read_table,
+    ),
+    Converter(
+        "trx",
+        lambda path, head: _is_xml(head) and "<TestRun" in head,
+        _convert_trx,
+    ),
+    Converter(
+        "junit",
+        lambda path, head: _is_xml(head) and "<testsuite" in head,
+        _convert_junit,
+    ),
+    Converter(
+        "cargo",
+        lambda path, head: bool(_CARGO_EVENT.search(head) or _CARGO_TEXT.search(head)),
+        _convert_cargo,
+    ),
+    Converter(
+        "ctest",
+        lambda path, head: bool(_CTEST_TEXT.search(head)),
+        _convert_ctest,
+    ),
+    Converter(
+        "normalised",
+        lambda path, head: head.startswith("{")
+        and (f'"{results_format.FORMAT}"' in head or '"passing_tests"' in head),
+        results_format.read,
+    ),
+    Converter(
+        "jest",
+        lambda path, head: head.startswith("{")
+        and ('"testResults"' in head or '"numTotalTests"' in head),
+        storybook_results.load_table,
+    ),
+    Converter(
+        "pytest-json",
+        lambda path, head: head.startswith("{")
+        and '"nodeid"' in head
+        and ('"tests"' in head or '"summary"' in head),
+        _convert_pytest_json,
+    ),
+]
+REGISTRY: Dict[str, Converter] = {converter.name: converter for converter in CONVERTERS}
+
+
+def detect(path: Path) -> Optional[Converter]:
+    head = read_head(path)
+    for converter in CONVERTERS:
+        if converter.sniff(path, head):
+            return converter
+    return None
+
+
+class Converted(NamedTuple):
+    path: str
+    format: Optional[str]
+    payload: Optional[Dict[str, object]]
+    error: Optional[str]
+
+
+def convert_file(path: str, format_name: Optional[str] = None) -> Converted:
+    """Convert one file; errors are returned so one bad file spares the batch."""
+    try:
+        converter = REGISTRY[format_name] if format_name else detect(Path(path))
+        if converter is None:
+            return Converted(path, None, None, None)
+        table = converter.convert(Path(path))
+    except (OSError, ValueError) as exc:
+        message = str(exc)
+        if not message.startswith(path):
+            message = f"{path}: {message}"
+        return Converted(path, format_name or "unknown", None, message)
+    return Converted(path, converter.name, table.to_payload(), None)
+
+
+def find_files(inputs: Iterable[Path]) -> List[Path]:
+    files: List[Path] = []
+    for entry in inputs:
+        if entry.is_dir():
+            files.extend(path for path in sorted(entry.rglob("*")) if path.is_file())
+        elif entry.is_file():
+            files.append(entry)
+    return files
+
+
+def convert_files(
+    paths: Sequence[Path], workers: int, format_name: Optional[str] = None
+) -> List[Converted]:
+    """Convert ``paths`` concurrently; results keep the order of ``paths``."""
+    names = [str(path) for path in paths]
+    formats = [format_name] * len(names)
+    workers = min(workers, len(names))
+    if workers <= 1:
+        return [convert_file(name, format_name) for name in names]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(convert_file, names, formats))
+
+
+def output_names(paths: Sequence[Path], inputs: Sequence[Path]) -> List[Path]:
+    """Destinations relative to the input each file was found under."""
+    roots = [entry for entry in inputs if entry.is_dir()]
+    names: List[Path] = []
+    taken = set()
+    for path in paths:
+        root = next((r for r in roots if r in path.parents), None)
+        name = path.relative_to(root) if root else Path(path.name)
+        name = name.with_name(f"{name.name}.compact.json")
+        candidate, index = name, 1
+        while candidate in taken:
+            candidate = name.with_name(f"{name.stem}-{index}{name.suffix}")
+            index += 1
+        taken.add(candidate)
+        names.append(candidate)
+    return names
+
+
+def log_warnings(paths: Sequence[Path]) -> List[str]:
+    """Compiler warning lines of the build logs that exist."""
+    warnings: List[str] = []
+    for path in paths:
+        try:
+            with path.open(encoding="utf-8", errors="replace") as handle:
+                for line in handle:
+                    lowered = line.lower()
+                    if "warning:" in lowered and "error:" not in lowered:
+                        warnings.append(line.strip())
+                        if len(warnings) == MAX_LOG_WARNINGS:
+                            return warnings
+        except FileNotFoundError:
+            continue
+    return warnings
+
+
+def _read_json(path: Optional[Path]) -> object:
+    """Contents of an optional input written by an earlier step, or None."""
+    if path is None:
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except ValueError as exc:
+        print(f"::warning::Ignoring {path}: {exc}", file=sys.stderr)
+        return None
+
+
+def output_counts(table: results_format.ResultsTable) -> Dict[str, str]:
+    groups = table.by_status()
+    total = len(table)
+    passed = len(groups["passed"])
+    percentage = passed / total * 100 if total else 0.0
+    counts = {
+        "total": str(total),
+        "passed": str(passed),
+        "percentage": f"{percentage:.2f}",
+    }
+    for name, status in COUNT_OUTPUTS:
+        counts[name] = str(len(groups[status]))
+    return counts
+
+
+def _detect_command(args: argparse.Namespace) -> int:
+    for path in args.files:
+        converter = detect(path)
+        print(f"{path}\t{converter.name if converter else 'unknown'}")
+    return 0
+
+
+def _convert_run(args: argparse.Namespace, results: Sequence[Converted]) -> int:
+    """Write the results of one run to ``args.output`` and its companions."""
+    failed = False
+    chosen = None
+    for result in results:
+        if result.error:
+            failed = True
+            print(f"::warning::Could not convert {result.error}", file=sys.stderr)
+        elif result.payload is not None and (
+            chosen is None or (result.payload["ids"] and not chosen.payload["ids"])
+        ):
+            chosen = result
+    if chosen is None:
+        print("::warning::No test results found; reporting an empty run.")
+        table = results_format.ResultsTable()
+    else:
+        table = results_format.ResultsTable.from_payload(chosen.payload)
+        print(f"Using {chosen.path} ({chosen.format})")
+
+    extracted = _read_json(args.warnings)
+    details = []
+    if isinstance(extracted, dict):
+        table.warnings = [str(item) for item in extracted.get("warnings") or []]
+        details = extracted.get("details") or []
+    table.warnings.extend(log_warnings(args.warning_log))
+    deselected = _read_json(args.deselected)
+    if isinstance(deselected, list):
+        table.deselected = [str(item) for item in deselected]
+
+    results_format.write(table, args.output)
+    if args.legacy_output:
+        legacy = table.legacy()
+        if details:
+            legacy["warning_details"] = details
+        args.legacy_output.write_text(json.dumps(legacy, indent=2), encoding="utf-8")
+
+    counts = output_counts(table)
+    percentage = float(counts["percentage"])
+    print(f"Results: {counts['passed']}/{counts['total']} ({percentage:.1f}%)")
+    if args.github_output:
+        with args.github_output.open("a", encoding="utf-8") as handle:
+            handle.writelines(f"{name}={value}\n" for name, value in counts.items())
+    return 1 if failed and args.strict else 0
+
+
+def _convert_command(args: argparse.Namespace) -> int:
+    files = find_files(args.inputs)
+    workers = args.workers or worker_sizing.cpu_limit()
+    results = convert_files(files, workers, args.format)
+    if args.output:
+        return _convert_run(args, results)
+    destinations = output_names(files, args.inputs)
+
+    summary = []
+    failed = False
+    for result, destination in zip(results, destinations):
+        if result.error:
+            failed = True
+            print(f"::warning::Could not convert {result.error}", file=sys.stderr)
+            continue
+        if result.payload is None:
+            if Path(result.path) in args.inputs:
+                print(f"::warning::{result.path} is not a known results format")
+            continue
+        target = args.output_dir / destination
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(
+            json.dumps(result.payload, separators=(",", ":")), encoding="utf-8"
+        )
+        tests = len(result.payload["ids"])  # type: ignore[arg-type]
+        print(f"{result.path} ({result.format}): {tests} test(s) -> {target}")
+        summary.append(
+            {
+                "input": result.path,
+                "format": result.format,
+                "output": str(target),
+                "tests": tests,
+            }
+        )
+
+    if args.summary:
+        args.summary.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return 1 if failed and args.strict else 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    detect_parser = commands.add_parser("detect", help="Print the format of files.")
+    detect_parser.add_argument("files", type=Path, nargs="+")
+    detect_parser.set_defaults(handler=_detect_command)
+
+    convert = commands.add_parser(
+        "convert", help="Convert files and directories to the compact layout."
+    )
+    convert.add_argument("inputs", type=Path, nargs="+")
+    destination = convert.add_mutually_exclusive_group(required=True)
+    destination.add_argument("--output-dir", type=Path)
+    destination.add_argument(
+        "--output",
+        type=Path,
+        help="Write the first input holding tests as the results of one run.",
+    )
+    convert.add_argument(
+        "--format",
+        choices=sorted(REGISTRY),
+        default=None,
+        help="Skip detection and read every file as this format.",
+    )
+    convert.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Converter processes; defaults to the CPUs the job may use.",
+    )
+    convert.add_argument(
+        "--summary", type=Path, default=None, help="Optional JSON list of outputs."
+    )
+    convert.add_argument(
+        "--strict",
+        action="store_true",
+        help="Fail when a recognised file cannot be converted.",
+    )
+    run = convert.add_argument_group("with --output")
+    run.add_argument(
+        "--legacy-output",
+        type=Path,
+        default=None,
+        help="Also write the results as test_data.json.",
+    )
+    run.add_argument(
+        "--warnings",
+        type=Path,
+        default=None,
+        help="Warnings extracted by test_warnings.py, replacing the report's.",
+    )
+    run.add_argument(
+        "--warning-log",
+        type=Path,
+        action="append",
+        default=[],
+        help="Build log whose compiler warnings are added; may be repeated.",
+    )
+    run.add_argument(
+        "--deselected",
+        type=Path,
+        default=None,
+        help="JSON list of tests deliberately not run.",
+    )
+    run.add_argument(
+        "--github-output",
+        type=Path,
+        default=None,
+        help="Append the test counts to this GitHub output file.",
+    )
+    convert.set_defaults(handler=_convert_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except OSError as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
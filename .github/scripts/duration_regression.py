@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""Flag tests whose runtime grew against the baseline.
+
+A test regresses when its current duration exceeds the baseline by more than
+both an absolute floor and a relative threshold. With several baseline
+samples the baseline is their median and the allowance also covers the
+observed spread, so a test that is always noisy needs a larger jump before
+it is flagged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+import json
+import sqlite3
+import statistics
+import sys
+from contextlib import closing
+from operator import itemgetter
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+import results_format
+import results_stream
+
+DEFAULT_RELATIVE_THRESHOLD = 0.5
+DEFAULT_ABSOLUTE_THRESHOLD = 1.0
+DEFAULT_NOISE_FACTOR = 3.0
+# Scales the median absolute deviation to a standard deviation estimate for
+# normally distributed noise.
+MAD_SCALE = 1.4826
+
+Durations = Dict[str, float]
+
+
+class DurationRegression(NamedTuple):
+    test: str
+    baseline: float
+    current: float
+    allowance: float
+    samples: int
+
+    @property
+    def growth(self) -> float:
+        return self.current - self.baseline
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "test": self.test,
+            "baseline": round(self.baseline, 6),
+            "current": round(self.current, 6),
+            "allowance": round(self.allowance, 6),
+            "samples": self.samples,
+        }
+
+
+def durations_from_payload(raw: object) -> Durations:
+    """Per-test seconds from either results layout; empty if none recorded."""
+    if results_format.is_compact(raw):
+        try:
+            return results_format.ResultsTable.from_payload(raw).duration_map()
+        except results_format.ResultsFormatError:
+            return {}
+    if not isinstance(raw, dict):
+        return {}
+
+    durations: Durations = {}
+    tests = raw.get("tests")
+    if isinstance(tests, list):
+        for entry in tests:
+            if not isinstance(entry, dict):
+                continue
+            test_id = entry.get("id") or entry.get("name") or entry.get("nodeid")
+            seconds = entry.get("duration")
+            if test_id and isinstance(seconds, (int, float)):
+                durations[str(test_id)] = float(seconds)
+    recorded = raw.get(results_format.LEGACY_DURATIONS)
+    if isinstance(recorded, dict):
+        for test_id, seconds in recorded.items():
+            if isinstance(seconds, (int, float)):
+                durations[str(test_id)] = float(seconds)
+    return durations
+
+
+def load_durations(path: Path) -> Durations:
+    if results_stream.is_stream(path):
+        return results_stream.read_table(path).duration_map()
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8") or "{}")
+    except (OSError, json.JSONDecodeError) as exc:
+        print(f"::warning::Could not read durations from {path}: {exc}")
+        return {}
+    return durations_from_payload(raw)
+
+
+def history_samples(
+    connection: sqlite3.Connection,
+    repo: str,
+    branch: str,
+    framework: str,
+    limit: int,
+) -> List[Durations]:
+    """Durations of the newest ``limit`` runs in a result history database."""
+    runs = connection.execute(
+        """
+        SELECT id FROM runs
+        WHERE repo = ? AND branch = ? AND framework = ?
+        ORDER BY recorded_at DESC, id DESC
+        LIMIT ?
+        """,
+        (repo, branch, framework, limit),
+    ).fetchall()
+    samples = []
+    for (run_id,) in runs:
+        rows = connection.execute(
+            """
+            SELECT tests.name, outcomes.duration
+            FROM outcomes JOIN tests ON tests.id = outcomes.test_id
+            WHERE outcomes.run_id = ? AND outcomes.duration IS NOT NULL
+            """,
+            (run_id,),
+        )
+        samples.append(dict(rows))
+    return samples
+
+
+def sample_statistics(values: Sequence[float]) -> Tuple[float, float, int]:
+    """Return ``(median, median absolute deviation, count)`` of ``values``."""
+    centre = statistics.median(values)
+    spread = statistics.median(abs(value - centre) for value in values)
+    return centre, spread, len(values)
+
+
+def allowance(
+    centre: float,
+    spread: float,
+    floor: float,
+    relative_threshold: float,
+    noise_factor: float,
+) -> float:
+    """The largest of the floor, the relative margin and the scaled MADs."""
+    return max(floor, relative_threshold * centre, noise_factor * MAD_SCALE * spread)
+
+
+def join_sorted(
+    baseline_samples: Sequence[Iterable[Tuple[str, float]]],
+    current: Iterable[Tuple[str, float]],
+) -> Iterator[Tuple[str, List[float], float]]:
+    """``(test, baseline values, current value)`` for tests on both sides.
+
+    Every input yields ``(test, value)`` pairs sorted by test, each test at
+    most once. The inputs are merged rather than indexed, so only the values
+    of one test are held at a time.
+    """
+    streams = [
+        ((test, 0, value) for test, value in sample) for sample in baseline_samples
+    ]
+    streams.append((test, 1, value) for test, value in current)
+    for test, group in itertools.groupby(heapq.merge(*streams), key=itemgetter(0)):
+        values = []
+        measured = None
+        for _, side, value in group:
+            if side:
+                measured = value
+            else:
+                values.append(value)
+        if values and measured is not None:
+            yield test, values, measured
+
+
+def find_sorted_regressions(
+    baseline_samples: Sequence[Iterable[Tuple[str, float]]],
+    current: Iterable[Tuple[str, float]],
+    relative_threshold: float = DEFAULT_RELATIVE_THRESHOLD,
+    absolute_threshold: float = DEFAULT_ABSOLUTE_THRESHOLD,
+    noise_factor: float = DEFAULT_NOISE_FACTOR,
+) -> List[DurationRegression]:
+    """``find_regressions`` over inputs sorted as ``join_sorted`` takes them."""
+    regressions = []
+    for test, values, seconds in join_sorted(baseline_samples, current):
+        centre, spread, count = sample_statistics(values)
+        limit = allowance(
+            centre, spread, absolute_threshold, relative_threshold, noise_factor
+        )
+        if seconds > centre + limit:
+            regressions.append(DurationRegression(test, centre, seconds, limit, count))
+    regressions.sort(key=lambda item: (-item.growth, item.test))
+    return regressions
+
+
+def find_regressions(
+    baseline_samples: Sequence[Mapping[str, float]],
+    current: Mapping[str, float],
+    relative_threshold: float = DEFAULT_RELATIVE_THRESHOLD,
+    absolute_threshold: float = DEFAULT_ABSOLUTE_THRESHOLD,
+    noise_factor: float = DEFAULT_NOISE_FACTOR,
+) -> List[DurationRegression]:
+    """Tests slower than their baseline by more than the allowance.
+
+    The allowance is the largest of the absolute floor, the relative
+    threshold times the baseline median and ``noise_factor`` scaled MADs.
+    Tests without a baseline timing are ignored. Results are ordered by
+    growth, largest first.
+    """
+    return find_sorted_regressions(
+        [sorted(sample.items()) for sample in baseline_samples],
+        sorted(current.items()),
+        relative_threshold,
+        absolute_threshold,
+        noise_factor,
+    )
+
+
+def _format_seconds(seconds: float) -> str:
+    return f"{seconds:.3f}s"
+
+
+def write_report_section(
+    handle: TextIO, regressions: Sequence[DurationRegression]
+) -> None:
+    if not regressions:
+        return
+    handle.write(f"DURATION REGRESSIONS ({len(regressions)} tests)\n")
+    handle.write("Slower than the baseline by more than the allowed margin:\n")
+    for idx, item in enumerate(regressions, 1):
+        handle.write(
+            f"  {idx}. {item.test}: {_format_seconds(item.baseline)} -> "
+            f"{_format_seconds(item.current)} "
+            f"(+{_format_seconds(item.growth)}, {item.samples} baseline sample(s))\n"
+        )
+    handle.write("\n")
+
+
+def write_summary_section(
+    handle: TextIO, regressions: Sequence[DurationRegression], max_show: int = 20
+) -> None:
+    if not regressions:
+        return
+    handle.write(f"\n### ⏱️ Duration Regressions ({len(regressions)})\n\n")
+    handle.write("| Test | Baseline | Current | Growth |\n")
+    handle.write("| --- | --- | --- | --- |\n")
+    for item in regressions[:max_show]:
+        handle.write(
+            f"| `{item.test}` | {_format_seconds(item.baseline)} | "
+            f"{_format_seconds(item.current)} | +{_format_seconds(item.growth)} |\n"
+        )
+    if len(regressions) > max_show:
+        handle.write(
+            f"\n... and {len(regressions) - max_show} more (see artifacts for full list)\n"
+        )
+
+
+def add_threshold_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--relative-threshold",
+        type=float,
+        default=DEFAULT_RELATIVE_THRESHOLD,
+        help="Allowed growth as a fraction of the baseline duration.",
+    )
+    parser.add_argument(
+        "--absolute-threshold",
+        type=float,
+        default=DEFAULT_ABSOLUTE_THRESHOLD,
+        help="Allowed growth in seconds, whatever the baseline duration.",
+    )
+    parser.add_argument(
+        "--noise-factor",
+        type=float,
+        default=DEFAULT_NOISE_FACTOR,
+        help="Allowed growth in scaled MADs when several baseline samples exist.",
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Report test duration regressions.")
+    parser.add_argument("current", type=Path, help="Results of the current run.")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        action="append",
+        default=[],
+        help="Baseline results; repeat to use several samples.",
+    )
+    parser.add_argument(
+        "--history",
+        type=Path,
+        default=None,
+        help="Result history database to take baseline samples from.",
+    )
+    parser.add_argument("--repo", default=None)
+    parser.add_argument("--branch", default=None)
+    parser.add_argument("--framework", default=None)
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=10,
+        help="Number of recent history runs used as baseline samples.",
+    )
+    add_threshold_arguments(parser)
+    parser.add_argument(
+        "--output", type=Path, default=None, help="Optional JSON report path."
+    )
+    args = parser.parse_args(argv)
+    if args.history and not (args.repo and args.branch and args.framework):
+        parser.error("--history needs --repo, --branch and --framework")
+    if not args.history and not args.baseline:
+        parser.error("give at least one --baseline or a --history database")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    samples = [load_durations(path) for path in args.baseline]
+    if args.history:
+        try:
+            with closing(sqlite3.connect(str(args.history))) as connection:
+                samples.extend(
+                    history_samples(
+                        connection,
+                        args.repo,
+                        args.branch,
+                        args.framework,
+                        args.samples,
+                    )
+                )
+        except sqlite3.Error as exc:
+            print(f"::error::{exc}", file=sys.stderr)
+            return 1
+
+    regressions = find_regressions(
+        samples,
+        load_durations(args.current),
+        args.relative_threshold,
+        args.absolute_threshold,
+        args.noise_factor,
+    )
+    write_report_section(sys.stdout, regressions)
+    if not regressions:
+        print("✅ No duration regressions detected.")
+    if args.output:
+        args.output.write_text(
+            json.dumps([item.to_json() for item in regressions], indent=2),
+            encoding="utf-8",
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
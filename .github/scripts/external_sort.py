@@ -0,0 +1,202 @@
+"""Sort and collect records on disk when they do not fit in memory.
+
+``ExternalSorter`` buffers records, writes each full buffer sorted to a run
+file and merges the runs lazily, so memory use is bounded by the buffer
+size. ``SpillWriter`` appends strings to a file and returns a
+``SpilledList``, a read-only sequence that reads them back on demand; it
+can stand in for the lists of test IDs the report writers take.
+``dump_json`` writes a payload holding spilled lists as ``json.dumps(...,
+indent=2)`` would, streaming the lists from disk.
+
+Spill files are private to the process that writes them and hold pickled
+batches of records, which is several times faster to write and read back
+than a text encoding.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import pickle
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+    overload,
+)
+
+# Records held in memory before a sorted run is written out.
+DEFAULT_BUFFER_RECORDS = 200_000
+# Runs merged at once; more are merged in rounds to bound open files.
+MAX_FAN_IN = 64
+# Items pickled together in a spill file.
+BATCH_SIZE = 4096
+
+Record = Tuple[Any, ...]
+
+
+def _write_batch(handle: BinaryIO, batch: List[Any]) -> None:
+    pickle.dump(batch, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_items(path: Path) -> Iterator[Any]:
+    with path.open("rb") as handle:
+        while True:
+            try:
+                batch = pickle.load(handle)
+            except EOFError:
+                return
+            yield from batch
+
+
+class ExternalSorter:
+    """Sorts tuples, spilling sorted runs to ``directory``."""
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str = "run",
+        buffer_records: int = DEFAULT_BUFFER_RECORDS,
+    ) -> None:
+        self.directory = directory
+        self.name = name
+        self.buffer_records = buffer_records
+        self._buffer: List[Record] = []
+        self._runs: List[Path] = []
+        self._counter = itertools.count()
+
+    def add(self, record: Record) -> None:
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_records:
+            self._spill()
+
+    def extend(self, records: Iterable[Record]) -> None:
+        for record in records:
+            self.add(record)
+
+    def _run_path(self) -> Path:
+        return self.directory / f"{self.name}-{next(self._counter)}.run"
+
+    def _write_run(self, records: Iterable[Record]) -> Path:
+        path = self._run_path()
+        iterator = iter(records)
+        with path.open("wb") as handle:
+            for batch in iter(lambda: list(itertools.islice(iterator, BATCH_SIZE)), []):
+                _write_batch(handle, batch)
+        return path
+
+    def _spill(self) -> None:
+        self._buffer.sort()
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = []
+
+    def __iter__(self) -> Iterator[Record]:
+        """Yield every record added so far in sorted order."""
+        if not self._runs:
+            yield from sorted(self._buffer)
+            return
+        if self._buffer:
+            self._spill()
+        runs = self._runs
+        while len(runs) > MAX_FAN_IN:
+            merged = []
+            for start in range(0, len(runs), MAX_FAN_IN):
+                group = runs[start : start + MAX_FAN_IN]
+                merged.append(self._write_run(heapq.merge(*map(_read_items, group))))
+                for path in group:
+                    path.unlink()
+            runs = merged
+        self._runs = runs
+        yield from heapq.merge(*map(_read_items, runs))
+
+
+class SpilledList(Sequence[str]):
+    """Strings stored in a spill file, read back on demand."""
+
+    def __init__(self, path: Optional[Path] = None, count: int = 0) -> None:
+        self.path = path
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        if self.path is not None:
+            yield from _read_items(self.path)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+            return list(itertools.islice(self, start, stop, step))
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("SpilledList index out of range")
+        return next(itertools.islice(self, index, None))
+
+    def __repr__(self) -> str:
+        return f"SpilledList({str(self.path)!r}, count={self.count})"
+
+
+class SpillWriter:
+    """Appends strings to ``path``; ``close`` returns them as a SpilledList."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.count = 0
+        self._batch: List[str] = []
+        self._handle: BinaryIO = path.open("wb")
+
+    def append(self, item: str) -> None:
+        self._batch.append(item)
+        self.count += 1
+        if len(self._batch) >= BATCH_SIZE:
+            _write_batch(self._handle, self._batch)
+            self._batch = []
+
+    def close(self) -> SpilledList:
+        if self._batch:
+            _write_batch(self._handle, self._batch)
+            self._batch = []
+        self._handle.close()
+        return SpilledList(self.path, self.count)
+
+
+def _write_value(handle: TextIO, value: object, level: int) -> None:
+    pad = "  " * level
+    if isinstance(value, dict) and value:
+        handle.write("{")
+        for position, (key, item) in enumerate(value.items()):
+            handle.write(("," if position else "") + f"\n{pad}  {json.dumps(key)}: ")
+            _write_value(handle, item, level + 1)
+        handle.write(f"\n{pad}}}")
+    elif isinstance(value, SpilledList) and value:
+        handle.write("[")
+        for position, item in enumerate(value):
+            handle.write(("," if position else "") + f"\n{pad}  {json.dumps(item)}")
+        handle.write(f"\n{pad}]")
+    elif isinstance(value, SpilledList):
+        handle.write("[]")
+    else:
+        handle.write(json.dumps(value, indent=2).replace("\n", f"\n{pad}"))
+
+
+def dump_json(payload: object, path: Path) -> None:
+    """Write ``payload`` like ``json.dumps(payload, indent=2)``."""
+    with path.open("w", encoding="utf-8") as handle:
+        _write_value(handle, payload, 0)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Flakiness scores maintained incrementally on top of the result history.
+
+For every (repo, branch, framework, test) the store keeps running counters:
+how many runs produced a pass or a failure, how many of those failed, how
+often the outcome flipped between consecutive runs, and an exponentially
+weighted failure score. Applying a run touches only the tests in that run.
+
+A test is reported as flaky when it has enough history, flips often, and is
+not simply failing every time now. ``export`` writes those tests in the
+format ``regression_analysis.py --flaky`` reads.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import result_history
+import results_format
+
+FORMAT = "flaky-tests/1"
+
+DEFAULT_ALPHA = 0.2
+DEFAULT_MIN_RUNS = 5
+DEFAULT_MIN_FLIP_RATE = 0.1
+DEFAULT_MAX_FAIL_SCORE = 0.9
+
+_PASS_CODES = tuple(results_format.STATUS_CODES[s] for s in ("passed", "xpassed"))
+_FAIL_CODES = tuple(results_format.STATUS_CODES[s] for s in ("failed", "error"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS flaky_stats (
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    framework TEXT NOT NULL,
+    test_id INTEGER NOT NULL REFERENCES tests (id),
+    runs INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    flips INTEGER NOT NULL,
+    last_failed INTEGER NOT NULL,
+    fail_score REAL NOT NULL,
+    PRIMARY KEY (repo, branch, framework, test_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS flaky_applied (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id) ON DELETE CASCADE
+);
+"""
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    connection = result_history.connect(path)
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def _codes(codes: Sequence[int]) -> str:
+    return ", ".join(str(code) for code in codes)
+
+
+def apply_run(
+    connection: sqlite3.Connection, run_id: int, alpha: float = DEFAULT_ALPHA
+) -> bool:
+    """Fold one run into the counters; returns False if already applied.
+
+    Only passes and failures count; skipped or missing tests leave their
+    counters untouched. Runs must be applied in the order they happened for
+    flips to be meaningful, which :func:`update` takes care of.
+    """
+    with connection:
+        applied = connection.execute(
+            "INSERT OR IGNORE INTO flaky_applied (run_id) VALUES (?)", (run_id,)
+        ).rowcount
+        if not applied:
+            return False
+        connection.execute(
+            f"""
+            INSERT INTO flaky_stats (
+                repo, branch, framework, test_id,
+                runs, failures, flips, last_failed, fail_score
+            )
+            SELECT runs.repo, runs.branch, runs.framework, outcome.test_id,
+                   1, failed, 0, failed, failed
+            FROM (
+                SELECT run_id, test_id,
+                       status IN ({_codes(_FAIL_CODES)}) AS failed
+                FROM outcomes
+                WHERE run_id = :run_id
+                  AND status IN ({_codes(_PASS_CODES + _FAIL_CODES)})
+            ) AS outcome
+            JOIN runs ON runs.id = outcome.run_id
+            WHERE true
+            ON CONFLICT (repo, branch, framework, test_id) DO UPDATE SET
+                runs = runs + 1,
+                failures = failures + excluded.failures,
+                flips = flips + (last_failed != excluded.last_failed),
+                last_failed = excluded.last_failed,
+                fail_score = fail_score * (1 - :alpha) + excluded.fail_score * :alpha
+            """,
+            {"run_id": run_id, "alpha": alpha},
+        )
+    return True
+
+
+def update(
+    connection: sqlite3.Connection,
+    repo: str,
+    branch: str,
+    framework: str,
+    alpha: float = DEFAULT_ALPHA,
+) -> int:
+    """Apply every not-yet-applied run for the key, oldest first."""
+    pending = connection.execute(
+        """
+        SELECT id FROM runs
+        WHERE repo = ? AND branch = ? AND framework = ?
+          AND id NOT IN (SELECT run_id FROM flaky_applied)
+        ORDER BY recorded_at, id
+        """,
+        (repo, branch, framework),
+    ).fetchall()
+    return sum(apply_run(connection, run_id, alpha) for (run_id,) in pending)
+
+
+def flaky_tests(
+    connection: sqlite3.Connection,
+    repo: str,
+    branch: str,
+    framework: str,
+    min_runs: int = DEFAULT_MIN_RUNS,
+    min_flip_rate: float = DEFAULT_MIN_FLIP_RATE,
+    max_fail_score: float = DEFAULT_MAX_FAIL_SCORE,
+) -> Dict[str, Dict[str, float]]:
+    """Return scores for the tests currently considered flaky."""
+    rows = connection.execute(
+        """
+        SELECT tests.name, runs, failures, flips, fail_score
+        FROM flaky_stats JOIN tests ON tests.id = flaky_stats.test_id
+        WHERE repo = ? AND branch = ? AND framework = ?
+          AND runs >= ? AND flips > 0
+          AND CAST(flips AS REAL) / (runs - 1) >= ?
+          AND fail_score <= ?
+        ORDER BY tests.name
+        """,
+        (repo, branch, framework, max(min_runs, 2), min_flip_rate, max_fail_score),
+    )
+    return {
+        name: {
+            "runs": runs,
+            "flip_rate": round(flips / (runs - 1), 4),
+            "failure_rate": round(failures / runs, 4),
+            "fail_score": round(fail_score, 4),
+        }
+        for name, runs, failures, flips, fail_score in rows
+    }
+
+
+def load_flaky(path: Path) -> Dict[str, Dict[str, float]]:
+    """Read an exported flaky list; missing or invalid files yield nothing."""
+    if not path.exists():
+        print(f"::warning::Flaky test list {path} not found.")
+        return {}
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8") or "{}")
+    except json.JSONDecodeError as exc:
+        print(f"::warning::Failed to parse flaky test list {path}: {exc}")
+        return {}
+    tests = payload.get("tests") if isinstance(payload, dict) else None
+    if not isinstance(tests, dict) or payload.get("format") != FORMAT:
+        print(f"::warning::{path} is not a {FORMAT} file.")
+        return {}
+    return {str(name): info for name, info in tests.items()}
+
+
+def _update_command(args: argparse.Namespace) -> int:
+    with closing(connect(args.database)) as connection:
+        applied = update(connection, args.repo, args.branch, args.framework, args.alpha)
+    print(f"Applied {applied} run(s) to flakiness scores")
+    return 0
+
+
+def _export_command(args: argparse.Namespace) -> int:
+    with closing(connect(args.database)) as connection:
+        tests = flaky_tests(
+            connection,
+            args.repo,
+            args.branch,
+            args.framework,
+            min_runs=args.min_runs,
+            min_flip_rate=args.min_flip_rate,
+            max_fail_score=args.max_fail_score,
+        )
+    payload = {
+        "format": FORMAT,
+        "repo": args.repo,
+        "branch": args.branch,
+        "framework": args.framework,
+        "tests": tests,
+    }
+    args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    print(f"Exported {len(tests)} flaky test(s) to {args.output}")
+    return 0
+
+
+def _add_key_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--repo", required=True)
+    parser.add_argument("--branch", required=True)
+    parser.add_argument("--framework", required=True)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain flaky test scores.")
+    parser.add_argument("database", type=Path, help="Result history database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = commands.add_parser(
+        "update", help="Fold newly ingested runs into the scores."
+    )
+    _add_key_arguments(update_parser)
+    update_parser.add_argument(
+        "--alpha",
+        type=float,
+        default=DEFAULT_ALPHA,
+        help="Weight of the newest run in the failure score.",
+    )
+    update_parser.set_defaults(handler=_update_command)
+
+    export_parser = commands.add_parser("export", help="Write the flaky test list.")
+    _add_key_arguments(export_parser)
+    export_parser.add_argument("--output", type=Path, required=True)
+    export_parser.add_argument("--min-runs", type=int, default=DEFAULT_MIN_RUNS)
+    export_parser.add_argument(
+        "--min-flip-rate", type=float, default=DEFAULT_MIN_FLIP_RATE
+    )
+    export_parser.add_argument(
+        "--max-fail-score",
+        type=float,
+        default=DEFAULT_MAX_FAIL_SCORE,
+        help="Tests failing more consistently than this are not flaky, just broken.",
+    )
+    export_parser.set_defaults(handler=_export_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, sqlite3.Error, result_history.HistoryError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
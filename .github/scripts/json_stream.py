@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""Incremental JSON parsing for result documents too large to load at once."""
+
+from __future__ import annotations
+
+import json
+import re
+from json.decoder import scanstring
+from pathlib import Path
+from typing import (
+    Callable,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]*")
+_LITERALS: Tuple[Tuple[str, object], ...] = (
+    ("true", True),
+    ("false", False),
+    ("null", None),
+)
+
+START_EVENTS = frozenset(("start_map", "start_array"))
+END_EVENTS = frozenset(("end_map", "end_array"))
+
+Event = Tuple[str, object]
+
+_MISSING = object()
+
+
+class JSONStreamError(ValueError):
+    """Raised when the streamed document is not valid JSON."""
+
+    def __init__(self, message: str, position: int) -> None:
+        super().__init__(f"{message} (char {position})")
+        self.position = position
+
+
+class _Reader:
+    """Sliding window over a text stream.
+
+    Consumed text is discarded whenever more input is needed, so the window
+    only ever holds the token being parsed plus one chunk of look-ahead.
+    """
+
+    def __init__(self, handle: TextIO, chunk_size: int) -> None:
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def fill(self, minimum: int = 0) -> bool:
+        if self.eof:
+            return False
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        # Grow geometrically so tokens spanning many chunks stay linear.
+        size = max(self.chunk_size, minimum, len(self.buffer))
+        data = self.handle.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer += data
+        return True
+
+    def skip_whitespace(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def error(self, message: str) -> JSONStreamError:
+        return JSONStreamError(message, self.offset + self.pos)
+
+    def read_string(self) -> str:
+        while True:
+            try:
+                value, end = scanstring(self.buffer, self.pos + 1)
+            except json.JSONDecodeError as exc:
+                if self.fill():
+                    continue
+                raise self.error(exc.msg) from None
+            self.pos = end
+            return value
+
+    def read_number(self) -> Union[int, float]:
+        while True:
+            end = _NUMBER_CHARS.match(self.buffer, self.pos).end()
+            if end == len(self.buffer) and self.fill():
+                continue
+            match = _NUMBER.match(self.buffer, self.pos)
+            if match is None or match.end() != end:
+                raise self.error("Expecting value")
+            integer, fraction, exponent = match.groups()
+            self.pos = end
+            if fraction or exponent:
+                return float(integer + (fraction or "") + (exponent or ""))
+            return int(integer)
+
+    def read_literal(self) -> object:
+        while len(self.buffer) - self.pos < 5 and self.fill():
+            pass
+        for text, value in _LITERALS:
+            if self.buffer.startswith(text, self.pos):
+                self.pos += len(text)
+                return value
+        raise self.error("Expecting value")
+
+
+def iter_events(
+    handle: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Event]:
+    """Yield parse events for a single JSON document read from ``handle``.
+
+    Events are ``(kind, value)`` pairs where ``kind`` is one of
+    ``start_map``, ``map_key``, ``end_map``, ``start_array``, ``end_array``
+    or ``value``; blank input yields nothing. Nesting is tracked with an
+    explicit stack, so arbitrarily deep documents never touch the interpreter
+    recursion limit.
+    """
+    reader = _Reader(handle, chunk_size)
+    # Each entry is the container type ("{" or "[") currently open.
+    containers: List[str] = []
+    expect_value = True
+
+    if not reader.skip_whitespace():
+        return
+
+    while True:
+        char = reader.skip_whitespace()
+
+        if not expect_value:
+            if not containers:
+                if char:
+                    raise reader.error("Extra data")
+                return
+            if char == ",":
+                reader.pos += 1
+                char = reader.skip_whitespace()
+                if containers[-1] == "{":
+                    if char != '"':
+                        raise reader.error("Expecting property name")
+                    yield "map_key", reader.read_string()
+                    if reader.skip_whitespace() != ":":
+                        raise reader.error("Expecting ':' delimiter")
+                    reader.pos += 1
+                expect_value = True
+                continue
+            if char == "}" and containers[-1] == "{":
+                reader.pos += 1
+                containers.pop()
+                yield "end_map", None
+                continue
+            if char == "]" and containers[-1] == "[":
+                reader.pos += 1
+                containers.pop()
+                yield "end_array", None
+                continue
+            raise reader.error("Expecting ',' delimiter")
+
+        if not char:
+            raise reader.error("Expecting value")
+
+        if char == "{":
+            reader.pos += 1
+            containers.append("{")
+            yield "start_map", None
+            char = reader.skip_whitespace()
+            if char == "}":
+                reader.pos += 1
+                containers.pop()
+                yield "end_map", None
+                expect_value = False
+                continue
+            if char != '"':
+                raise reader.error("Expecting property name")
+            yield "map_key", reader.read_string()
+            if reader.skip_whitespace() != ":":
+                raise reader.error("Expecting ':' delimiter")
+            reader.pos += 1
+            continue
+
+        if char == "[":
+            reader.pos += 1
+            containers.append("[")
+            yield "start_array", None
+            if reader.skip_whitespace() == "]":
+                reader.pos += 1
+                containers.pop()
+                yield "end_array", None
+                expect_value = False
+            continue
+
+        if char == '"':
+            yield "value", reader.read_string()
+        elif char == "-" or char.isdigit():
+            yield "value", reader.read_number()
+        else:
+            yield "value", reader.read_literal()
+        expect_value = False
+
+
+def build(
+    events: Iterator[Event],
+    keep_keys: Optional[Collection[str]] = None,
+    default: object = _MISSING,
+    on_map: Optional[Callable[[Dict[str, object]], object]] = None,
+) -> object:
+    """Assemble the document described by ``events`` without recursion.
+
+    When ``keep_keys`` is given, object members whose key is not listed are
+    skipped while parsing and never materialised, which keeps large payloads
+    (captured output, failure details) out of memory entirely. ``default``
+    is returned for blank input; without it blank input is an error.
+    ``on_map`` is called with every completed object that is an array
+    element and its return value is stored in place of the object, letting
+    callers condense records as soon as they are parsed. Objects held under
+    a key are kept as parsed, so a lookup of that key still sees an object.
+    """
+    root: List[object] = []
+    # Stack of (container, pending key) pairs; the key is unused for lists.
+    stack: List[Tuple[Union[Dict[str, object], List[object]], Optional[str]]] = []
+    skip_depth = 0
+    skip_next = False
+
+    def attach(value: object) -> None:
+        if not stack:
+            root.append(value)
+            return
+        container, key = stack[-1]
+        if isinstance(container, dict):
+            container[key] = value
+        else:
+            container.append(value)
+
+    for kind, value in events:
+        if skip_depth:
+            if kind in START_EVENTS:
+                skip_depth += 1
+            elif kind in END_EVENTS:
+                skip_depth -= 1
+            continue
+
+        if kind == "map_key":
+            if keep_keys is not None and value not in keep_keys:
+                skip_next = True
+            else:
+                stack[-1] = (stack[-1][0], value)
+            continue
+
+        if skip_next:
+            skip_next = False
+            if kind in START_EVENTS:
+                skip_depth = 1
+            continue
+
+        if kind == "value":
+            attach(value)
+        elif kind == "start_map":
+            container: Union[Dict[str, object], List[object]] = {}
+            attach(container)
+            stack.append((container, None))
+        elif kind == "start_array":
+            container = []
+            attach(container)
+            stack.append((container, None))
+        else:
+            container = stack.pop()[0]
+            if on_map is not None and stack and isinstance(container, dict):
+                parent = stack[-1][0]
+                if isinstance(parent, list):
+                    parent[-1] = on_map(container)
+
+    if not root:
+        if default is not _MISSING:
+            return default
+        raise JSONStreamError("Expecting value", 0)
+    return root[0]
+
+
+def _subtree(kind: str, events: Iterator[Event]) -> Iterator[Event]:
+    """The events of the container opened by ``kind``, through its end."""
+    yield kind, None
+    depth = 1
+    for event in events:
+        yield event
+        if event[0] in START_EVENTS:
+            depth += 1
+        elif event[0] in END_EVENTS:
+            depth -= 1
+            if not depth:
+                return
+
+
+def _member_value(kind: str, value: object, events: Iterator[Event]) -> object:
+    if kind in START_EVENTS:
+        return build(_subtree(kind, events))
+    return value
+
+
+def iter_members(
+    handle: TextIO,
+    keep_keys: Optional[Collection[str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Tuple[str, object, object]]:
+    """Yield the members of a top-level object one entry at a time.
+
+    A non-empty array member yields ``(key, index, item)`` per item and a
+    non-empty object member ``(key, name, value)`` per member, each item or
+    value built whole; any other member yields ``(key, None, value)``. Only
+    one entry is materialised at a time, so a document made of a few huge
+    lists or maps is read in memory bounded by its largest entry. Members
+    whose key is not in ``keep_keys`` are skipped while parsing. Blank input
+    and documents whose root is not an object yield nothing.
+    """
+    events = iter_events(handle, chunk_size)
+    if next(events, None) != ("start_map", None):
+        return
+    for kind, key in events:
+        if kind == "end_map":
+            # Drain the events so trailing data is still reported.
+            continue
+        key = str(key)
+        kind, value = next(events)
+        if keep_keys is not None and key not in keep_keys:
+            if kind in START_EVENTS:
+                for _ in _subtree(kind, events):
+                    pass
+        elif kind == "start_array":
+            index = 0
+            for kind, value in events:
+                if kind == "end_array":
+                    break
+                yield key, index, _member_value(kind, value, events)
+                index += 1
+            if not index:
+                yield key, None, []
+        elif kind == "start_map":
+            empty = True
+            for kind, name in events:
+                if kind == "end_map":
+                    break
+                empty = False
+                kind, value = next(events)
+                yield key, name, _member_value(kind, value, events)
+            if empty:
+                yield key, None, {}
+        else:
+            yield key, None, value
+
+
+def load_path(
+    path: Path,
+    keep_keys: Optional[Collection[str]] = None,
+    default: object = _MISSING,
+    on_map: Optional[Callable[[Dict[str, object]], object]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> object:
+    """Parse the JSON document at ``path`` incrementally."""
+    with path.open("r", encoding="utf-8") as handle:
+        return build(iter_events(handle, chunk_size), keep_keys, default, on_map)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Merge JUnit XML reports into a pytest-json-report compatible structure.
+
+Takes CTest's ``--output-junit`` file together with the per-binary reports
+GoogleTest writes with ``GTEST_OUTPUT=xml:<dir>/``; directories are searched
+for ``*.xml``. Every file is streamed with ``iterparse`` and each
+``<testcase>`` is discarded once read, and the files are parsed concurrently
+in a process pool sized to the job's CPU limit, so wall-clock time and
+memory scale with the available cores rather than with the size of the
+largest report.
+
+Test IDs are ``classname::name`` as before. When ``gtest_discover_tests``
+registers each GoogleTest case with CTest, the case is reported twice; the
+CTest entry named ``Suite.Test`` is dropped in favour of the GoogleTest one,
+which carries the failure message. GoogleTest's ``DISABLED_`` tests are
+reported as xfailed.
+
+``read_ctest_output`` reads CTest's console output instead, for runs that
+left no JUnit report behind.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import re
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+import results_format
+import worker_sizing
+
+# Failure output kept per test; GoogleTest repeats it in the message.
+MAX_LONGREPR = 16384
+DISABLED_PREFIX = "DISABLED_"
+DISABLED_REASON = "Disabled test (DISABLED_ prefix)"
+# Root <testsuites> name GoogleTest gives its reports.
+GTEST_ROOT = "AllTests"
+# Parsing a file is quick; spread small batches so large files do not queue.
+CHUNK_SIZE = 4
+
+# "1/10 Test #1: name ..........***Failed    0.02 sec"
+_CTEST_LINE = re.compile(r"^\s*\d+/\d+\s+Test\s+#\d+:\s+(\S+)\s+\.+\s*(?:\*\*\*)?(\w+)")
+_CTEST_SECONDS = re.compile(r"(\d+(?:\.\d+)?)\s+sec\s*$")
+# Any other CTest status, e.g. Timeout or Exception, counts as an error.
+CTEST_OUTCOMES = {
+    "Passed": "passed",
+    "Failed": "failed",
+    "Skipped": "skipped",
+    "NotRun": "skipped",
+}
+
+Record = Dict[str, object]
+
+
+class FileResults(NamedTuple):
+    path: str
+    gtest: bool
+    tests: List[Record]
+    # Key each test is known by to CTest: Suite.Test for GoogleTest cases.
+    keys: List[str]
+    error: Optional[str]
+
+
+def _truncate(text: str) -> str:
+    text = text.strip()
+    if len(text) <= MAX_LONGREPR:
+        return text
+    return text[:MAX_LONGREPR] + "\n... (output truncated)"
+
+
+def _case_record(case: ET.Element, suite: str) -> Record:
+    name = case.get("name", "unknown")
+    classname = case.get("classname") or suite or "unknown"
+    record: Record = {"nodeid": f"{classname}::{name}"}
+    try:
+        record["duration"] = float(case.get("time", ""))
+    except ValueError:
+        pass
+
+    failure = case.find("failure")
+    error = case.find("error")
+    skipped = case.find("skipped")
+    if name.startswith(DISABLED_PREFIX) or classname.startswith(DISABLED_PREFIX):
+        record["outcome"] = "xfailed"
+        record["longrepr"] = DISABLED_REASON
+    elif failure is not None or error is not None:
+        detail = failure if failure is not None else error
+        record["outcome"] = "failed" if failure is not None else "error"
+        text = detail.get("message") or detail.text or ""  # type: ignore[union-attr]
+        if text:
+            record["longrepr"] = _truncate(text)
+    elif skipped is not None:
+        record["outcome"] = "skipped"
+        reason = skipped.get("message") or (skipped.text or "").strip()
+        if reason:
+            record["longrepr"] = _truncate(reason)
+    else:
+        record["outcome"] = "passed"
+    return record
+
+
+def parse_file(path: str) -> FileResults:
+    """Stream one JUnit report; the tree never holds more than one test case."""
+    tests: List[Record] = []
+    keys: List[str] = []
+    suites: List[str] = []
+    stack: List[ET.Element] = []
+    gtest = False
+    try:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                if elem.tag == "testsuites" and not stack:
+                    gtest = elem.get("name") == GTEST_ROOT
+                elif elem.tag == "testsuite":
+                    suites.append(elem.get("name", ""))
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag == "testcase":
+                suite = suites[-1] if suites else ""
+                tests.append(_case_record(elem, suite))
+                keys.append(f"{suite}.{elem.get('name', '')}" if gtest else "")
+            elif elem.tag == "testsuite":
+                suites.pop()
+            else:
+                # Children of a test case are read when the case ends.
+                continue
+            if stack:
+                stack[-1].remove(elem)
+            elem.clear()
+    except (ET.ParseError, OSError) as exc:
+        return FileResults(path, gtest, tests, keys, f"{path}: {exc}")
+    return FileResults(path, gtest, tests, keys, None)
+
+
+def read_ctest_output(path: Path) -> List[Record]:
+    """Tests of a CTest console log, one line each, read line by line."""
+    tests: List[Record] = []
+    with path.open(encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            match = _CTEST_LINE.match(line)
+            if not match:
+                continue
+            record: Record = {
+                "nodeid": match.group(1),
+                "outcome": CTEST_OUTCOMES.get(match.group(2), "error"),
+            }
+            seconds = _CTEST_SECONDS.search(line)
+            if seconds:
+                record["duration"] = float(seconds.group(1))
+            tests.append(record)
+    return tests
+
+
+def find_reports(inputs: Iterable[Path]) -> List[Path]:
+    reports: List[Path] = []
+    for entry in inputs:
+        if entry.is_dir():
+            reports.extend(sorted(entry.rglob("*.xml")))
+        elif entry.is_file():
+            reports.append(entry)
+    return reports
+
+
+def parse_files(paths: Sequence[Path], workers: int) -> List[FileResults]:
+    """Parse ``paths`` concurrently; results keep the order of ``paths``."""
+    names = [str(path) for path in paths]
+    workers = min(workers, len(names))
+    if workers <= 1:
+        return [parse_file(name) for name in names]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_file, names, chunksize=CHUNK_SIZE))
+
+
+def merge(files: Sequence[FileResults]) -> List[Record]:
+    """Combine per-file results, dropping CTest entries GoogleTest reported."""
+    gtest_keys: Set[str] = set()
+    for result in files:
+        if result.gtest:
+            gtest_keys.update(result.keys)
+
+    merged: Dict[str, Record] = {}
+    for result in files:
+        for record in result.tests:
+            if not result.gtest:
+                name = str(record["nodeid"]).rsplit("::", 1)[-1]
+                if name in gtest_keys:
+                    continue
+            # A test rerun by another binary or report: the last result counts.
+            merged.pop(str(record["nodeid"]), None)
+            merged[str(record["nodeid"])] = record
+    return list(merged.values())
+
+
+def convert(inputs: Sequence[Path], workers: int) -> Dict[str, object]:
+    files = parse_files(find_reports(inputs), workers)
+    for result in files:
+        if result.error:
+            print(f"::warning::Could not parse {result.error}", file=sys.stderr)
+    tests = merge(files)
+
+    counts: Dict[str, int] = {}
+    for test in tests:
+        outcome = str(test["outcome"])
+        counts[outcome] = counts.get(outcome, 0) + 1
+    summary = {
+        "total": len(tests),
+        "passed": counts.get("passed", 0),
+        "failed": counts.get("failed", 0),
+        "skipped": counts.get("skipped", 0),
+    }
+    for outcome in ("error", "xfailed"):
+        if counts.get(outcome):
+            summary[outcome] = counts[outcome]
+    return {
+        "summary": summary,
+        "tests": tests,
+        "exitcode": 0 if not (summary["failed"] or counts.get("error")) else 1,
+        "reports": len(files),
+    }
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "inputs",
+        type=Path,
+        nargs="+",
+        help="JUnit XML files, or directories to search for them.",
+    )
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Parser processes; defaults to the CPUs the job may use.",
+    )
+    parser.add_argument(
+        "--compact-output",
+        type=Path,
+        default=None,
+        help="Optional path to also write the results in the compact layout.",
+    )
+    parser.add_argument(
+        "--legacy-output",
+        type=Path,
+        default=None,
+        help="Optional path to also write the results as test_data.json.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    workers = args.workers or worker_sizing.cpu_limit()
+
+    report = convert(args.inputs, workers)
+    print(
+        f"Merged {report['summary']['total']} test(s) "  # type: ignore[index]
+        f"from {report['reports']} report(s)"
+    )
+
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compact_output or args.legacy_output:
+        table = results_format.from_report(report)
+        if args.compact_output:
+            results_format.write(table, args.compact_output)
+        if args.legacy_output:
+            args.legacy_output.write_text(
+                json.dumps(table.legacy(), indent=2), encoding="utf-8"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Per-test memory measurement shared by the test runner integrations.
+
+Call :meth:`MemoryProbe.start` as a test starts and :meth:`MemoryProbe.stop`
+once it has finished. ``stop`` returns a dict of byte counts:
+
+``peak``
+    How far the process RSS rose above its value when the test started.
+``delta``
+    RSS after the test minus RSS before it, i.e. what the test kept.
+``traced``
+    Peak Python heap allocated during the test; only with
+    ``TEST_MEMORY_TRACEMALLOC=1``, since tracing slows every allocation.
+
+On Linux the RSS high-water mark is reset for each test through
+``/proc/self/clear_refs``, so ``peak`` belongs to that test alone. Where it
+cannot be reset, ``peak`` is the growth of the process-wide maximum reported
+by ``resource.getrusage`` and is zero for tests below an earlier maximum.
+"""
+
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Optional
+
+PROC_STATUS = Path("/proc/self/status")
+CLEAR_REFS = Path("/proc/self/clear_refs")
+# Value written to clear_refs that resets the peak RSS (VmHWM) to the current RSS.
+RESET_PEAK = "5"
+TRACEMALLOC_ENV = "TEST_MEMORY_TRACEMALLOC"
+
+Measurement = Dict[str, int]
+
+
+def _status_bytes(field: str) -> Optional[int]:
+    try:
+        lines = PROC_STATUS.read_text(encoding="ascii").splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        if line.startswith(f"{field}:"):
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                return int(parts[1]) * 1024
+    return None
+
+
+def current_rss() -> Optional[int]:
+    return _status_bytes("VmRSS")
+
+
+def max_rss() -> int:
+    """Process-wide peak RSS in bytes since the process started."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_peak() -> bool:
+    try:
+        CLEAR_REFS.write_text(RESET_PEAK, encoding="ascii")
+    except OSError:
+        return False
+    return True
+
+
+class MemoryProbe:
+    """Measures one test at a time in the current process."""
+
+    def __init__(self, trace: Optional[bool] = None) -> None:
+        if trace is None:
+            trace = os.environ.get(TRACEMALLOC_ENV) == "1"
+        self.trace = trace
+        self._resettable = True
+        self._start_rss: Optional[int] = None
+        self._start_max = 0
+        self._start_traced = 0
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self) -> None:
+        self._start_rss = current_rss()
+        # Stop trying after the first failure; it will not start working.
+        self._resettable = self._resettable and _reset_peak()
+        self._start_max = max_rss()
+        if self.trace:
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            self._start_traced = tracemalloc.get_traced_memory()[0]
+
+    def stop(self) -> Measurement:
+        end_rss = current_rss()
+        measurement: Measurement = {}
+        peak_rss = _status_bytes("VmHWM") if self._resettable else None
+        if peak_rss is not None and self._start_rss is not None:
+            measurement["peak"] = max(peak_rss - self._start_rss, 0)
+        else:
+            measurement["peak"] = max(max_rss() - self._start_max, 0)
+        if end_rss is not None and self._start_rss is not None:
+            measurement["delta"] = end_rss - self._start_rss
+        if self.trace:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            measurement["traced"] = max(traced_peak - self._start_traced, 0)
+        return measurement
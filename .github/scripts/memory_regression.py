@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Flag tests whose peak memory grew against the baseline.
+
+Works like ``duration_regression.py`` on the ``peak`` measurements written by
+the memory instrumentation (``memory_probe.py``): a test regresses when its
+current peak exceeds the baseline by more than both an absolute floor and a
+relative threshold, and, with several baseline samples, by more than their
+observed spread.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+import duration_regression
+import results_format
+import results_stream
+
+DEFAULT_RELATIVE_THRESHOLD = 0.5
+DEFAULT_ABSOLUTE_THRESHOLD_MIB = 32.0
+DEFAULT_NOISE_FACTOR = duration_regression.DEFAULT_NOISE_FACTOR
+MIB = 1 << 20
+
+Peaks = Dict[str, float]
+
+
+class MemoryRegression(NamedTuple):
+    test: str
+    baseline: float
+    current: float
+    allowance: float
+    samples: int
+
+    @property
+    def growth(self) -> float:
+        return self.current - self.baseline
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "test": self.test,
+            "baseline": int(self.baseline),
+            "current": int(self.current),
+            "allowance": int(self.allowance),
+            "samples": self.samples,
+        }
+
+
+def peaks_from_payload(raw: object) -> Peaks:
+    """Per-test peak bytes from either results layout; empty if none recorded."""
+    if results_format.is_compact(raw):
+        try:
+            memory = results_format.ResultsTable.from_payload(raw).memory_map()
+        except results_format.ResultsFormatError:
+            return {}
+    elif isinstance(raw, dict):
+        memory = {}
+        tests = raw.get("tests")
+        if isinstance(tests, list):
+            for entry in tests:
+                if isinstance(entry, dict) and entry.get("nodeid"):
+                    memory[str(entry["nodeid"])] = results_format.memory_values(
+                        entry.get("memory")
+                    )
+        recorded = raw.get(results_format.LEGACY_MEMORY)
+        if isinstance(recorded, dict):
+            for test_id, measured in recorded.items():
+                memory[str(test_id)] = results_format.memory_values(measured)
+    else:
+        return {}
+    return {
+        test_id: float(values["peak"])
+        for test_id, values in memory.items()
+        if "peak" in values
+    }
+
+
+def load_peaks(path: Path) -> Peaks:
+    if results_stream.is_stream(path):
+        return peaks_from_payload(results_stream.read_table(path).to_payload())
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8") or "{}")
+    except (OSError, json.JSONDecodeError) as exc:
+        print(f"::warning::Could not read memory measurements from {path}: {exc}")
+        return {}
+    return peaks_from_payload(raw)
+
+
+def find_sorted_regressions(
+    baseline_samples: Sequence[Iterable[Tuple[str, float]]],
+    current: Iterable[Tuple[str, float]],
+    relative_threshold: float = DEFAULT_RELATIVE_THRESHOLD,
+    absolute_threshold_mib: float = DEFAULT_ABSOLUTE_THRESHOLD_MIB,
+    noise_factor: float = DEFAULT_NOISE_FACTOR,
+) -> List[MemoryRegression]:
+    """``find_regressions`` over inputs sorted by test, one value per test.
+
+    See ``duration_regression.join_sorted``.
+    """
+    regressions = []
+    joined = duration_regression.join_sorted(baseline_samples, current)
+    for test, values, peak in joined:
+        centre, spread, count = duration_regression.sample_statistics(values)
+        limit = duration_regression.allowance(
+            centre,
+            spread,
+            absolute_threshold_mib * MIB,
+            relative_threshold,
+            noise_factor,
+        )
+        if peak > centre + limit:
+            regressions.append(MemoryRegression(test, centre, peak, limit, count))
+    regressions.sort(key=lambda item: (-item.growth, item.test))
+    return regressions
+
+
+def find_regressions(
+    baseline_samples: Sequence[Mapping[str, float]],
+    current: Mapping[str, float],
+    relative_threshold: float = DEFAULT_RELATIVE_THRESHOLD,
+    absolute_threshold_mib: float = DEFAULT_ABSOLUTE_THRESHOLD_MIB,
+    noise_factor: float = DEFAULT_NOISE_FACTOR,
+) -> List[MemoryRegression]:
+    """Tests whose peak outgrew their baseline by more than the allowance.
+
+    The allowance is computed as in ``duration_regression.find_regressions``.
+    Tests without a baseline measurement are ignored. Results are ordered by
+    growth, largest first.
+    """
+    return find_sorted_regressions(
+        [sorted(sample.items()) for sample in baseline_samples],
+        sorted(current.items()),
+        relative_threshold,
+        absolute_threshold_mib,
+        noise_factor,
+    )
+
+
+def _format_bytes(size: float) -> str:
+    return f"{size / MIB:.1f} MiB"
+
+
+def write_report_section(
+    handle: TextIO, regressions: Sequence[MemoryRegression]
+) -> None:
+    if not regressions:
+        return
+    handle.write(f"MEMORY REGRESSIONS ({len(regressions)} tests)\n")
+    handle.write("Peak memory above the baseline by more than the allowed margin:\n")
+    for idx, item in enumerate(regressions, 1):
+        handle.write(
+            f"  {idx}. {item.test}: {_format_bytes(item.baseline)} -> "
+            f"{_format_bytes(item.current)} "
+            f"(+{_format_bytes(item.growth)}, {item.samples} baseline sample(s))\n"
+        )
+    handle.write("\n")
+
+
+def write_summary_section(
+    handle: TextIO, regressions: Sequence[MemoryRegression], max_show: int = 20
+) -> None:
+    if not regressions:
+        return
+    handle.write(f"\n### 🧠 Memory Regressions ({len(regressions)})\n\n")
+    handle.write("| Test | Baseline peak | Current peak | Growth |\n")
+    handle.write("| --- | --- | --- | --- |\n")
+    for item in regressions[:max_show]:
+        handle.write(
+            f"| `{item.test}` | {_format_bytes(item.baseline)} | "
+            f"{_format_bytes(item.current)} | +{_format_bytes(item.growth)} |\n"
+        )
+    if len(regressions) > max_show:
+        handle.write(
+            f"\n... and {len(regressions) - max_show} more (see artifacts for full list)\n"
+        )
+
+
+def add_threshold_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--memory-relative-threshold",
+        type=float,
+        default=DEFAULT_RELATIVE_THRESHOLD,
+        help="Allowed peak memory growth as a fraction of the baseline peak.",
+    )
+    parser.add_argument(
+        "--memory-absolute-threshold",
+        type=float,
+        default=DEFAULT_ABSOLUTE_THRESHOLD_MIB,
+        help="Allowed peak memory growth in MiB, whatever the baseline peak.",
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Report test memory regressions.")
+    parser.add_argument("current", type=Path, help="Results of the current run.")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        action="append",
+        required=True,
+        help="Baseline results; repeat to use several samples.",
+    )
+    add_threshold_arguments(parser)
+    parser.add_argument(
+        "--noise-factor",
+        type=float,
+        default=DEFAULT_NOISE_FACTOR,
+        help="Allowed growth in scaled MADs when several baseline samples exist.",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=None, help="Optional JSON report path."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    regressions = find_regressions(
+        [load_peaks(path) for path in args.baseline],
+        load_peaks(args.current),
+        args.memory_relative_threshold,
+        args.memory_absolute_threshold,
+        args.noise_factor,
+    )
+    write_report_section(sys.stdout, regressions)
+    if not regressions:
+        print("✅ No memory regressions detected.")
+    if args.output:
+        args.output.write_text(
+            json.dumps([item.to_json() for item in regressions], indent=2),
+            encoding="utf-8",
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
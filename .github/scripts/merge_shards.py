@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""Merge the results of a test suite split across several shards.
+
+Each shard is one results file in any format ``convert_results.py``
+detects. Directories are searched for shards: with ``--filename`` every
+file of that name is a shard, otherwise each directory holding results
+contributes its preferred file (see ``PREFERENCE``), so the per-shard
+artifacts ``download-artifact`` places in sibling directories each count
+once.
+
+A test reported by more than one shard takes the result of a shard that
+finished over one that crashed; among shards that all finished, or all
+crashed, the one listed last wins. Pass retries after the attempts they
+replace; sorted names such as ``shard-1`` and ``shard-1-attempt-2`` already
+are. A shard crashed when its results stream has no end line, its report is
+marked incomplete, or its exit code says the run was interrupted, failed
+internally or was killed by a signal. Tests only a crashed shard reported
+are kept.
+
+The merged results are written in the compact layout, optionally also as
+``test_data.json``, together with per-shard timing statistics.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import convert_results
+import results_format
+import results_stream
+import worker_sizing
+
+# Formats tried first when a directory holds several result files of a run;
+# the ones recording whether the run finished come first.
+PREFERENCE: Tuple[str, ...] = (
+    "pytest-json",
+    "results-stream",
+    "normalised",
+    "junit",
+    "trx",
+    "jest",
+    "cargo",
+)
+# pytest: interrupted, internal error. unittest helper: worker pool broke.
+CRASH_EXITCODES = frozenset({2, 3})
+# Exit statuses from 128 up are deaths by signal, e.g. 137 for SIGKILL.
+SIGNAL_EXITCODE = 128
+
+Stats = Dict[str, object]
+
+
+class Shard(NamedTuple):
+    path: str
+    format: str
+    table: results_format.ResultsTable
+    complete: bool
+    exitcode: Optional[int]
+
+
+def crashed(exitcode: Optional[int]) -> bool:
+    if exitcode is None:
+        return False
+    return exitcode in CRASH_EXITCODES or exitcode < 0 or exitcode >= SIGNAL_EXITCODE
+
+
+def find_shards(inputs: Iterable[Path], filename: Optional[str] = None) -> List[Path]:
+    shards: List[Path] = []
+    for entry in inputs:
+        if entry.is_file():
+            shards.append(entry)
+            continue
+        if not entry.is_dir():
+            print(f"::warning::{entry} does not exist", file=sys.stderr)
+            continue
+        if filename:
+            matches = sorted(entry.rglob(filename))
+            shards.extend(path for path in matches if path.is_file())
+            continue
+        found: Dict[Path, List[Tuple[int, Path]]] = {}
+        for path in sorted(entry.rglob("*")):
+            if not path.is_file():
+                continue
+            converter = convert_results.detect(path)
+            if converter is not None and converter.name in PREFERENCE:
+                rank = PREFERENCE.index(converter.name)
+                found.setdefault(path.parent, []).append((rank, path))
+        shards.extend(min(found[directory])[1] for directory in sorted(found))
+    return shards
+
+
+def load_shard(path: str) -> Optional[Shard]:
+    """Read one shard; None when it is not a results file."""
+    source = Path(path)
+    converter = convert_results.detect(source)
+    if converter is None:
+        return None
+    complete = True
+    exitcode: Optional[int] = None
+    if converter.name == "results-stream":
+        table = results_format.ResultsTable()
+        reader = results_stream.StreamReader(source)
+        for record in reader:
+            results_format.add_report_test(table, record)
+        complete = reader.end is not None
+        if reader.end is not None:
+            exitcode = int(reader.end.get("exitcode", 0))  # type: ignore[arg-type]
+    elif converter.name == "pytest-json":
+        report = convert_results.read_report(source)
+        table = convert_results.report_table(report)
+        complete = not report.get("incomplete")
+        if isinstance(report.get("exitcode"), int):
+            exitcode = int(report["exitcode"])  # type: ignore[arg-type]
+    else:
+        table = converter.convert(source)
+    complete = complete and not crashed(exitcode)
+    return Shard(path, converter.name, table, complete, exitcode)
+
+
+def load_shards(paths: Sequence[Path], workers: int) -> List[Optional[Shard]]:
+    """Read ``paths`` concurrently; results keep the order of ``paths``."""
+    names = [str(path) for path in paths]
+    workers = min(workers, len(names))
+    if workers <= 1:
+        return [load_shard(name) for name in names]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(load_shard, names))
+
+
+def merge(shards: Sequence[Shard]) -> Tuple[results_format.ResultsTable, Stats]:
+    """Union ``shards`` and return the merged table with timing statistics."""
+    # Crashed shards are applied first so that any finished shard overrides
+    # them; the sort is stable, so input order decides between equals.
+    owner: Dict[str, int] = {}
+    reported: Dict[str, int] = {}
+    for position in sorted(range(len(shards)), key=lambda i: shards[i].complete):
+        for test_id in shards[position].table.ids:
+            owner[test_id] = position
+            reported[test_id] = reported.get(test_id, 0) + 1
+
+    merged = results_format.ResultsTable()
+    warnings = set()
+    shard_stats: List[Stats] = []
+    for position, shard in enumerate(shards):
+        table = shard.table
+        kept = 0
+        for index, test_id in enumerate(table.ids):
+            if owner[test_id] != position:
+                continue
+            kept += 1
+            target = merged.intern(test_id)
+            merged.codes[target] = table.codes[index]
+            if index in table.durations:
+                merged.durations[target] = table.durations[index]
+            if index in table.memory:
+                merged.memory[target] = table.memory[index]
+            if index in table.reasons:
+                merged.reasons[target] = table.reasons[index]
+        warnings.update(table.warnings)
+        shard_stats.append(_shard_stats(shard, kept))
+    merged.warnings = sorted(warnings)
+
+    durations = [sum(shard.table.durations.values()) for shard in shards]
+    mean = sum(durations) / len(durations) if durations else 0.0
+    stats: Stats = {
+        "shards": shard_stats,
+        "tests": len(merged),
+        "duplicates": sum(1 for count in reported.values() if count > 1),
+        "crashed": sum(1 for shard in shards if not shard.complete),
+        "duration": {
+            "total": round(sum(durations), 3),
+            "max": round(max(durations, default=0.0), 3),
+            "mean": round(mean, 3),
+            # Slowest shard over the mean; 1.0 is a perfectly even split.
+            "imbalance": round(max(durations) / mean, 3) if mean else None,
+        },
+    }
+    return merged, stats
+
+
+def _shard_stats(shard: Shard, kept: int) -> Stats:
+    table = shard.table
+    slowest = max(table.durations.items(), key=lambda item: item[1], default=None)
+    return {
+        "path": shard.path,
+        "format": shard.format,
+        "complete": shard.complete,
+        "exitcode": shard.exitcode,
+        "tests": len(table),
+        "kept": kept,
+        "superseded": len(table) - kept,
+        "duration": round(sum(table.durations.values()), 3),
+        "slowest": (
+            {"test": table.ids[slowest[0]], "duration": slowest[1]} if slowest else None
+        ),
+    }
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "inputs",
+        type=Path,
+        nargs="+",
+        help="Shard result files, or directories to search for them.",
+    )
+    parser.add_argument(
+        "--filename",
+        default=None,
+        help="Name of the result file in each shard directory.",
+    )
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument(
+        "--legacy-output",
+        type=Path,
+        default=None,
+        help="Optional path to also write the results as test_data.json.",
+    )
+    parser.add_argument(
+        "--stats", type=Path, default=None, help="Optional per-shard statistics JSON."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Reader processes; defaults to the CPUs the job may use.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    workers = args.workers or worker_sizing.cpu_limit()
+
+    try:
+        paths = find_shards(args.inputs, args.filename)
+        shards = [shard for shard in load_shards(paths, workers) if shard is not None]
+    except (OSError, ValueError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+    if not shards:
+        print("::error::No shard results found.", file=sys.stderr)
+        return 1
+
+    table, stats = merge(shards)
+    for shard in stats["shards"]:  # type: ignore[attr-defined]
+        state = "complete" if shard["complete"] else "crashed"
+        print(
+            f"{shard['path']} ({shard['format']}, {state}): {shard['tests']} test(s), "
+            f"{shard['kept']} kept, {shard['duration']:.1f}s"
+        )
+        if not shard["complete"] and shard["kept"]:
+            print(
+                f"::warning::{shard['kept']} test(s) are only reported by crashed "
+                f"shard {shard['path']}."
+            )
+    print(
+        f"Merged {stats['tests']} test(s) from {len(shards)} shard(s); "
+        f"{stats['duplicates']} reported more than once."
+    )
+
+    results_format.write(table, args.output)
+    if args.legacy_output:
+        args.legacy_output.write_text(
+            json.dumps(table.legacy(), indent=2), encoding="utf-8"
+        )
+    if args.stats:
+        args.stats.write_text(json.dumps(stats, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
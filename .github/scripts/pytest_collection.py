@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Structured, cached ``pytest --collect-only`` results.
+
+``collect`` runs collection with ``pytest_collection_plugin.py`` and writes
+the node IDs and the collection errors, classified by exception type, to a
+JSON file. The file records a content key over the Python sources, pytest
+configuration and installed distributions; when an existing file (typically
+restored from the Actions cache) carries the current key, collection is
+skipped and its results are reused. ``key`` prints that key so a workflow can
+restore the cache before collecting.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+FORMAT = "pytest-collection/1"
+CONFIG_FILES = ("pyproject.toml", "setup.cfg", "setup.py", "tox.ini", "pytest.ini")
+SKIP_DIRS = {"__pycache__", "node_modules", "venv", "build", "dist"}
+# Reported error type when several kinds of errors occur, first match wins.
+ERROR_PRIORITY = (
+    "ImportError",
+    "ModuleNotFoundError",
+    "SyntaxError",
+    "CollectionError",
+    "Interrupted",
+    "UnknownError",
+)
+PYTEST_ARGS = ("-p", "no:asyncio", "-p", "no:xdist")
+EXIT_INTERRUPTED = 2
+
+
+def _is_key_input(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.endswith(".py") or name in CONFIG_FILES
+
+
+def source_files(root: Path) -> List[str]:
+    """Python and pytest config files under ``root``, relative and sorted."""
+    try:
+        listed = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=root,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split("\0")
+        return sorted(path for path in listed if path and _is_key_input(path))
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    found = []
+    for current, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS]
+        for name in files:
+            path = os.path.relpath(os.path.join(current, name), root)
+            if _is_key_input(path):
+                found.append(Path(path).as_posix())
+    return sorted(found)
+
+
+def collection_key(root: Path, pytest_args: Sequence[str] = ()) -> str:
+    """Hash of everything that can change what pytest collects.
+
+    Any Python file counts, not only tests and conftests: a test module
+    fails to import just as well when the code it imports breaks.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([FORMAT, sys.version, list(pytest_args)]).encode())
+    distributions = sorted(
+        f"{dist.metadata['Name']}=={dist.version}" for dist in metadata.distributions()
+    )
+    digest.update("\n".join(distributions).encode("utf-8"))
+    for path in source_files(root):
+        try:
+            content = (root / path).read_bytes()
+        except OSError:
+            # Deleted but still tracked; its absence is part of the state.
+            content = b""
+        digest.update(f"\0{path}\0{len(content)}\0".encode("utf-8"))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def error_type(payload: Dict[str, object]) -> str:
+    """Single error type summarising a collection, or ``none``."""
+    found = {error.get("type") for error in payload.get("errors", [])}
+    for name in ERROR_PRIORITY:
+        if name in found:
+            return name
+    return "none"
+
+
+def run_collection(
+    root: Path, pytest_args: Sequence[str], log: Path
+) -> Dict[str, object]:
+    scripts_dir = str(Path(__file__).resolve().parent)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [scripts_dir, env.get("PYTHONPATH", "")])
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = Path(tmp) / "collection.json"
+        env["PYTEST_COLLECTION_REPORT"] = str(report_path)
+        command = [
+            sys.executable,
+            "-m",
+            "pytest",
+            "--collect-only",
+            "-q",
+            *PYTEST_ARGS,
+            "-p",
+            "pytest_collection_plugin",
+            *pytest_args,
+        ]
+        with log.open("w", encoding="utf-8") as handle:
+            completed = subprocess.run(
+                command, cwd=root, env=env, stdout=handle, stderr=subprocess.STDOUT
+            )
+        try:
+            payload = json.loads(report_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            payload = None
+
+    if not isinstance(payload, dict):
+        # pytest failed before the session finished, e.g. a broken conftest
+        # or bad configuration.
+        tail = log.read_text(encoding="utf-8", errors="replace")[-4000:]
+        kind = next(
+            (
+                name
+                for name in ("SyntaxError", "ModuleNotFoundError", "ImportError")
+                if name in tail
+            ),
+            "UnknownError",
+        )
+        return {
+            "exitcode": completed.returncode,
+            "incomplete": True,
+            "tests": [],
+            "errors": [{"nodeid": "", "type": kind, "message": tail}],
+        }
+    if payload.get("exitcode") == EXIT_INTERRUPTED and not payload.get("errors"):
+        payload["errors"] = [
+            {"nodeid": "", "type": "Interrupted", "message": "collection interrupted"}
+        ]
+    return payload
+
+
+def load_cached(path: Path, key: str) -> Optional[Dict[str, object]]:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(payload, dict) or payload.get("format") != FORMAT:
+        return None
+    return payload if payload.get("key") == key else None
+
+
+def _write_github_output(
+    path: Path, payload: Dict[str, object], cacheable: bool
+) -> None:
+    kind = error_type(payload)
+    count = len(payload.get("tests", []))
+    has_errors = kind != "none"
+    no_tests = not has_errors and count == 0
+    if no_tests:
+        kind = "NoTestsFound"
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(f"has_collection_errors={str(has_errors).lower()}\n")
+        handle.write(f"no_tests_found={str(no_tests).lower()}\n")
+        handle.write(f"error_type={kind}\n")
+        handle.write(f"has_errors={str(has_errors or no_tests).lower()}\n")
+        handle.write(f"test_count={count}\n")
+        handle.write(f"cacheable={str(cacheable).lower()}\n")
+
+
+def _key_command(args: argparse.Namespace) -> int:
+    key = collection_key(args.root, args.pytest_args)
+    print(key)
+    if args.github_output:
+        with args.github_output.open("a", encoding="utf-8") as handle:
+            handle.write(f"key={key}\n")
+    return 0
+
+
+def _collect_command(args: argparse.Namespace) -> int:
+    key = args.key or collection_key(args.root, args.pytest_args)
+    payload = load_cached(args.output, key)
+    if payload is not None:
+        print(f"Reusing cached collection results ({key[:12]})")
+        cacheable = False
+    else:
+        payload = run_collection(args.root, args.pytest_args, args.log)
+        payload = {"format": FORMAT, "key": key, **payload}
+        # A crash before the session finished is not worth remembering.
+        cacheable = not payload.get("incomplete")
+        args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+    errors = payload.get("errors", [])
+    count = len(payload.get("tests", []))
+    if errors:
+        print(f"::error::Test discovery errors detected ({error_type(payload)})")
+        for error in errors:
+            print(f"  {error.get('type')}: {error.get('nodeid') or '<session>'}")
+    elif count == 0:
+        print("::warning::No tests were found")
+    else:
+        print(f"Found {count} tests")
+    if args.github_output:
+        _write_github_output(args.github_output, payload, cacheable)
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cached pytest collection.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command: argparse.ArgumentParser) -> None:
+        command.add_argument(
+            "--root", type=Path, default=Path.cwd(), help="Repository root."
+        )
+        command.add_argument(
+            "--pytest-arg",
+            dest="pytest_args",
+            action="append",
+            default=[],
+            help="Extra argument passed to pytest; repeatable.",
+        )
+        command.add_argument("--github-output", type=Path, default=None)
+
+    key = commands.add_parser("key", help="Print the collection cache key.")
+    add_common(key)
+    key.set_defaults(handler=_key_command)
+
+    collect = commands.add_parser(
+        "collect", help="Collect tests, reusing cached results when current."
+    )
+    add_common(collect)
+    collect.add_argument(
+        "--output",
+        type=Path,
+        required=True,
+        help="Collection results; reused when it already has the current key.",
+    )
+    collect.add_argument(
+        "--key", default="", help="Precomputed key from the 'key' command."
+    )
+    collect.add_argument(
+        "--log",
+        type=Path,
+        default=Path("collection_output.txt"),
+        help="Where pytest's own output goes.",
+    )
+    collect.set_defaults(handler=_collect_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except OSError as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
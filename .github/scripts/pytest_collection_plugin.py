@@ -0,0 +1,75 @@
+"""pytest plugin writing ``--collect-only`` results as JSON.
+
+``pytest_collection.py`` loads it with ``-p pytest_collection_plugin`` and
+points ``PYTEST_COLLECTION_REPORT`` at the file to write: the collected node
+IDs, the pytest exit code and every collection error with its exception
+type. pytest re-raises module import failures as its own ``CollectError``;
+the type recorded is the one of the underlying exception.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+_error_types: Dict[str, str] = {}
+_errors: List[Dict[str, str]] = []
+
+
+def error_type(exc: BaseException) -> str:
+    seen = set()
+    current = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, SyntaxError):
+            return "SyntaxError"
+        if isinstance(current, ModuleNotFoundError):
+            return "ModuleNotFoundError"
+        if isinstance(current, ImportError):
+            return "ImportError"
+        current = current.__cause__ or current.__context__
+    return "CollectionError"
+
+
+def _type_from_text(text: str) -> str:
+    for name in ("SyntaxError", "ModuleNotFoundError", "ImportError"):
+        if name in text:
+            return name
+    return "CollectionError"
+
+
+# Called before pytest_collectreport for the same failed collector, and the
+# only hook that still sees the exception itself.
+def pytest_exception_interact(
+    node: pytest.Item, call: pytest.CallInfo, report: pytest.CollectReport
+) -> None:
+    if isinstance(report, pytest.CollectReport) and call.excinfo is not None:
+        _error_types[report.nodeid] = error_type(call.excinfo.value)
+
+
+def pytest_collectreport(report: pytest.CollectReport) -> None:
+    if report.failed:
+        message = str(report.longrepr)
+        _errors.append(
+            {
+                "nodeid": report.nodeid,
+                "type": _error_types.get(report.nodeid) or _type_from_text(message),
+                "message": message,
+            }
+        )
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    path = os.environ.get("PYTEST_COLLECTION_REPORT")
+    if not path:
+        return
+    payload = {
+        "exitcode": int(exitstatus),
+        "tests": [item.nodeid for item in session.items],
+        "errors": _errors,
+    }
+    Path(path).write_text(json.dumps(payload), encoding="utf-8")
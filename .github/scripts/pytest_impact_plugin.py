@@ -0,0 +1,65 @@
+"""pytest plugin running only the tests chosen by ``test_impact.py select``.
+
+Load it with ``-p pytest_impact_plugin`` (the scripts directory must be on
+``sys.path``) and point ``TEST_IMPACT_SELECTION`` at the selection file. A
+full-suite selection leaves collection untouched. Otherwise a test runs when
+it is listed, lives in a changed test file or matches an always-run pattern.
+
+When ``TEST_IMPACT_DESELECTED`` names a file, the IDs of the tests left out
+are written there so result extraction can tell them apart from removed
+tests.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+
+
+def _keep(nodeid: str, tests: set, files: set, always: List[str]) -> bool:
+    if nodeid in tests or nodeid.split("::", 1)[0] in files:
+        return True
+    return any(fnmatch.fnmatchcase(nodeid, pattern) for pattern in always)
+
+
+# Runs before xdist's loadgroup hook appends group names to node IDs.
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(
+    session: pytest.Session, config: pytest.Config, items: List[pytest.Item]
+) -> None:
+    path = os.environ.get("TEST_IMPACT_SELECTION")
+    if not path:
+        return
+    try:
+        selection = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        print(f"::warning::Ignoring test impact selection {path}: {exc}")
+        return
+    if not isinstance(selection, dict) or selection.get("full", True):
+        return
+
+    tests = set(selection.get("tests", []))
+    files = set(selection.get("files", []))
+    always = list(selection.get("always", []))
+    selected, deselected = [], []
+    for item in items:
+        if _keep(item.nodeid, tests, files, always):
+            selected.append(item)
+        else:
+            deselected.append(item)
+
+    # Under xdist every worker collects the same items; one writes the list.
+    worker = getattr(config, "workerinput", {}).get("workerid", "gw0")
+    output = os.environ.get("TEST_IMPACT_DESELECTED")
+    if output and worker == "gw0":
+        Path(output).write_text(
+            json.dumps([item.nodeid for item in deselected]), encoding="utf-8"
+        )
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
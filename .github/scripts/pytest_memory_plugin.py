@@ -0,0 +1,62 @@
+"""pytest plugin recording the memory each test needed.
+
+Load it with ``-p pytest_memory_plugin`` (the scripts directory must be on
+``sys.path``). Every test, setup and teardown included, is measured with
+``memory_probe.MemoryProbe`` in the process that runs it. The measurement
+rides on the teardown report, so it reaches the controller under xdist as
+well, and is added to each test of the pytest-json-report output as
+``"memory": {"peak": ..., "delta": ...}``. pytest releases function-scoped
+fixture values only after the teardown report, so ``delta`` still counts
+them.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Generator, Optional
+
+import pytest
+
+import memory_probe
+
+PROPERTY = "memory"
+
+_probe = memory_probe.MemoryProbe()
+_measurements: Dict[str, memory_probe.Measurement] = {}
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_runtest_protocol(
+    item: pytest.Item, nextitem: Optional[pytest.Item]
+) -> Generator[None, None, None]:
+    _probe.start()
+    yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo
+) -> Generator[None, None, None]:
+    outcome = yield
+    if call.when == "teardown":
+        outcome.get_result().user_properties.append((PROPERTY, _probe.stop()))
+
+
+def pytest_runtest_logreport(report: pytest.TestReport) -> None:
+    if report.when != "teardown":
+        return
+    for name, value in report.user_properties:
+        if name == PROPERTY and isinstance(value, dict):
+            _measurements[report.nodeid] = value
+
+
+# Before pytest_shard_plugin strips xdist group suffixes from the node IDs.
+@pytest.hookimpl(optionalhook=True, tryfirst=True)
+def pytest_json_modifyreport(json_report: Dict[str, object]) -> None:
+    tests = json_report.get("tests")
+    if not isinstance(tests, list):
+        return
+    for test in tests:
+        if isinstance(test, dict):
+            measurement = _measurements.get(str(test.get("nodeid")))
+            if measurement is not None:
+                test[PROPERTY] = measurement
@@ -0,0 +1,80 @@
+"""pytest plugin applying a ``test_sharding.py`` plan.
+
+Load it with ``-p pytest_shard_plugin`` (the scripts directory must be on
+``sys.path``) and point ``TEST_SHARD_PLAN`` at a plan file:
+
+* with ``TEST_SHARD_INDEX`` set, only that shard's tests run, for matrix
+  jobs that each take one shard;
+* otherwise planned tests are marked ``xdist_group("test-shard-<n>")`` so
+  ``--dist loadgroup`` keeps each shard on one worker. Tests missing from
+  the plan stay ungrouped and are load balanced as usual.
+
+xdist appends the group name to node IDs; the suffix is stripped again from
+the pytest-json-report output so results keep their usual test IDs.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+import test_sharding
+
+GROUP_PREFIX = "test-shard-"
+_GROUP_SUFFIX = re.compile(rf"@{GROUP_PREFIX}\d+$")
+
+
+def strip_group(nodeid: str) -> str:
+    """``nodeid`` without the xdist group suffix added for a shard."""
+    return _GROUP_SUFFIX.sub("", nodeid)
+
+
+def _load_plan() -> Optional[test_sharding.ShardPlan]:
+    path = os.environ.get("TEST_SHARD_PLAN")
+    if not path:
+        return None
+    try:
+        return test_sharding.load_plan(Path(path))
+    except (OSError, test_sharding.ShardPlanError) as exc:
+        print(f"::warning::Ignoring shard plan {path}: {exc}")
+        return None
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(
+    session: pytest.Session, config: pytest.Config, items: List[pytest.Item]
+) -> None:
+    plan = _load_plan()
+    if plan is None:
+        return
+
+    index = os.environ.get("TEST_SHARD_INDEX", "")
+    if index:
+        selected, deselected = [], []
+        for item in items:
+            if plan.shard_for(item.nodeid) == int(index):
+                selected.append(item)
+            else:
+                deselected.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+        return
+
+    for item in items:
+        if plan.is_planned(item.nodeid):
+            group = f"{GROUP_PREFIX}{plan.shard_for(item.nodeid)}"
+            item.add_marker(pytest.mark.xdist_group(group))
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_json_modifyreport(json_report: Dict[str, object]) -> None:
+    tests = json_report.get("tests")
+    if isinstance(tests, list):
+        for test in tests:
+            if isinstance(test, dict) and isinstance(test.get("nodeid"), str):
+                test["nodeid"] = strip_group(test["nodeid"])
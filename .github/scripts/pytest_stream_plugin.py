@@ -0,0 +1,90 @@
+"""pytest plugin appending each finished test to a results stream.
+
+Load it with ``-p pytest_stream_plugin`` (the scripts directory must be on
+``sys.path``) and point ``TEST_RESULTS_STREAM`` at the file to write. Each
+test is written by ``results_stream.ResultsSink`` once its teardown has
+been reported, so the results of completed tests survive a run that is
+killed before pytest-json-report writes its file. Under xdist only the
+controller writes. Measurements from ``pytest_memory_plugin`` are included
+when it is loaded as well.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import pytest
+
+import pytest_shard_plugin
+import results_stream
+
+ENV = "TEST_RESULTS_STREAM"
+
+_sink: Optional[results_stream.ResultsSink] = None
+_running: Dict[str, Dict[str, object]] = {}
+
+
+def _outcome(report: pytest.TestReport) -> str:
+    if hasattr(report, "wasxfail"):
+        if report.skipped:
+            return "xfailed"
+        if report.passed:
+            return "xpassed"
+    if report.failed and report.when != "call":
+        return "error"
+    return report.outcome
+
+
+def _longrepr(report: pytest.TestReport) -> Optional[str]:
+    if not report.longrepr:
+        return None
+    if isinstance(report.longrepr, tuple) and len(report.longrepr) == 3:
+        # Skips carry (path, line, reason).
+        return str(report.longrepr[2])
+    return str(report.longrepr)
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    global _sink
+    path = os.environ.get(ENV)
+    if path and not hasattr(config, "workerinput"):
+        _sink = results_stream.ResultsSink(Path(path))
+
+
+def pytest_runtest_logreport(report: pytest.TestReport) -> None:
+    if _sink is None:
+        return
+    record = _running.setdefault(
+        report.nodeid,
+        {"nodeid": pytest_shard_plugin.strip_group(report.nodeid), "duration": 0.0},
+    )
+    record["duration"] = float(record["duration"]) + report.duration
+    # The call decides the outcome unless setup did not pass or teardown failed.
+    if report.when != "teardown":
+        if record.get("outcome") in (None, "passed"):
+            record["outcome"] = _outcome(report)
+            record["longrepr"] = _longrepr(report)
+        return
+
+    del _running[report.nodeid]
+    if report.failed and record.get("outcome") in (None, "passed", "xpassed"):
+        record["outcome"] = "error"
+        record["longrepr"] = _longrepr(report)
+    record.setdefault("outcome", report.outcome)
+    if record.get("longrepr") is None:
+        record.pop("longrepr", None)
+    # Attached by pytest_memory_plugin.
+    for name, value in report.user_properties:
+        if name == "memory" and isinstance(value, dict):
+            record["memory"] = value
+    _sink.write(record)
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    global _sink
+    if _sink is not None:
+        _sink.finish(int(exitstatus))
+        _sink = None
@@ -0,0 +1,49 @@
+"""pytest plugin recording warnings with the test that raised them.
+
+Load it with ``-p pytest_warnings_plugin`` (the scripts directory must be on
+``sys.path``). pytest-json-report lists warnings without their test; this
+plugin replaces that list with entries carrying ``category``, ``message``,
+``filename``, ``lineno``, ``nodeid`` and ``when``, which
+``test_warnings.py`` turns into comparable keys. xdist forwards the
+warnings of its workers to the controller, so they are included as well.
+"""
+
+from __future__ import annotations
+
+import warnings
+from typing import Dict, List, Optional, Set, Tuple
+
+import pytest
+
+import pytest_shard_plugin
+import test_warnings
+
+_recorded: List[test_warnings.WarningRecord] = []
+_seen: Set[Tuple[object, ...]] = set()
+
+
+def pytest_warning_recorded(
+    warning_message: warnings.WarningMessage,
+    when: str,
+    nodeid: str,
+    location: Optional[Tuple[str, int, str]],
+) -> None:
+    warning: test_warnings.WarningRecord = {
+        "category": warning_message.category.__name__,
+        "message": str(warning_message.message),
+        "filename": test_warnings.relative_path(warning_message.filename),
+        "lineno": warning_message.lineno,
+        "when": when,
+    }
+    if nodeid:
+        warning["nodeid"] = pytest_shard_plugin.strip_group(nodeid)
+    identity = tuple(warning.get(name) for name in test_warnings.FIELDS)
+    # A warning raised in a loop is reported once per test, like pytest does.
+    if identity not in _seen and len(_recorded) < test_warnings.MAX_WARNINGS:
+        _seen.add(identity)
+        _recorded.append(warning)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_json_modifyreport(json_report: Dict[str, object]) -> None:
+    json_report["warnings"] = list(_recorded)
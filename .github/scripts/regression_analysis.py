@@ -0,0 +1,1285 @@
+#!/usr/bin/env python3
+"""Compare baseline and current test results and report state transitions."""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import binascii
+import collections
+import heapq
+import itertools
+import json
+import operator
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import (
+    DefaultDict,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+import duration_regression
+import external_sort
+import flaky_tests
+import json_stream
+import memory_regression
+import results_format
+import results_stream
+import test_warnings
+
+# States ordered from best to worst for matrix display
+# This ordering puts improvements below diagonal, regressions above
+STATES: Tuple[str, ...] = (
+    "Pass",
+    "XPass",
+    "Skip",
+    "XFail",
+    "Fail",
+    "Error",
+    "Nonexistent",
+)
+STATE_KEYS: Tuple[str, ...] = (
+    "passing",
+    "xpassed",
+    "skipped",
+    "xfailed",
+    "failing",
+    "error",
+    "nonexistent",
+)
+NONEXISTENT_BIT = 1 << STATES.index("Nonexistent")
+# Result keys of each state in the legacy layout and status in the compact one.
+LEGACY_KEYS: Tuple[Tuple[str, str], ...] = (
+    ("passing", "passing_tests"),
+    ("failing", "failing_tests"),
+    ("error", "error_tests"),
+    ("skipped", "skipped_tests"),
+    ("xfailed", "xfailed_tests"),
+    ("xpassed", "xpassed_tests"),
+)
+COMPACT_KEYS: Tuple[Tuple[str, str], ...] = (
+    ("passing", "passed"),
+    ("failing", "failed"),
+    ("error", "error"),
+    ("skipped", "skipped"),
+    ("xfailed", "xfailed"),
+    ("xpassed", "xpassed"),
+)
+# Pass/fail flips that a known-flaky test may produce without signalling a
+# real regression.
+FLAKY_TRANSITIONS: Tuple[Tuple[str, str], ...] = tuple(
+    (from_state, to_state)
+    for from_state in ("Pass", "XPass")
+    for to_state in ("Fail", "Error")
+)
+
+# Inputs larger than this, together, are compared out of core.
+OUT_OF_CORE_THRESHOLD_MIB = 256.0
+# Flags of a test on one side of an out-of-core comparison, after the state
+# bits: listed among the side's tests, and deselected by the current run.
+LISTED_FLAG = NONEXISTENT_BIT << 1
+DESELECTED_FLAG = NONEXISTENT_BIT << 2
+# Marks a legacy result until the side is known to have, or lack, an
+# ``all_tests`` list.
+IMPLICIT_FLAG = NONEXISTENT_BIT << 3
+STATE_FLAGS: Dict[str, int] = {
+    key: 1 << index for index, key in enumerate(STATE_KEYS[:-1])
+}
+
+# Top-level result keys read when a side is scanned out of core.
+SCAN_KEYS = frozenset(
+    (
+        "format",
+        "ids",
+        "status",
+        "durations",
+        "memory",
+        "warnings",
+        "all_tests",
+        "tests",
+        results_format.DESELECTED,
+        results_format.LEGACY_DURATIONS,
+        results_format.LEGACY_MEMORY,
+    )
+    + tuple(name for _, name in LEGACY_KEYS)
+)
+
+Transitions = Dict[Tuple[str, str], Sequence[str]]
+
+
+def load_json(path: Path) -> dict:
+    if not path.exists():
+        print(f"::warning::Input file {path} not found. Using empty defaults.")
+        return {}
+
+    if results_stream.is_stream(path):
+        # Read line by line into the compact layout rather than as one document.
+        return results_stream.read_table(path).to_payload()
+
+    content = path.read_text(encoding="utf-8").strip()
+    if not content:
+        print(f"::warning::Input file {path} is empty. Using empty defaults.")
+        return {}
+
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as exc:
+        print(f"::warning::Failed to parse JSON from {path}: {exc}")
+        return {}
+
+
+def coerce_list(value: object) -> List[str]:
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return []
+
+
+def warning_set(raw: dict) -> Set[str]:
+    """Warning keys; structured pytest-json-report entries are normalised."""
+    values = raw.get("warnings")
+    if not isinstance(values, list):
+        return set()
+    keys = {str(item) for item in values if not isinstance(item, dict)}
+    keys.update(test_warnings.keys(test_warnings.from_report(raw) or []))
+    return keys
+
+
+def _entry_status(status: str) -> str:
+    status = status.lower()
+    if status in {"passed", "pass"}:
+        return "passing"
+    if status in {"failed", "fail"}:
+        return "failing"
+    if status == "error":
+        return "error"
+    if status in {"skipped", "skip"}:
+        return "skipped"
+    if status in {"xfailed", "xfail"}:
+        return "xfailed"
+    if status in {"xpassed", "xpass"}:
+        return "xpassed"
+    return "other"
+
+
+def tests_array_entry(entry: object) -> Optional[Tuple[str, str]]:
+    """(status key, test ID) of one ``tests`` array entry, None to skip it."""
+    if not isinstance(entry, dict):
+        return None
+    test_id = entry.get("id") or entry.get("name") or entry.get("nodeid")
+    if not test_id:
+        return None
+    status = entry.get("status") or entry.get("outcome")
+    if not status:
+        return None
+    return _entry_status(status), str(test_id)
+
+
+def tests_array_entries(results: dict) -> Iterator[Tuple[str, str]]:
+    """(status key, test ID) for each entry of a ``tests`` array."""
+    tests = results.get("tests")
+    if not isinstance(tests, list):
+        return
+
+    for entry in tests:
+        found = tests_array_entry(entry)
+        if found:
+            yield found
+
+
+def extract_from_tests_array(results: dict, data: Dict[str, Set[str]]) -> None:
+    for key, test_id in tests_array_entries(results):
+        data[key].add(test_id)
+
+
+def _decode_compact(raw: dict) -> results_format.ResultsTable:
+    try:
+        return results_format.ResultsTable.from_payload(raw)
+    except results_format.ResultsFormatError as exc:
+        print(f"::warning::Failed to decode compact results: {exc}")
+        return results_format.ResultsTable()
+
+
+def _compact_status_sets(raw: dict) -> Dict[str, Set[str]]:
+    table = _decode_compact(raw)
+    groups = table.by_status()
+    data = {key: groups[status] for key, status in COMPACT_KEYS}
+    data["warnings"] = set(table.warnings)
+    data["all"] = set(table.ids)
+    data["other"] = groups["other"]
+    return data
+
+
+def build_status_sets(raw: dict) -> Dict[str, Set[str]]:
+    if results_format.is_compact(raw):
+        return _compact_status_sets(raw)
+
+    data = {key: set(coerce_list(raw.get(name))) for key, name in LEGACY_KEYS}
+    data["warnings"] = warning_set(raw)
+    data["all"] = set(coerce_list(raw.get("all_tests")))
+    data["other"] = set()
+
+    extract_from_tests_array(raw, data)
+
+    if not data["all"]:
+        data["all"].update(
+            data["passing"]
+            | data["failing"]
+            | data["error"]
+            | data["skipped"]
+            | data["xfailed"]
+            | data["xpassed"]
+            | data["other"]
+        )
+
+    return data
+
+
+def classify_transition(from_state: str, to_state: str) -> str:
+    """Classify a state transition as regression, improvement, neutral, or new."""
+    if from_state == to_state:
+        return "diagonal"
+    if from_state == "Nonexistent":
+        return "new"
+
+    # Regressions (bold): moving to a worse state
+    # Anything to Fail or Error is regression
+    if to_state in ["Fail", "Error"]:
+        return "regression"
+    # Anything to Nonexistent is regression
+    if to_state == "Nonexistent":
+        return "regression"
+    # Pass/XPass to anything else (except each other) is regression
+    if from_state == "Pass" and to_state != "XPass":
+        return "regression"
+    if from_state == "XPass" and to_state != "Pass":
+        return "regression"
+
+    # Neutrals
+    if from_state == "Fail" and to_state == "XFail":
+        return "neutral"
+    if from_state == "Skip" and to_state == "XFail":
+        return "neutral"
+    # Pass <-> XPass is neutral (just adding/removing xfail marker)
+    if from_state == "Pass" and to_state == "XPass":
+        return "neutral"
+    if from_state == "XPass" and to_state == "Pass":
+        return "neutral"
+
+    # Improvements (italic): moving to a better state
+    if to_state in ["Pass", "XPass"]:
+        return "improvement"
+    if from_state in ["Fail", "Error"] and to_state == "Skip":
+        return "improvement"
+    if from_state == "Error" and to_state in ["XFail", "Fail"]:
+        return "improvement"
+    if from_state == "XFail" and to_state == "Skip":
+        return "improvement"
+
+    return "neutral"
+
+
+def format_cell(count: int, classification: str) -> str:
+    """Format a cell value based on its classification."""
+    if classification == "diagonal":
+        return "-"
+    if count == 0:
+        return "0"
+    if classification == "regression":
+        return f"**{count}**"
+    if classification == "improvement":
+        return f"*{count}*"
+    return str(count)
+
+
+def _state_masks(data: Dict[str, Set[str]], missing: Set[str]) -> Dict[str, int]:
+    """Map every test ID to a bitmask of the states it holds on one side.
+
+    A test listed under several result keys keeps every matching bit, which
+    mirrors the set intersections the matrix has always been built from.
+    ``missing`` are IDs known from the other side only (``Nonexistent``).
+    """
+    masks: Dict[str, int] = {}
+    flags = [1 << bit for bit in range(len(STATE_KEYS) - 1)] + [NONEXISTENT_BIT]
+    sets = [data.get(key, set()) for key in STATE_KEYS[:-1]] + [missing]
+    for flag, ids in zip(flags, sets):
+        if not ids:
+            continue
+        # Tests normally hold a single state, so overlaps are found with set
+        # algebra and only those few IDs are merged one by one.
+        for test_id in masks.keys() & ids:
+            masks[test_id] |= flag
+        masks.update(dict.fromkeys(ids.difference(masks), flag))
+    return masks
+
+
+# Bit positions set in each possible mask, computed once.
+_MASK_STATES: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(bit for bit in range(len(STATES)) if mask & (1 << bit))
+    for mask in range(1 << len(STATES))
+)
+
+
+def compute_transitions(
+    baseline: Dict[str, Set[str]], current: Dict[str, Set[str]]
+) -> Transitions:
+    """Bucket every test by its (baseline state, current state) pair.
+
+    Each ID is visited once and grouped by its pair of state masks; only the
+    groups that occur are sorted and fanned out to the matrix cells, and a
+    cell is re-sorted only when more than one group feeds it.
+    """
+    baseline_masks = _state_masks(baseline, current["all"] - baseline["all"])
+    current_masks = _state_masks(current, baseline["all"] - current["all"])
+
+    size = len(STATES)
+    groups: DefaultDict[int, List[str]] = defaultdict(list)
+    current_mask = current_masks.get
+    for test_id, from_mask in baseline_masks.items():
+        to_mask = current_mask(test_id)
+        if to_mask:
+            groups[from_mask << size | to_mask].append(test_id)
+
+    buckets: List[List[str]] = [[] for _ in range(size * size)]
+    merged: Set[int] = set()
+    for pair, members in groups.items():
+        members.sort()
+        to_bits = _MASK_STATES[pair & ((1 << size) - 1)]
+        for from_bit in _MASK_STATES[pair >> size]:
+            for to_bit in to_bits:
+                cell = from_bit * size + to_bit
+                if buckets[cell]:
+                    merged.add(cell)
+                buckets[cell].extend(members)
+    for cell in merged:
+        buckets[cell].sort()
+
+    transitions: Transitions = {}
+    for from_index, from_state in enumerate(STATES):
+        for to_index, to_state in enumerate(STATES):
+            transitions[(from_state, to_state)] = buckets[from_index * size + to_index]
+    return transitions
+
+
+def drop_not_run(baseline: Dict[str, Set[str]], current_raw: dict) -> Set[str]:
+    """Leave tests the current run deliberately skipped out of the baseline.
+
+    Runs that select a subset of the suite (test impact selection) list the
+    rest under ``deselected_tests``; comparing them would report every one
+    as a Pass -> Nonexistent regression.
+    """
+    not_run = set(coerce_list(current_raw.get("deselected_tests")))
+    if not_run:
+        for key, tests in baseline.items():
+            if key != "warnings":
+                tests -= not_run
+    return not_run
+
+
+def split_flaky(transitions: Transitions, flaky: Set[str]) -> Transitions:
+    """Move known-flaky tests out of pass/fail regression cells.
+
+    ``transitions`` is updated in place; the moved tests are returned keyed
+    by the cell they came from.
+    """
+    moved: Transitions = {}
+    if not flaky:
+        return moved
+    for key in FLAKY_TRANSITIONS:
+        tests = transitions[key]
+        flaky_tests_in_cell = [test for test in tests if test in flaky]
+        if flaky_tests_in_cell:
+            transitions[key] = [test for test in tests if test not in flaky]
+            moved[key] = flaky_tests_in_cell
+    return moved
+
+
+class Comparison(NamedTuple):
+    transitions: Transitions
+    flaky: Transitions
+    discovery_warnings: List[str]
+    regressed: int
+    not_run: int
+    # (test ID, value) pairs sorted by test ID.
+    baseline_durations: "Measured"
+    current_durations: "Measured"
+    baseline_peaks: "Measured"
+    current_peaks: "Measured"
+
+
+def compare_in_memory(
+    baseline_path: Path, current_path: Path, known_flaky: Set[str]
+) -> Comparison:
+    baseline_raw = load_json(baseline_path)
+    current_raw = load_json(current_path)
+    baseline_data = build_status_sets(baseline_raw)
+    current_data = build_status_sets(current_raw)
+    not_run = drop_not_run(baseline_data, current_raw)
+
+    transitions = compute_transitions(baseline_data, current_data)
+    flaky = split_flaky(transitions, known_flaky)
+
+    # Discovery warnings (separate from state transitions)
+    discovery_warnings = sorted(current_data["warnings"] - baseline_data["warnings"])
+
+    regressed: Set[str] = set()
+    for (from_state, to_state), tests in transitions.items():
+        if tests and classify_transition(from_state, to_state) == "regression":
+            regressed.update(tests)
+
+    return Comparison(
+        transitions,
+        flaky,
+        discovery_warnings,
+        len(regressed),
+        len(not_run),
+        sorted(duration_regression.durations_from_payload(baseline_raw).items()),
+        sorted(duration_regression.durations_from_payload(current_raw).items()),
+        sorted(memory_regression.peaks_from_payload(baseline_raw).items()),
+        sorted(memory_regression.peaks_from_payload(current_raw).items()),
+    )
+
+
+class Measurements:
+    """(test ID, value) pairs of one scanned side, sorted by test ID.
+
+    The sorter holds ``(test ID, *rank, value)`` records. The highest ranked
+    record of a test wins and a ``None`` value drops the test, as a later
+    entry replaces an earlier one when a payload is decoded. ``len`` counts
+    the tests yielded by the last iteration.
+    """
+
+    def __init__(self, sorter: external_sort.ExternalSorter) -> None:
+        self.sorter = sorter
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Tuple[str, float]]:
+        self.count = 0
+        for test_id, group in itertools.groupby(self.sorter, operator.itemgetter(0)):
+            value = collections.deque(group, maxlen=1)[0][-1]
+            if value is not None:
+                self.count += 1
+                yield test_id, value
+
+
+Measured = Union[List[Tuple[str, float]], Measurements]
+
+
+def _peak(values: Dict[str, int]) -> Optional[float]:
+    return float(values["peak"]) if "peak" in values else None
+
+
+class SideScan:
+    """One side of an out-of-core comparison, read once onto disk.
+
+    JSON results are read as a stream of parse events and results streams
+    record by record. ``flags()`` yields the state flags of each test the
+    way ``build_status_sets`` would classify it, and ``durations`` and
+    ``peaks`` hold the values of ``durations_from_payload`` and
+    ``peaks_from_payload``, all sorted by test ID. Records go to external
+    sorters as they are read; only the compact status column, one byte per
+    test, and the warnings are kept in memory.
+    """
+
+    def __init__(
+        self, path: Path, directory: Path, name: str, current: bool = False
+    ) -> None:
+        self.directory = directory
+        self.name = name
+        self.current = current
+        self.warnings: Set[str] = set()
+        self._generation = itertools.count()
+        self._deselected = self._sorter("deselected")
+        self._reset()
+
+        if not path.exists():
+            print(f"::warning::Input file {path} not found. Using empty defaults.")
+        elif results_stream.is_stream(path):
+            self._scan_stream(path)
+        elif _is_blank(path):
+            print(f"::warning::Input file {path} is empty. Using empty defaults.")
+        else:
+            try:
+                self._scan_document(path)
+            except json_stream.JSONStreamError as exc:
+                print(f"::warning::Failed to parse JSON from {path}: {exc}")
+                self._deselected = self._sorter("deselected")
+                self._reset()
+
+    def _sorter(self, kind: str) -> external_sort.ExternalSorter:
+        return external_sort.ExternalSorter(
+            self.directory, f"{self.name}-{kind}-{next(self._generation)}"
+        )
+
+    def _reset(self) -> None:
+        # Without an ``all_tests`` list, every test with a result is listed.
+        self.listed = False
+        self._flags = self._sorter("flags")
+        self.durations = Measurements(self._sorter("durations"))
+        self.peaks = Measurements(self._sorter("peaks"))
+
+    def flags(self) -> Iterator[Tuple[str, int]]:
+        """(test ID, flags) with the flags of the highest rank OR-ed."""
+        implicit = 0 if self.listed else LISTED_FLAG
+        records = heapq.merge(self._flags, self._deselected)
+        for test_id, group in itertools.groupby(records, operator.itemgetter(0)):
+            rank = None
+            flags = 0
+            for _, record_rank, flag in group:
+                if record_rank != rank:
+                    rank = record_rank
+                    flags = 0
+                flags |= flag
+            if flags & IMPLICIT_FLAG:
+                flags = flags & ~IMPLICIT_FLAG | implicit
+            yield test_id, flags
+
+    def _scan_stream(self, path: Path) -> None:
+        # A later record for the same ID replaces its status, as in
+        # ``results_stream.read_table``.
+        for seq, record in enumerate(results_stream.StreamReader(path)):
+            test_id = str(record["nodeid"])
+            status = results_format.normalise_status(record.get("outcome"))
+            code = results_format.STATUS_CODES[status]
+            self._flags.add((test_id, seq, _FLAGS_BY_CODE.get(code, 0) | LISTED_FLAG))
+            seconds = results_format.report_duration(record)
+            if seconds is not None:
+                self.durations.sorter.add((test_id, 0, seq, seconds))
+            values = results_format.memory_values(record.get("memory"))
+            if values:
+                self.peaks.sorter.add((test_id, 0, seq, _peak(values)))
+
+    def _scan_document(self, path: Path) -> None:
+        layout = None
+        ids = self._sorter("ids")
+        ids_listed = False
+        id_count = 0
+        status: object = ""
+        durations = self._sorter("compact-durations")
+        memory = self._sorter("compact-memory")
+        warnings: Optional[List[object]] = None
+        states = {name: STATE_FLAGS[key] for key, name in LEGACY_KEYS}
+        with path.open("r", encoding="utf-8") as handle:
+            members = json_stream.iter_members(handle, SCAN_KEYS)
+            for position, (key, index, value) in enumerate(members):
+                if index is None:
+                    # Scalars and empty containers.
+                    if key == "format":
+                        layout = value
+                    elif key == "ids":
+                        ids_listed = isinstance(value, list)
+                    elif key == "status":
+                        status = value
+                    elif key == "warnings" and isinstance(value, list):
+                        warnings = []
+                elif isinstance(index, str):
+                    # Members of the legacy per-test maps.
+                    if key == results_format.LEGACY_DURATIONS:
+                        if isinstance(value, (int, float)):
+                            self.durations.sorter.add(
+                                (index, 1, position, float(value))
+                            )
+                    elif key == results_format.LEGACY_MEMORY:
+                        peak = _peak(results_format.memory_values(value))
+                        self.peaks.sorter.add((index, 1, position, peak))
+                    elif key == "status":
+                        status = None
+                elif key == "ids":
+                    ids_listed = True
+                    ids.add((index, str(value)))
+                    id_count += 1
+                elif key == "durations":
+                    durations.add((index, value))
+                elif key == "memory":
+                    memory.add((index, value))
+                elif key == "status":
+                    status = None
+                elif key == "warnings":
+                    if warnings is None:
+                        warnings = []
+                    warnings.append(value)
+                elif key == results_format.DESELECTED:
+                    if self.current:
+                        self._deselected.add((str(value), 0, DESELECTED_FLAG))
+                elif key == "all_tests":
+                    self.listed = True
+                    self._flags.add((str(value), 0, LISTED_FLAG))
+                elif key == "tests":
+                    self._scan_tests_entry(value, position)
+                elif key in states:
+                    self._flags.add((str(value), 0, states[key] | IMPLICIT_FLAG))
+
+        if layout != results_format.FORMAT:
+            if warnings is not None:
+                self.warnings = warning_set({"warnings": warnings})
+            return
+
+        self._reset()
+        try:
+            codes = _compact_codes(ids_listed, status, id_count)
+        except results_format.ResultsFormatError as exc:
+            print(f"::warning::Failed to decode compact results: {exc}")
+            return
+        rows = zip(
+            ids,
+            codes,
+            itertools.chain(durations, itertools.repeat((None, None))),
+            itertools.chain(memory, itertools.repeat((None, None))),
+        )
+        for (index, test_id), code, (_, seconds), (_, row) in rows:
+            self._flags.add((test_id, 0, _FLAGS_BY_CODE.get(code, 0) | LISTED_FLAG))
+            if isinstance(seconds, (int, float)):
+                self.durations.sorter.add((test_id, 0, index, float(seconds)))
+            values = results_format.memory_from_row(row)
+            if values:
+                self.peaks.sorter.add((test_id, 0, index, _peak(values)))
+        if warnings is not None:
+            self.warnings = {str(item) for item in warnings}
+
+    def _scan_tests_entry(self, entry: object, position: int) -> None:
+        found = tests_array_entry(entry)
+        if found:
+            key, test_id = found
+            self._flags.add((test_id, 0, STATE_FLAGS.get(key, 0) | IMPLICIT_FLAG))
+        if not isinstance(entry, dict):
+            return
+        test_id = entry.get("id") or entry.get("name") or entry.get("nodeid")
+        seconds = entry.get("duration")
+        if test_id and isinstance(seconds, (int, float)):
+            self.durations.sorter.add((str(test_id), 0, position, float(seconds)))
+        if entry.get("nodeid"):
+            peak = _peak(results_format.memory_values(entry.get("memory")))
+            self.peaks.sorter.add((str(entry["nodeid"]), 0, position, peak))
+
+
+_FLAGS_BY_CODE: Dict[int, int] = {
+    results_format.STATUS_CODES[status]: STATE_FLAGS[key]
+    for key, status in COMPACT_KEYS
+}
+
+
+def _compact_codes(ids_listed: bool, status: object, count: int) -> bytes:
+    """The status column, validated as ``ResultsTable.from_payload`` does."""
+    if not ids_listed:
+        raise results_format.ResultsFormatError("'ids' must be a list")
+    if status is None:
+        raise results_format.ResultsFormatError("invalid status column")
+    try:
+        codes = base64.b64decode(str(status), validate=True)
+    except (binascii.Error, ValueError) as exc:
+        raise results_format.ResultsFormatError(
+            f"invalid status column: {exc}"
+        ) from None
+    if len(codes) != count:
+        raise results_format.ResultsFormatError(
+            f"status column has {len(codes)} entries for {count} IDs"
+        )
+    if codes and max(codes) >= len(results_format.STATUSES):
+        raise results_format.ResultsFormatError("unknown status code in status column")
+    return codes
+
+
+def _is_blank(path: Path) -> bool:
+    with path.open("r", encoding="utf-8") as handle:
+        for chunk in iter(lambda: handle.read(json_stream.DEFAULT_CHUNK_SIZE), ""):
+            if chunk.strip():
+                return False
+    return True
+
+
+def _merge_join(
+    baseline: Iterator[Tuple[str, int]], current: Iterator[Tuple[str, int]]
+) -> Iterator[Tuple[str, int, int]]:
+    """(test ID, baseline flags, current flags) over two sorted streams."""
+    base = next(baseline, None)
+    cur = next(current, None)
+    while base is not None or cur is not None:
+        if cur is None or (base is not None and base[0] < cur[0]):
+            yield base[0], base[1], 0  # type: ignore[index]
+            base = next(baseline, None)
+        elif base is None or cur[0] < base[0]:
+            yield cur[0], 0, cur[1]
+            cur = next(current, None)
+        else:
+            yield base[0], base[1], cur[1]
+            base = next(baseline, None)
+            cur = next(current, None)
+
+
+def compare_out_of_core(
+    baseline_path: Path, current_path: Path, known_flaky: Set[str], directory: Path
+) -> Comparison:
+    """Compare like ``compare_in_memory`` without decoding either input whole.
+
+    Each side is scanned once into (test ID, state flags) records and
+    duration and peak records, all sorted on disk, and the flag streams are
+    merge-joined. Test IDs reach every matrix cell in sorted order and are
+    written straight to per-cell files; the durations and peaks stay sorted
+    on disk for a merge-join against the baseline.
+    """
+    baseline = SideScan(baseline_path, directory, "baseline")
+    current = SideScan(current_path, directory, "current", current=True)
+
+    size = len(STATES)
+    regression_cells = {
+        from_index * size + to_index
+        for from_index, from_state in enumerate(STATES)
+        for to_index, to_state in enumerate(STATES)
+        if classify_transition(from_state, to_state) == "regression"
+    }
+    flaky_cells = {
+        STATES.index(from_state) * size + STATES.index(to_state)
+        for from_state, to_state in FLAKY_TRANSITIONS
+    }
+    cells: Dict[int, external_sort.SpillWriter] = {}
+    flaky_writers: Dict[int, external_sort.SpillWriter] = {}
+    regressed = 0
+    not_run = 0
+    joined = _merge_join(baseline.flags(), current.flags())
+    for test_id, base, cur in joined:
+        if cur & DESELECTED_FLAG:
+            not_run += 1
+            base = 0
+        from_mask = base & (NONEXISTENT_BIT - 1)
+        to_mask = cur & (NONEXISTENT_BIT - 1)
+        if cur & LISTED_FLAG and not base & LISTED_FLAG:
+            from_mask |= NONEXISTENT_BIT
+        if base & LISTED_FLAG and not cur & LISTED_FLAG:
+            to_mask |= NONEXISTENT_BIT
+        if not (from_mask and to_mask):
+            continue
+        is_regression = False
+        for from_bit in _MASK_STATES[from_mask]:
+            for to_bit in _MASK_STATES[to_mask]:
+                cell = from_bit * size + to_bit
+                writers = cells
+                if cell in flaky_cells and test_id in known_flaky:
+                    writers = flaky_writers
+                else:
+                    is_regression = is_regression or cell in regression_cells
+                writer = writers.get(cell)
+                if writer is None:
+                    prefix = "flaky" if writers is flaky_writers else "cell"
+                    writer = external_sort.SpillWriter(
+                        directory / f"{prefix}-{cell}.list"
+                    )
+                    writers[cell] = writer
+                writer.append(test_id)
+        regressed += is_regression
+
+    transitions: Transitions = {}
+    for from_index, from_state in enumerate(STATES):
+        for to_index, to_state in enumerate(STATES):
+            writer = cells.get(from_index * size + to_index)
+            transitions[(from_state, to_state)] = (
+                writer.close() if writer else external_sort.SpilledList()
+            )
+    flaky: Transitions = {}
+    for key in FLAKY_TRANSITIONS:
+        writer = flaky_writers.get(STATES.index(key[0]) * size + STATES.index(key[1]))
+        if writer:
+            flaky[key] = writer.close()
+
+    return Comparison(
+        transitions,
+        flaky,
+        sorted(current.warnings - baseline.warnings),
+        regressed,
+        not_run,
+        baseline.durations,
+        current.durations,
+        baseline.peaks,
+        current.peaks,
+    )
+
+
+def out_of_core(paths: Sequence[Path], threshold_mib: float) -> bool:
+    size = sum(path.stat().st_size for path in paths if path.exists())
+    return size >= threshold_mib * 1024 * 1024
+
+
+def write_section(handle: TextIO, title: str, entries: List[str], intro: str) -> None:
+    if not entries:
+        return
+    handle.write(f"{title} ({len(entries)} tests)\n")
+    handle.write(f"{intro}\n")
+    for idx, test_name in enumerate(entries, 1):
+        handle.write(f"  {idx}. {test_name}\n")
+    handle.write("\n")
+
+
+def write_report(
+    path: Path,
+    transitions: Transitions,
+    discovery_warnings: List[str],
+    has_regressions: bool,
+    flaky: Optional[Transitions] = None,
+    slower: Sequence[duration_regression.DurationRegression] = (),
+    heavier: Sequence[memory_regression.MemoryRegression] = (),
+) -> None:
+    with path.open("w", encoding="utf-8") as report:
+        report.write("COMPREHENSIVE REGRESSION ANALYSIS\n")
+        report.write("=" * 50 + "\n\n")
+
+        for kind, label in (
+            ("regression", "REGRESSIONS"),
+            ("improvement", "IMPROVEMENTS"),
+        ):
+            for from_state in STATES:
+                for to_state in STATES:
+                    tests = transitions[(from_state, to_state)]
+                    if tests and classify_transition(from_state, to_state) == kind:
+                        write_section(
+                            report,
+                            f"{from_state.upper()}-TO-{to_state.upper()} {label}",
+                            tests,
+                            f"Previously {from_state.lower()}, now {to_state.lower()}:",
+                        )
+
+        for (from_state, to_state), tests in (flaky or {}).items():
+            write_section(
+                report,
+                f"{from_state.upper()}-TO-{to_state.upper()} KNOWN FLAKY",
+                tests,
+                "Known-flaky tests excluded from the regressions above:",
+            )
+
+        if discovery_warnings:
+            report.write(f"DISCOVERY WARNINGS ({len(discovery_warnings)} new)\n")
+            report.write("New warnings not present in baseline:\n")
+            for idx, warning in enumerate(discovery_warnings, 1):
+                truncated = (warning[:200] + "...") if len(warning) > 200 else warning
+                report.write(f"  {idx}. {truncated}\n")
+            report.write("\n")
+
+        duration_regression.write_report_section(report, slower)
+        memory_regression.write_report_section(report, heavier)
+
+        for to_state in STATES:
+            if to_state == "Nonexistent":
+                continue
+            tests = transitions[("Nonexistent", to_state)]
+            if tests:
+                write_section(
+                    report,
+                    f"NEW TESTS ({to_state.upper()})",
+                    tests,
+                    f"New tests in {to_state.lower()} state:",
+                )
+
+        if not has_regressions:
+            any_changes = any(
+                len(tests) > 0 for (f, t), tests in transitions.items() if f != t
+            )
+            if not (any_changes or discovery_warnings or slower or heavier):
+                report.write("No regressions or test suite changes detected.\n")
+
+
+def write_details(path: Path, transitions: Transitions) -> None:
+    """Write pass-to-fail details for backwards compatibility."""
+    pass_to_fail = transitions[("Pass", "Fail")]
+    if pass_to_fail:
+        with path.open("w", encoding="utf-8") as handle:
+            handle.write(
+                f"Found {len(pass_to_fail)} tests that regressed from pass to fail:\n\n"
+            )
+            for idx, test_name in enumerate(pass_to_fail, 1):
+                handle.write(f"{idx}. {test_name}\n")
+    else:
+        path.write_text("No pass-to-fail regressions detected.\n", encoding="utf-8")
+
+
+def build_matrix_table(
+    transitions: Transitions, baseline_label: str, current_label: str
+) -> List[str]:
+    """Build markdown matrix table with state transitions."""
+    header = f"| {baseline_label} ↓ / {current_label} → | " + " | ".join(STATES) + " |"
+    separator = "| --- | " + " | ".join(["---"] * len(STATES)) + " |"
+
+    rows = [header, separator]
+
+    for from_state in STATES:
+        cells = []
+        for to_state in STATES:
+            count = len(transitions[(from_state, to_state)])
+            classification = classify_transition(from_state, to_state)
+            cells.append(format_cell(count, classification))
+        rows.append(f"| {from_state} | " + " | ".join(cells) + " |")
+
+    return rows
+
+
+def write_summary_section(
+    handle: TextIO, title: str, tests: List[str], max_show: int = 20
+) -> None:
+    """Write a collapsible section with test names to the summary."""
+    if not tests:
+        return
+    handle.write(
+        f"\n<details>\n<summary><strong>{title}</strong> ({len(tests)} tests)</summary>\n\n"
+    )
+    handle.write("```\n")
+    for test in tests[:max_show]:
+        handle.write(f"{test}\n")
+    if len(tests) > max_show:
+        handle.write(
+            f"\n... and {len(tests) - max_show} more (see artifacts for full list)\n"
+        )
+    handle.write("```\n</details>\n")
+
+
+def write_step_summary(
+    path: Path,
+    transitions: Transitions,
+    discovery_warnings: List[str],
+    matrix: List[str],
+    flaky: Optional[Transitions] = None,
+    slower: Sequence[duration_regression.DurationRegression] = (),
+    heavier: Sequence[memory_regression.MemoryRegression] = (),
+) -> None:
+    with path.open("a", encoding="utf-8") as summary_file:
+        summary_file.write("### Regression Matrix\n\n")
+        summary_file.write(
+            "**Bold** = regression, *Italic* = improvement, `-` = no change\n\n"
+        )
+        summary_file.write("\n".join(matrix) + "\n")
+        flaky_count = sum(map(len, (flaky or {}).values()))
+        if flaky_count:
+            summary_file.write(
+                f"\n🔁 {flaky_count} known-flaky transition(s) excluded from the "
+                "matrix.\n"
+            )
+
+        # Discovery warnings section (between matrix and details)
+        if discovery_warnings:
+            summary_file.write(
+                f"\n### New Discovery Warnings ({len(discovery_warnings)})\n\n"
+            )
+            summary_file.write("<details>\n<summary>View warnings</summary>\n\n")
+            summary_file.write("```\n")
+            for warning in discovery_warnings[:10]:
+                truncated = (warning[:300] + "...") if len(warning) > 300 else warning
+                summary_file.write(f"{truncated}\n\n")
+            if len(discovery_warnings) > 10:
+                summary_file.write(f"... and {len(discovery_warnings) - 10} more\n")
+            summary_file.write("```\n</details>\n")
+
+        duration_regression.write_summary_section(summary_file, slower)
+        memory_regression.write_summary_section(summary_file, heavier)
+
+        summary_file.write("\n### Test Details\n")
+
+        # Regressions first, then improvements, then neutrals
+        for kind, icon in (
+            ("regression", "❌"),
+            ("improvement", "✅"),
+            ("neutral", "➡️"),
+        ):
+            for from_state in STATES:
+                for to_state in STATES:
+                    tests = transitions[(from_state, to_state)]
+                    if tests and classify_transition(from_state, to_state) == kind:
+                        write_summary_section(
+                            summary_file, f"{icon} {from_state} → {to_state}", tests
+                        )
+
+        for (from_state, to_state), tests in (flaky or {}).items():
+            write_summary_section(
+                summary_file, f"🔁 Flaky {from_state} → {to_state}", tests
+            )
+
+        for to_state in STATES:
+            if to_state == "Nonexistent":
+                continue
+            tests = transitions[("Nonexistent", to_state)]
+            if tests:
+                write_summary_section(summary_file, f"🆕 New {to_state}", tests)
+
+
+def sanitize(value: str) -> str:
+    return value.replace("%", "%25").replace("\n", "%0A").replace("\r", "%0D")
+
+
+def build_outputs(
+    transitions: Transitions,
+    discovery_warnings: List[str],
+    regression_count: int,
+    flaky: Optional[Transitions] = None,
+    slower: Sequence[duration_regression.DurationRegression] = (),
+    heavier: Sequence[memory_regression.MemoryRegression] = (),
+) -> Dict[str, str]:
+    """Backwards compatible outputs plus new matrix counts."""
+    pass_to_skip = len(transitions[("Pass", "Skip")]) + len(
+        transitions[("Pass", "XFail")]
+    )
+    return {
+        "has_regressions": "true" if regression_count > 0 else "false",
+        "regression_count": str(regression_count),
+        "pass_to_fail_count": str(len(transitions[("Pass", "Fail")])),
+        "pass_to_skip_count": str(pass_to_skip),
+        "pass_to_gone_count": str(len(transitions[("Pass", "Nonexistent")])),
+        "fail_to_gone_count": str(len(transitions[("Fail", "Nonexistent")])),
+        "discovery_regression_count": str(len(discovery_warnings)),
+        "fail_to_skip_count": str(len(transitions[("Fail", "Skip")])),
+        "fail_to_pass_count": str(len(transitions[("Fail", "Pass")])),
+        "new_tests_count": str(
+            sum(
+                len(transitions[("Nonexistent", s)])
+                for s in STATES
+                if s != "Nonexistent"
+            )
+        ),
+        "flaky_count": str(sum(map(len, (flaky or {}).values()))),
+        "duration_regression_count": str(len(slower)),
+        "memory_regression_count": str(len(heavier)),
+    }
+
+
+def analyse(
+    baseline_path: Path,
+    current_path: Path,
+    output_dir: Path,
+    baseline_label: str,
+    current_label: str,
+    summary_path: Optional[Path] = None,
+    github_output: Optional[Path] = None,
+    flaky_path: Optional[Path] = None,
+    duration_samples: Sequence[Path] = (),
+    relative_threshold: float = duration_regression.DEFAULT_RELATIVE_THRESHOLD,
+    absolute_threshold: float = duration_regression.DEFAULT_ABSOLUTE_THRESHOLD,
+    noise_factor: float = duration_regression.DEFAULT_NOISE_FACTOR,
+    memory_relative_threshold: float = memory_regression.DEFAULT_RELATIVE_THRESHOLD,
+    memory_absolute_threshold: float = memory_regression.DEFAULT_ABSOLUTE_THRESHOLD_MIB,
+    out_of_core_threshold: float = OUT_OF_CORE_THRESHOLD_MIB,
+) -> Dict[str, str]:
+    known_flaky = set(flaky_tests.load_flaky(flaky_path)) if flaky_path else set()
+    spill_dir = None
+    if out_of_core((baseline_path, current_path), out_of_core_threshold):
+        print("Comparing results out of core.")
+        spill_dir = tempfile.TemporaryDirectory(
+            prefix="regression-", dir=os.environ.get("RUNNER_TEMP")
+        )
+        comparison = compare_out_of_core(
+            baseline_path, current_path, known_flaky, Path(spill_dir.name)
+        )
+    else:
+        comparison = compare_in_memory(baseline_path, current_path, known_flaky)
+    transitions = comparison.transitions
+    flaky = comparison.flaky
+    discovery_warnings = comparison.discovery_warnings
+
+    regression_count = comparison.regressed + len(discovery_warnings)
+    has_regressions = regression_count > 0
+
+    # Timings and memory peaks are reported beside the matrix but do not fail
+    # the comparison; callers decide what to do with duration_regression_count
+    # and memory_regression_count.
+    samples: List[Measured] = [comparison.baseline_durations]
+    for index, path in enumerate(duration_samples):
+        if spill_dir is None:
+            samples.append(sorted(duration_regression.load_durations(path).items()))
+        else:
+            sample = SideScan(path, Path(spill_dir.name), f"sample-{index}")
+            samples.append(sample.durations)
+    current_durations = comparison.current_durations
+    slower = duration_regression.find_sorted_regressions(
+        samples,
+        current_durations,
+        relative_threshold,
+        absolute_threshold,
+        noise_factor,
+    )
+    baseline_peaks = comparison.baseline_peaks
+    current_peaks = comparison.current_peaks
+    heavier = memory_regression.find_sorted_regressions(
+        [baseline_peaks],
+        current_peaks,
+        memory_relative_threshold,
+        memory_absolute_threshold,
+        noise_factor,
+    )
+    # Measurements scanned out of core are counted as the searches read them.
+    timed = bool(current_durations) and any(samples)
+    measured = bool(current_peaks) and bool(baseline_peaks)
+
+    analysis_payload = {
+        "transitions": {f"{f}_to_{t}": tests for (f, t), tests in transitions.items()},
+        "discovery_warnings": discovery_warnings,
+        "counts": {f"{f}_to_{t}": len(tests) for (f, t), tests in transitions.items()},
+    }
+    analysis_payload["counts"]["discovery_warnings"] = len(discovery_warnings)
+    if flaky_path:
+        analysis_payload["flaky"] = {
+            f"{f}_to_{t}": tests for (f, t), tests in flaky.items()
+        }
+        analysis_payload["counts"]["flaky"] = sum(map(len, flaky.values()))
+    if timed:
+        analysis_payload["duration_regressions"] = [item.to_json() for item in slower]
+        analysis_payload["counts"]["duration_regressions"] = len(slower)
+    if measured:
+        analysis_payload["memory_regressions"] = [item.to_json() for item in heavier]
+        analysis_payload["counts"]["memory_regressions"] = len(heavier)
+
+    # Spilled transition lists are streamed from disk.
+    external_sort.dump_json(analysis_payload, output_dir / "regression_analysis.json")
+    write_report(
+        output_dir / "comprehensive_regression_report.txt",
+        transitions,
+        discovery_warnings,
+        has_regressions,
+        flaky,
+        slower,
+        heavier,
+    )
+    write_details(output_dir / "regression_details.txt", transitions)
+
+    matrix = build_matrix_table(transitions, baseline_label, current_label)
+    if summary_path:
+        write_step_summary(
+            summary_path,
+            transitions,
+            discovery_warnings,
+            matrix,
+            flaky,
+            slower,
+            heavier,
+        )
+
+    print("📊 Regression Matrix:")
+    for line in matrix:
+        print(f"  {line}")
+
+    if discovery_warnings:
+        print(f"\n⚠️ New Discovery Warnings: {len(discovery_warnings)}")
+
+    if flaky:
+        print(f"\n🔁 Known-flaky transitions: {sum(map(len, flaky.values()))}")
+
+    if slower:
+        print(f"\n⏱️ Duration regressions: {len(slower)}")
+
+    if heavier:
+        print(f"\n🧠 Memory regressions: {len(heavier)}")
+
+    if comparison.not_run:
+        print(f"\n⏭️ Tests not selected for this run: {comparison.not_run}")
+
+    if has_regressions:
+        print(f"\n❌ Total regressions detected: {regression_count}")
+    else:
+        print("\n✅ No regressions detected.")
+
+    outputs = build_outputs(
+        transitions, discovery_warnings, regression_count, flaky, slower, heavier
+    )
+    if github_output:
+        with github_output.open("a", encoding="utf-8") as handle:
+            for key, value in outputs.items():
+                handle.write(f"{key}={sanitize(value)}\n")
+    else:
+        print("::warning::GITHUB_OUTPUT environment variable is not set.")
+
+    if spill_dir is not None:
+        spill_dir.cleanup()
+    return outputs
+
+
+def _env_path(name: str) -> Optional[Path]:
+    value = os.environ.get(name)
+    return Path(value) if value else None
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=Path("baseline_results.json"),
+        help="Standardised JSON results for the baseline run.",
+    )
+    parser.add_argument(
+        "--current",
+        type=Path,
+        default=Path("current_results.json"),
+        help="Standardised JSON results for the current run.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path("."),
+        help="Directory receiving the analysis JSON and text reports.",
+    )
+    parser.add_argument(
+        "--baseline-label",
+        default=os.environ.get("BASELINE_LABEL", "Baseline"),
+        help="Display name for the baseline run.",
+    )
+    parser.add_argument(
+        "--current-label",
+        default=os.environ.get("CURRENT_LABEL", "Current"),
+        help="Display name for the current run.",
+    )
+    parser.add_argument(
+        "--flaky",
+        type=Path,
+        default=None,
+        help="Flaky test list from flaky_tests.py; their pass/fail flips are "
+        "reported separately instead of as regressions.",
+    )
+    parser.add_argument(
+        "--duration-baseline",
+        type=Path,
+        action="append",
+        default=[],
+        help="Extra baseline results used as duration samples; repeatable.",
+    )
+    parser.add_argument(
+        "--out-of-core-threshold",
+        type=float,
+        default=OUT_OF_CORE_THRESHOLD_MIB,
+        help="Compare on disk, with bounded memory, when the baseline and current "
+        "results together reach this many MiB; 0 always does.",
+    )
+    duration_regression.add_threshold_arguments(parser)
+    memory_regression.add_threshold_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    analyse(
+        args.baseline,
+        args.current,
+        args.output_dir,
+        args.baseline_label,
+        args.current_label,
+        summary_path=_env_path("GITHUB_STEP_SUMMARY"),
+        github_output=_env_path("GITHUB_OUTPUT"),
+        flaky_path=args.flaky,
+        duration_samples=args.duration_baseline,
+        relative_threshold=args.relative_threshold,
+        absolute_threshold=args.absolute_threshold,
+        noise_factor=args.noise_factor,
+        memory_relative_threshold=args.memory_relative_threshold,
+        memory_absolute_threshold=args.memory_absolute_threshold,
+        out_of_core_threshold=args.out_of_core_threshold,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
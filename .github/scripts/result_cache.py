@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Reuse test results recorded for identical inputs.
+
+Pull requests against the same target branch usually test the same target
+commit. ``key`` derives a cache key from the framework, the checked-out
+commit, the dependency lockfiles, the runner image and the workflow inputs
+that can change results. ``store`` copies the normalised results and the
+job's outputs into a directory saved with ``actions/cache``; ``load``
+restores both, so a cache hit replaces the whole test run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+FORMAT = "result-cache/1"
+MANIFEST = "manifest.json"
+# Inputs naming where results go rather than what they are.
+IGNORED_INPUTS = ("artifact_name", "ref", "result_cache", "single_flight_dir")
+# ``store`` records every environment variable with this prefix as a job
+# output, lower-cased and without the prefix.
+OUTPUT_PREFIX = "OUTPUT_"
+IMAGE_VARIABLES = ("ImageOS", "ImageVersion", "RUNNER_OS", "RUNNER_ARCH")
+SKIP_DIRS = {".git", "node_modules", ".venv", "target"}
+
+
+class ResultCacheError(ValueError):
+    """Raised when a cache directory cannot be used."""
+
+
+def checked_out_commit(root: Path) -> str:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        raise ResultCacheError(f"{root} is not a git checkout") from None
+    return completed.stdout.strip()
+
+
+def lockfile_digest(root: Path, names: Sequence[str]) -> str:
+    """Hash of every file under ``root`` whose name matches one of ``names``."""
+    digest = hashlib.sha256()
+    for current, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            if any(Path(name).match(pattern) for pattern in names):
+                path = Path(current) / name
+                digest.update(f"{path.relative_to(root).as_posix()}\0".encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def runner_image(environ: Mapping[str, str]) -> Dict[str, str]:
+    return {name: environ.get(name, "") for name in IMAGE_VARIABLES}
+
+
+def cache_key(
+    framework: str,
+    commit: str,
+    lockfiles: str,
+    image: Mapping[str, str],
+    inputs: Mapping[str, object],
+) -> str:
+    relevant = {
+        name: value for name, value in inputs.items() if name not in IGNORED_INPUTS
+    }
+    digest = hashlib.sha256(
+        json.dumps([FORMAT, lockfiles, image, relevant], sort_keys=True).encode()
+    ).hexdigest()
+    return f"test-results-{framework}-{commit}-{digest[:16]}"
+
+
+def outputs_from_environ(environ: Mapping[str, str]) -> Dict[str, str]:
+    return {
+        name[len(OUTPUT_PREFIX) :].lower(): value
+        for name, value in environ.items()
+        if name.startswith(OUTPUT_PREFIX)
+    }
+
+
+def store(
+    cache_dir: Path, files: Sequence[Path], outputs: Mapping[str, str]
+) -> List[str]:
+    """Copy the existing ``files`` and ``outputs`` into ``cache_dir``."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    stored = []
+    for path in files:
+        if path.is_file():
+            shutil.copyfile(path, cache_dir / path.name)
+            stored.append(path.name)
+    manifest = {"format": FORMAT, "files": stored, "outputs": dict(outputs)}
+    (cache_dir / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return stored
+
+
+def load(cache_dir: Path, destination: Path) -> Dict[str, str]:
+    """Restore the cached files into ``destination``; return the outputs."""
+    try:
+        manifest = json.loads((cache_dir / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        raise ResultCacheError(f"no usable manifest in {cache_dir}: {exc}") from None
+    if not isinstance(manifest, dict) or manifest.get("format") != FORMAT:
+        raise ResultCacheError(f"{cache_dir} is not in {FORMAT} format")
+    destination.mkdir(parents=True, exist_ok=True)
+    for name in manifest.get("files", []):
+        shutil.copyfile(cache_dir / Path(name).name, destination / Path(name).name)
+    return {str(key): str(value) for key, value in manifest.get("outputs", {}).items()}
+
+
+def write_github_output(path: Path, outputs: Mapping[str, str]) -> None:
+    with path.open("a", encoding="utf-8") as handle:
+        for name, value in outputs.items():
+            if "\n" in value:
+                delimiter = f"EOF_{uuid.uuid4().hex}"
+                handle.write(f"{name}<<{delimiter}\n{value}\n{delimiter}\n")
+            else:
+                handle.write(f"{name}={value}\n")
+
+
+def _key_command(args: argparse.Namespace) -> int:
+    try:
+        inputs = json.loads(args.inputs) if args.inputs else {}
+    except json.JSONDecodeError as exc:
+        raise ResultCacheError(f"--inputs is not valid JSON: {exc}") from None
+    key = cache_key(
+        args.framework,
+        checked_out_commit(args.root),
+        lockfile_digest(args.root, args.lockfile),
+        runner_image(os.environ),
+        inputs,
+    )
+    print(key)
+    if args.github_output:
+        write_github_output(args.github_output, {"key": key})
+    return 0
+
+
+def _store_command(args: argparse.Namespace) -> int:
+    outputs = outputs_from_environ(os.environ)
+    stored = store(args.cache_dir, args.files, outputs)
+    print(f"Stored {len(stored)} file(s) and {len(outputs)} output(s) for reuse")
+    return 0
+
+
+def _load_command(args: argparse.Namespace) -> int:
+    try:
+        outputs = load(args.cache_dir, args.into)
+    except ResultCacheError as exc:
+        print(f"::warning::Ignoring cached results: {exc}")
+        outputs = {"hit": "false"}
+    else:
+        print(f"Reusing cached results with {len(outputs)} output(s)")
+        outputs["hit"] = "true"
+    if args.github_output:
+        write_github_output(args.github_output, outputs)
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cache test results by input.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    key = commands.add_parser("key", help="Print the result cache key.")
+    key.add_argument("--framework", required=True)
+    key.add_argument(
+        "--lockfile",
+        action="append",
+        default=[],
+        help="Lockfile name or glob, matched anywhere in the checkout; repeatable.",
+    )
+    key.add_argument(
+        "--inputs",
+        default="",
+        help="Workflow inputs as JSON; those affecting results join the key.",
+    )
+    key.add_argument("--root", type=Path, default=Path.cwd())
+    key.add_argument("--github-output", type=Path, default=None)
+    key.set_defaults(handler=_key_command)
+
+    store_parser = commands.add_parser(
+        "store", help=f"Save files and {OUTPUT_PREFIX}* variables for reuse."
+    )
+    store_parser.add_argument("cache_dir", type=Path)
+    store_parser.add_argument("files", type=Path, nargs="*")
+    store_parser.set_defaults(handler=_store_command)
+
+    load_parser = commands.add_parser("load", help="Restore cached results.")
+    load_parser.add_argument("cache_dir", type=Path)
+    load_parser.add_argument("--into", type=Path, default=Path.cwd())
+    load_parser.add_argument("--github-output", type=Path, default=None)
+    load_parser.set_defaults(handler=_load_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ResultCacheError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
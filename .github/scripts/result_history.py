@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Persistent per-test result history backed by SQLite.
+
+Each ingested results file becomes a run keyed by (repo, branch, commit,
+framework). Test IDs are interned once and outcomes are stored as one small
+row per (run, test), so the database stays compact and both supported
+queries are index lookups:
+
+* ``history``: the last N outcomes of one test, newest first;
+* ``changed``: every test whose state differs between two commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import results_format
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    framework TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    UNIQUE (repo, branch, commit_sha, framework)
+);
+CREATE INDEX IF NOT EXISTS runs_by_commit
+    ON runs (repo, framework, commit_sha, recorded_at);
+CREATE INDEX IF NOT EXISTS runs_by_time
+    ON runs (repo, branch, framework, recorded_at);
+
+CREATE TABLE IF NOT EXISTS tests (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    test_id INTEGER NOT NULL REFERENCES tests (id),
+    status INTEGER NOT NULL,
+    duration REAL,
+    PRIMARY KEY (run_id, test_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outcomes_by_test ON outcomes (test_id, run_id);
+"""
+
+
+class HistoryError(RuntimeError):
+    """Raised when a query refers to runs that are not in the store."""
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the history database at ``path``."""
+    connection = sqlite3.connect(str(path))
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        connection.close()
+        raise HistoryError(
+            f"{path} uses schema version {version}; this script supports "
+            f"{SCHEMA_VERSION}"
+        )
+    connection.executescript(_SCHEMA)
+    connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return connection
+
+
+def ingest(
+    connection: sqlite3.Connection,
+    table: results_format.ResultsTable,
+    repo: str,
+    branch: str,
+    commit: str,
+    framework: str,
+    recorded_at: Optional[float] = None,
+) -> int:
+    """Store ``table`` as a run and return its id.
+
+    Ingesting the same (repo, branch, commit, framework) again replaces the
+    earlier outcomes, so retried jobs do not duplicate history.
+    """
+    recorded_at = time.time() if recorded_at is None else recorded_at
+    with connection:
+        connection.execute(
+            """
+            INSERT INTO runs (repo, branch, commit_sha, framework, recorded_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (repo, branch, commit_sha, framework)
+            DO UPDATE SET recorded_at = excluded.recorded_at
+            """,
+            (repo, branch, commit, framework, recorded_at),
+        )
+        run_id = connection.execute(
+            """
+            SELECT id FROM runs
+            WHERE repo = ? AND branch = ? AND commit_sha = ? AND framework = ?
+            """,
+            (repo, branch, commit, framework),
+        ).fetchone()[0]
+        connection.execute("DELETE FROM outcomes WHERE run_id = ?", (run_id,))
+
+        # Stage the run in a temporary table so interning and the outcome
+        # insert are two set-based statements instead of a lookup per test.
+        connection.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS incoming (
+                name TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                duration REAL
+            ) WITHOUT ROWID
+            """)
+        connection.execute("DELETE FROM incoming")
+        connection.executemany(
+            "INSERT OR REPLACE INTO incoming (name, status, duration) VALUES (?, ?, ?)",
+            (
+                (name, code, table.durations.get(index))
+                for index, (name, code) in enumerate(zip(table.ids, table.codes))
+            ),
+        )
+        connection.execute(
+            "INSERT OR IGNORE INTO tests (name) SELECT name FROM incoming"
+        )
+        connection.execute(
+            """
+            INSERT INTO outcomes (run_id, test_id, status, duration)
+            SELECT ?, tests.id, incoming.status, incoming.duration
+            FROM incoming JOIN tests ON tests.name = incoming.name
+            """,
+            (run_id,),
+        )
+        connection.execute("DELETE FROM incoming")
+    return run_id
+
+
+def _status_name(code: Optional[int]) -> Optional[str]:
+    if code is None:
+        return None
+    if 0 <= code < len(results_format.STATUSES):
+        return results_format.STATUSES[code]
+    return "other"
+
+
+def history(
+    connection: sqlite3.Connection,
+    test_name: str,
+    limit: int = 20,
+    repo: Optional[str] = None,
+    branch: Optional[str] = None,
+    framework: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """Return the last ``limit`` outcomes of ``test_name``, newest first."""
+    clauses = ["outcomes.test_id = (SELECT id FROM tests WHERE name = ?)"]
+    params: List[object] = [test_name]
+    for column, value in (
+        ("runs.repo", repo),
+        ("runs.branch", branch),
+        ("runs.framework", framework),
+    ):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    params.append(limit)
+
+    rows = connection.execute(
+        f"""
+        SELECT runs.repo, runs.branch, runs.commit_sha, runs.framework,
+               runs.recorded_at, outcomes.status, outcomes.duration
+        FROM outcomes JOIN runs ON runs.id = outcomes.run_id
+        WHERE {" AND ".join(clauses)}
+        ORDER BY runs.recorded_at DESC, runs.id DESC
+        LIMIT ?
+        """,
+        params,
+    )
+    return [
+        {
+            "repo": row[0],
+            "branch": row[1],
+            "commit": row[2],
+            "framework": row[3],
+            "recorded_at": row[4],
+            "status": _status_name(row[5]),
+            "duration": row[6],
+        }
+        for row in rows
+    ]
+
+
+def find_run(
+    connection: sqlite3.Connection,
+    repo: str,
+    framework: str,
+    commit: str,
+    branch: Optional[str] = None,
+) -> int:
+    """Return the newest run recorded for ``commit``."""
+    query = """
+        SELECT id FROM runs
+        WHERE repo = ? AND framework = ? AND commit_sha = ?
+    """
+    params: List[object] = [repo, framework, commit]
+    if branch is not None:
+        query += " AND branch = ?"
+        params.append(branch)
+    query += " ORDER BY recorded_at DESC, id DESC LIMIT 1"
+    row = connection.execute(query, params).fetchone()
+    if row is None:
+        raise HistoryError(f"no {framework} run recorded for {repo}@{commit}")
+    return row[0]
+
+
+def changed(
+    connection: sqlite3.Connection, from_run: int, to_run: int
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """Yield ``(test, old status, new status)`` for tests that changed.
+
+    Tests present in only one run are reported with ``None`` on the other
+    side. Results are ordered by test name.
+    """
+    rows = connection.execute(
+        """
+        SELECT tests.name, old.status, new.status
+        FROM outcomes AS old
+        LEFT JOIN outcomes AS new ON new.run_id = ? AND new.test_id = old.test_id
+        JOIN tests ON tests.id = old.test_id
+        WHERE old.run_id = ? AND new.status IS NOT old.status
+        UNION ALL
+        SELECT tests.name, NULL, new.status
+        FROM outcomes AS new
+        JOIN tests ON tests.id = new.test_id
+        WHERE new.run_id = ? AND NOT EXISTS (
+            SELECT 1 FROM outcomes AS old
+            WHERE old.run_id = ? AND old.test_id = new.test_id
+        )
+        ORDER BY 1
+        """,
+        (to_run, from_run, to_run, from_run),
+    )
+    for name, old, new in rows:
+        yield name, _status_name(old), _status_name(new)
+
+
+def _ingest_command(args: argparse.Namespace) -> int:
+    table = results_format.read(args.results)
+    with closing(connect(args.database)) as connection:
+        run_id = ingest(
+            connection,
+            table,
+            args.repo,
+            args.branch,
+            args.commit,
+            args.framework,
+            args.recorded_at,
+        )
+    print(f"Recorded {len(table)} outcomes as run {run_id} in {args.database}")
+    return 0
+
+
+def _history_command(args: argparse.Namespace) -> int:
+    with closing(connect(args.database)) as connection:
+        entries = history(
+            connection,
+            args.test,
+            limit=args.limit,
+            repo=args.repo,
+            branch=args.branch,
+            framework=args.framework,
+        )
+    print(json.dumps(entries, indent=2))
+    return 0
+
+
+def _changed_command(args: argparse.Namespace) -> int:
+    with closing(connect(args.database)) as connection:
+        from_run = find_run(
+            connection, args.repo, args.framework, args.from_commit, args.branch
+        )
+        to_run = find_run(
+            connection, args.repo, args.framework, args.to_commit, args.branch
+        )
+        entries = [
+            {"test": name, "from": old, "to": new}
+            for name, old, new in changed(connection, from_run, to_run)
+        ]
+    print(json.dumps(entries, indent=2))
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Record and query test history.")
+    parser.add_argument("database", type=Path, help="Path to the SQLite database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Append a results file.")
+    ingest_parser.add_argument(
+        "results", type=Path, help="test_data.json or compact results file."
+    )
+    ingest_parser.add_argument("--repo", required=True)
+    ingest_parser.add_argument("--branch", required=True)
+    ingest_parser.add_argument("--commit", required=True)
+    ingest_parser.add_argument("--framework", required=True)
+    ingest_parser.add_argument(
+        "--recorded-at",
+        type=float,
+        default=None,
+        help="Unix timestamp of the run (defaults to now).",
+    )
+    ingest_parser.set_defaults(handler=_ingest_command)
+
+    history_parser = commands.add_parser("history", help="Last N outcomes of a test.")
+    history_parser.add_argument("test", help="Test ID as written by the runner.")
+    history_parser.add_argument("--limit", type=int, default=20)
+    history_parser.add_argument("--repo", default=None)
+    history_parser.add_argument("--branch", default=None)
+    history_parser.add_argument("--framework", default=None)
+    history_parser.set_defaults(handler=_history_command)
+
+    changed_parser = commands.add_parser(
+        "changed", help="Tests whose state differs between two commits."
+    )
+    changed_parser.add_argument("--repo", required=True)
+    changed_parser.add_argument("--framework", required=True)
+    changed_parser.add_argument("--from", dest="from_commit", required=True)
+    changed_parser.add_argument("--to", dest="to_commit", required=True)
+    changed_parser.add_argument("--branch", default=None)
+    changed_parser.set_defaults(handler=_changed_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (
+        OSError,
+        json.JSONDecodeError,
+        sqlite3.Error,
+        results_format.ResultsFormatError,
+        HistoryError,
+    ) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
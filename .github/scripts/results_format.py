@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""Compact, interned encoding of normalised test results.
+
+The shared ``test_data.json`` layout repeats every test ID in ``all_tests``,
+in a status list and often in a ``*_with_reasons`` map. The compact layout
+stores each ID once in a string table and keeps per-test data in columns
+aligned with it::
+
+    {
+      "format": "compact-results/1",
+      "ids": ["pkg/test_a.py::test_one", ...],
+      "status": "<base64, one status code byte per ID>",
+      "durations": [0.012, null, ...],        # optional
+      "memory": [[1048576, 4096], null, ...], # optional, see MEMORY_FIELDS
+      "reasons": [[3, "needs network"], ...],  # optional, sparse
+      "deselected_tests": [...],              # optional
+      "warnings": [...]
+    }
+
+Status codes index into ``STATUSES``. The legacy JSON layout stays available
+through :meth:`ResultsTable.legacy` and the ``unpack`` command; durations
+travel there as an optional ``test_durations`` map and memory measurements
+as an optional ``test_memory`` map. ``deselected_tests``, the tests a run
+left out on purpose, has the same name and shape in both layouts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import binascii
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+FORMAT = "compact-results/1"
+
+STATUSES: Tuple[str, ...] = (
+    "passed",
+    "failed",
+    "error",
+    "skipped",
+    "xfailed",
+    "xpassed",
+    "other",
+)
+STATUS_CODES: Dict[str, int] = {status: code for code, status in enumerate(STATUSES)}
+OTHER = STATUS_CODES["other"]
+
+LEGACY_LISTS: Tuple[Tuple[str, str], ...] = (
+    ("passed", "passing_tests"),
+    ("failed", "failing_tests"),
+    ("error", "error_tests"),
+    ("skipped", "skipped_tests"),
+    ("xfailed", "xfailed_tests"),
+    ("xpassed", "xpassed_tests"),
+)
+LEGACY_REASONS: Tuple[Tuple[str, str], ...] = (
+    ("skipped", "skipped_tests_with_reasons"),
+    ("xfailed", "xfailed_tests_with_reasons"),
+)
+# Optional ``{test_id: seconds}`` map; runners that measure time write it.
+LEGACY_DURATIONS = "test_durations"
+# Optional ``{test_id: {"peak": bytes, "delta": bytes}}`` map written by the
+# memory instrumentation; see ``memory_probe.py``.
+LEGACY_MEMORY = "test_memory"
+# Order of the values in each row of the compact ``memory`` column.
+MEMORY_FIELDS: Tuple[str, ...] = ("peak", "delta", "traced")
+# Tests left out by test impact selection; not compared downstream.
+DESELECTED = "deselected_tests"
+# When a legacy payload lists an ID under several statuses the worst one wins.
+_LEGACY_PRECEDENCE: Tuple[str, ...] = (
+    "passed",
+    "xpassed",
+    "skipped",
+    "xfailed",
+    "failed",
+    "error",
+)
+_STATUS_ALIASES: Dict[str, str] = {
+    "pass": "passed",
+    "fail": "failed",
+    "skip": "skipped",
+    "xfail": "xfailed",
+    "xpass": "xpassed",
+}
+
+
+class ResultsFormatError(ValueError):
+    """Raised when a compact payload cannot be decoded."""
+
+
+def normalise_status(raw: object) -> str:
+    status = str(raw or "").strip().lower()
+    status = _STATUS_ALIASES.get(status, status)
+    return status if status in STATUS_CODES else "other"
+
+
+def is_compact(payload: object) -> bool:
+    return isinstance(payload, dict) and payload.get("format") == FORMAT
+
+
+class ResultsTable:
+    """Interned test IDs with a status byte and optional columns per test."""
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.codes = bytearray()
+        self.durations: Dict[int, float] = {}
+        self.memory: Dict[int, Dict[str, int]] = {}
+        self.reasons: Dict[int, str] = {}
+        self.warnings: List[str] = []
+        self.deselected: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def intern(self, test_id: str) -> int:
+        index = self._index.get(test_id)
+        if index is None:
+            index = len(self.ids)
+            self._index[test_id] = index
+            self.ids.append(test_id)
+            self.codes.append(OTHER)
+        return index
+
+    def record(
+        self,
+        test_id: str,
+        status: str,
+        duration: Optional[float] = None,
+        reason: Optional[str] = None,
+    ) -> int:
+        """Store a result; a later record for the same ID replaces it."""
+        index = self.intern(test_id)
+        self.codes[index] = STATUS_CODES[normalise_status(status)]
+        if duration is not None:
+            self.durations[index] = duration
+        if reason:
+            self.reasons[index] = reason
+        return index
+
+    def duration_map(self) -> Dict[str, float]:
+        return {self.ids[i]: seconds for i, seconds in self.durations.items()}
+
+    def memory_map(self) -> Dict[str, Dict[str, int]]:
+        return {self.ids[i]: values for i, values in self.memory.items()}
+
+    def status_of(self, test_id: str) -> Optional[str]:
+        index = self._index.get(test_id)
+        return None if index is None else STATUSES[self.codes[index]]
+
+    def by_status(self) -> Dict[str, Set[str]]:
+        groups: Dict[str, Set[str]] = {status: set() for status in STATUSES}
+        for test_id, code in zip(self.ids, self.codes):
+            groups[STATUSES[code]].add(test_id)
+        return groups
+
+    def to_payload(self) -> Dict[str, object]:
+        payload: Dict[str, object] = {
+            "format": FORMAT,
+            "ids": self.ids,
+            "status": base64.b64encode(bytes(self.codes)).decode("ascii"),
+        }
+        if self.durations:
+            payload["durations"] = [self.durations.get(i) for i in range(len(self.ids))]
+        if self.memory:
+            payload["memory"] = [
+                _memory_row(self.memory.get(i)) for i in range(len(self.ids))
+            ]
+        if self.reasons:
+            payload["reasons"] = [[i, text] for i, text in sorted(self.reasons.items())]
+        if self.deselected:
+            payload[DESELECTED] = self.deselected
+        payload["warnings"] = self.warnings
+        return payload
+
+    @classmethod
+    def from_payload(cls, payload: Mapping[str, object]) -> "ResultsTable":
+        if not is_compact(payload):
+            raise ResultsFormatError(f"payload is not in {FORMAT} format")
+        ids = payload.get("ids")
+        if not isinstance(ids, list):
+            raise ResultsFormatError("'ids' must be a list")
+        try:
+            codes = base64.b64decode(str(payload.get("status", "")), validate=True)
+        except (binascii.Error, ValueError) as exc:
+            raise ResultsFormatError(f"invalid status column: {exc}") from None
+        if len(codes) != len(ids):
+            raise ResultsFormatError(
+                f"status column has {len(codes)} entries for {len(ids)} IDs"
+            )
+        if codes and max(codes) >= len(STATUSES):
+            raise ResultsFormatError("unknown status code in status column")
+
+        table = cls()
+        table.ids = [str(test_id) for test_id in ids]
+        table._index = {test_id: i for i, test_id in enumerate(table.ids)}
+        table.codes = bytearray(codes)
+
+        durations = payload.get("durations")
+        if isinstance(durations, list):
+            table.durations = {
+                i: float(value)
+                for i, value in enumerate(durations[: len(ids)])
+                if isinstance(value, (int, float))
+            }
+        memory = payload.get("memory")
+        if isinstance(memory, list):
+            for i, row in enumerate(memory[: len(ids)]):
+                values = memory_from_row(row)
+                if values:
+                    table.memory[i] = values
+        reasons = payload.get("reasons")
+        if isinstance(reasons, list):
+            for item in reasons:
+                if isinstance(item, list) and len(item) == 2:
+                    index, text = item
+                    if isinstance(index, int) and 0 <= index < len(ids) and text:
+                        table.reasons[index] = str(text)
+        table.deselected = _string_list(payload.get(DESELECTED))
+        warnings = payload.get("warnings")
+        if isinstance(warnings, list):
+            table.warnings = [str(item) for item in warnings]
+        return table
+
+    def legacy(self) -> Dict[str, object]:
+        """Return the ``test_data.json`` compatibility view."""
+        lists: Dict[str, List[str]] = {status: [] for status in STATUSES}
+        for test_id, code in zip(self.ids, self.codes):
+            lists[STATUSES[code]].append(test_id)
+
+        data: Dict[str, object] = {key: lists[status] for status, key in LEGACY_LISTS}
+        data["all_tests"] = list(self.ids)
+        for status, key in LEGACY_REASONS:
+            code = STATUS_CODES[status]
+            data[key] = {
+                self.ids[i]: text
+                for i, text in sorted(self.reasons.items())
+                if self.codes[i] == code
+            }
+        if self.durations:
+            data[LEGACY_DURATIONS] = {
+                self.ids[i]: seconds for i, seconds in sorted(self.durations.items())
+            }
+        if self.memory:
+            data[LEGACY_MEMORY] = {
+                self.ids[i]: dict(values) for i, values in sorted(self.memory.items())
+            }
+        if self.deselected:
+            data[DESELECTED] = list(self.deselected)
+        data["warnings"] = list(self.warnings)
+        return data
+
+
+def from_legacy(data: Mapping[str, object]) -> ResultsTable:
+    """Build a table from the ``test_data.json`` layout."""
+    table = ResultsTable()
+    all_tests = data.get("all_tests")
+    if isinstance(all_tests, list):
+        for test_id in all_tests:
+            table.intern(str(test_id))
+
+    keys = dict(LEGACY_LISTS)
+    for status in _LEGACY_PRECEDENCE:
+        items = data.get(keys[status])
+        if isinstance(items, list):
+            for test_id in items:
+                table.record(str(test_id), status)
+
+    for status, key in LEGACY_REASONS:
+        reasons = data.get(key)
+        if not isinstance(reasons, dict):
+            continue
+        for test_id, text in reasons.items():
+            if text and table.status_of(str(test_id)) == status:
+                table.reasons[table.intern(str(test_id))] = str(text)
+
+    durations = data.get(LEGACY_DURATIONS)
+    if isinstance(durations, dict):
+        for test_id, seconds in durations.items():
+            if isinstance(seconds, (int, float)) and table.status_of(str(test_id)):
+                table.durations[table.intern(str(test_id))] = float(seconds)
+
+    memory = data.get(LEGACY_MEMORY)
+    if isinstance(memory, dict):
+        for test_id, measured in memory.items():
+            values = memory_values(measured)
+            if values and table.status_of(str(test_id)):
+                table.memory[table.intern(str(test_id))] = values
+
+    table.deselected = _string_list(data.get(DESELECTED))
+    warnings = data.get("warnings")
+    if isinstance(warnings, list):
+        table.warnings = [str(item) for item in warnings]
+    return table
+
+
+def report_duration(test: Mapping[str, object]) -> Optional[float]:
+    """Seconds of a pytest-json-report style test entry, None if untimed."""
+    duration = test.get("duration")
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    # pytest-json-report keeps timings per phase.
+    phases = [test.get(phase) for phase in ("setup", "call", "teardown")]
+    timings = [
+        phase["duration"]
+        for phase in phases
+        if isinstance(phase, dict) and isinstance(phase.get("duration"), (int, float))
+    ]
+    return float(sum(timings)) if timings else None
+
+
+def memory_values(raw: object) -> Dict[str, int]:
+    """The known, integral fields of a ``{"peak": ..., "delta": ...}`` dict."""
+    if not isinstance(raw, dict):
+        return {}
+    return {
+        name: int(raw[name])
+        for name in MEMORY_FIELDS
+        if isinstance(raw.get(name), (int, float)) and not isinstance(raw[name], bool)
+    }
+
+
+def _memory_row(values: Optional[Mapping[str, int]]) -> Optional[List[Optional[int]]]:
+    if not values:
+        return None
+    row = [values.get(name) for name in MEMORY_FIELDS]
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def _string_list(raw: object) -> List[str]:
+    return [str(item) for item in raw] if isinstance(raw, list) else []
+
+
+def memory_from_row(row: object) -> Dict[str, int]:
+    """The memory values of one row of the compact ``memory`` column."""
+    if not isinstance(row, list):
+        return {}
+    return memory_values(dict(zip(MEMORY_FIELDS, row)))
+
+
+def _report_reason(test: Mapping[str, object]) -> Optional[str]:
+    longrepr = test.get("longrepr")
+    if isinstance(longrepr, list):
+        longrepr = longrepr[0] if longrepr else None
+    return str(longrepr).strip() if longrepr else None
+
+
+def add_report_test(table: ResultsTable, test: Mapping[str, object]) -> None:
+    """Record one test entry of a pytest-json-report style payload."""
+    nodeid = test.get("nodeid")
+    if not nodeid:
+        return
+    status = normalise_status(test.get("outcome"))
+    reason = _report_reason(test) if status in ("skipped", "xfailed") else None
+    index = table.record(str(nodeid), status, report_duration(test), reason)
+    memory = memory_values(test.get("memory"))
+    if memory:
+        table.memory[index] = memory
+
+
+def from_report(report: Mapping[str, object]) -> ResultsTable:
+    """Build a table from a pytest-json-report style ``{"tests": [...]}``."""
+    table = ResultsTable()
+    tests = report.get("tests")
+    if not isinstance(tests, list):
+        return table
+    for test in tests:
+        if isinstance(test, dict):
+            add_report_test(table, test)
+    return table
+
+
+def merge_durations(table: ResultsTable, report: Mapping[str, object]) -> None:
+    """Copy per-test durations and memory from a pytest-json-report payload."""
+    tests = report.get("tests")
+    if not isinstance(tests, list):
+        return
+    for test in tests:
+        if isinstance(test, dict) and test.get("nodeid"):
+            if not table.status_of(str(test["nodeid"])):
+                continue
+            index = table.intern(str(test["nodeid"]))
+            duration = report_duration(test)
+            if duration is not None:
+                table.durations[index] = duration
+            memory = memory_values(test.get("memory"))
+            if memory:
+                table.memory[index] = memory
+
+
+def write(table: ResultsTable, path: Path) -> None:
+    path.write_text(
+        json.dumps(table.to_payload(), separators=(",", ":")), encoding="utf-8"
+    )
+
+
+def read(path: Path) -> ResultsTable:
+    """Load either layout from ``path`` into a table."""
+    payload = json.loads(path.read_text(encoding="utf-8") or "{}")
+    if is_compact(payload):
+        return ResultsTable.from_payload(payload)
+    if isinstance(payload, dict):
+        return from_legacy(payload)
+    raise ResultsFormatError(f"{path} does not contain a results object")
+
+
+def _pack(args: argparse.Namespace) -> int:
+    table = read(args.input)
+    if args.report:
+        try:
+            report = json.loads(args.report.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as exc:
+            print(
+                f"::warning::Could not read durations from {args.report}: {exc}",
+                file=sys.stderr,
+            )
+        else:
+            if isinstance(report, dict):
+                merge_durations(table, report)
+    write(table, args.output)
+    return 0
+
+
+def _unpack(args: argparse.Namespace) -> int:
+    table = read(args.input)
+    args.output.write_text(json.dumps(table.legacy(), indent=2), encoding="utf-8")
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert between result layouts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack = commands.add_parser("pack", help="Write the compact layout.")
+    pack.add_argument("input", type=Path, help="Results in either layout.")
+    pack.add_argument("output", type=Path, help="Destination compact file.")
+    pack.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Optional pytest-json-report style file with durations and memory.",
+    )
+    pack.set_defaults(handler=_pack)
+
+    unpack = commands.add_parser("unpack", help="Write the legacy JSON layout.")
+    unpack.add_argument("input", type=Path, help="Results in either layout.")
+    unpack.add_argument("output", type=Path, help="Destination JSON file.")
+    unpack.set_defaults(handler=_unpack)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, json.JSONDecodeError, ResultsFormatError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
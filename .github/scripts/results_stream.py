@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Crash-safe, append-only test results.
+
+Runners append one JSON line per finished test to a results stream, in the
+test layout of pytest-json-report (``nodeid``, ``outcome``, ``duration``,
+``longrepr``, ``memory``)::
+
+    {"format": "results-stream/1", "created": "2024-05-01T12:00:00Z"}
+    {"nodeid": "tests/test_a.py::test_one", "outcome": "passed", ...}
+    ...
+    {"event": "end", "exitcode": 0}
+
+Every line is flushed as it is written, so a runner killed mid-run, e.g.
+with exit 137, leaves each completed test on disk; ``fsync`` calls are
+batched. The end line marks a complete run. ``report`` converts a stream,
+finished or not, into a pytest-json-report style ``results.json`` in two
+passes over the file, so memory use does not grow with the suite.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Mapping, Optional, Sequence, TextIO
+
+import results_format
+
+FORMAT = "results-stream/1"
+END_EVENT = "end"
+# Longest first line read when checking for a stream header, so that a
+# one-line JSON document is not read whole.
+HEADER_LIMIT = 4096
+DEFAULT_SYNC_EVERY = 100
+DEFAULT_SYNC_INTERVAL = 5.0
+# Outcome counts reported in the summary, as pytest-json-report names them.
+OUTCOMES = ("passed", "failed", "error", "skipped", "xfailed", "xpassed")
+
+Record = Dict[str, object]
+
+
+class ResultsStreamError(ValueError):
+    """Raised when a file is not a results stream."""
+
+
+def _utc_now() -> str:
+    return dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ResultsSink:
+    """Appends test records to a results stream.
+
+    Records are flushed to the operating system at once and synced to disk
+    after ``sync_every`` records or ``sync_interval`` seconds, whichever
+    comes first.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self._handle: Optional[TextIO] = path.open("a", encoding="utf-8")
+        self._pending = 0
+        self._synced_at = clock()
+        if self._handle.tell() == 0:
+            self._write_line({"format": FORMAT, "created": _utc_now()})
+
+    def __enter__(self) -> "ResultsSink":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def _write_line(self, payload: Mapping[str, object]) -> None:
+        if self._handle is None:
+            raise ResultsStreamError(f"{self.path} is already closed")
+        self._handle.write(json.dumps(payload, separators=(",", ":")) + "\n")
+        self._handle.flush()
+
+    def write(self, record: Mapping[str, object]) -> None:
+        self._write_line(record)
+        self._pending += 1
+        if (
+            self._pending >= self.sync_every
+            or self.clock() - self._synced_at >= self.sync_interval
+        ):
+            self.sync()
+
+    def sync(self) -> None:
+        if self._handle is not None and self._pending:
+            os.fsync(self._handle.fileno())
+            self._pending = 0
+            self._synced_at = self.clock()
+
+    def finish(self, exitcode: int) -> None:
+        """Mark the run complete and close the stream."""
+        self._write_line({"event": END_EVENT, "exitcode": int(exitcode)})
+        self._pending += 1
+        self.close()
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self.sync()
+            self._handle.close()
+            self._handle = None
+
+
+def is_stream(path: Path) -> bool:
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            first = handle.readline(HEADER_LIMIT)
+    except (OSError, UnicodeDecodeError):
+        return False
+    try:
+        header = json.loads(first)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(header, dict) and header.get("format") == FORMAT
+
+
+class StreamReader:
+    """Iterates the records of a stream; ``end`` is set once it is read.
+
+    A last line cut off by a killed writer is ignored; undecodable lines
+    elsewhere are skipped with a warning.
+    """
+
+    def __init__(self, path: Path) -> None:
+        if not is_stream(path):
+            raise ResultsStreamError(f"{path} is not in {FORMAT} format")
+        self.path = path
+        self.created = ""
+        self.end: Optional[Record] = None
+        self.skipped_lines = 0
+
+    def __iter__(self) -> Iterator[Record]:
+        self.end = None
+        with self.path.open("r", encoding="utf-8") as handle:
+            header = json.loads(handle.readline())
+            self.created = str(header.get("created", ""))
+            for number, line in enumerate(handle, 2):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    if line.endswith("\n"):
+                        self.skipped_lines += 1
+                        print(
+                            f"::warning::Skipping malformed line {number} "
+                            f"of {self.path}",
+                            file=sys.stderr,
+                        )
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                if entry.get("event") == END_EVENT:
+                    self.end = entry
+                elif entry.get("nodeid"):
+                    yield entry
+
+
+def summarise(reader: StreamReader) -> Dict[str, int]:
+    counts: Counter = Counter()
+    for record in reader:
+        counts[results_format.normalise_status(record.get("outcome"))] += 1
+    summary = {outcome: counts[outcome] for outcome in OUTCOMES if counts[outcome]}
+    summary["total"] = sum(counts.values())
+    return summary
+
+
+def write_report(
+    stream: Path,
+    output: Path,
+    exitcode: Optional[int] = None,
+    summary: Optional[Mapping[str, int]] = None,
+    errors: Sequence[str] = (),
+) -> Dict[str, object]:
+    """Write ``stream`` as a pytest-json-report style file; return its header.
+
+    ``exitcode`` defaults to the one recorded by the end line. A stream
+    without one is reported with ``"incomplete": true``.
+    """
+    reader = StreamReader(stream)
+    counted = summarise(reader)
+    complete = reader.end is not None
+    if exitcode is None:
+        exitcode = int(reader.end.get("exitcode", 0)) if reader.end else 1
+    header: Dict[str, object] = {
+        "created": reader.created or _utc_now(),
+        "exitcode": exitcode,
+        "summary": dict(summary) if summary is not None else counted,
+    }
+    if not complete:
+        header["incomplete"] = True
+    if errors:
+        header["errors"] = list(errors)
+
+    with output.open("w", encoding="utf-8") as handle:
+        handle.write(json.dumps(header, indent=2)[:-2])
+        handle.write(',\n  "tests": [')
+        for index, record in enumerate(reader):
+            handle.write(",\n    " if index else "\n    ")
+            handle.write(json.dumps(record))
+        handle.write("\n  ]\n}\n")
+    return header
+
+
+def read_table(stream: Path) -> results_format.ResultsTable:
+    """Build a compact results table from a stream, one record at a time."""
+    table = results_format.ResultsTable()
+    for record in StreamReader(stream):
+        results_format.add_report_test(table, record)
+    return table
+
+
+def _report_command(args: argparse.Namespace) -> int:
+    header = write_report(args.stream, args.output, args.exitcode)
+    total = header["summary"].get("total", 0)  # type: ignore[union-attr]
+    if header.get("incomplete"):
+        print(
+            f"::warning::{args.stream} ended before the run finished; "
+            f"kept {total} completed test(s)."
+        )
+    else:
+        print(f"Wrote {total} test result(s) to {args.output}")
+    if args.compact_output:
+        results_format.write(read_table(args.stream), args.compact_output)
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Read JSON Lines test results.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser(
+        "report", help="Write a stream as pytest-json-report style JSON."
+    )
+    report.add_argument("stream", type=Path)
+    report.add_argument("output", type=Path)
+    report.add_argument(
+        "--exitcode",
+        type=int,
+        default=None,
+        help="Exit code of the test run; defaults to the recorded one.",
+    )
+    report.add_argument("--compact-output", type=Path, default=None)
+    report.set_defaults(handler=_report_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ResultsStreamError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
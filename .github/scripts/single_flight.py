@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""Let one job compute a result while identical concurrent jobs wait for it.
+
+Jobs agree on a key, such as the result cache key of a target commit. The
+first to ``acquire`` it gets a lease and leads; the lease expires unless a
+heartbeat keeps renewing it. Everyone else follows: they wait for the leader
+to ``finish`` within a bounded timeout, polling a local lock backend rather
+than an API, or return at once with ``--wait-timeout 0`` so the caller can
+free its runner and try again later. A lease that was not renewed in time
+belongs to a dead owner, and the next caller takes it over.
+
+Two backends implement the same protocol for runners sharing a host or a
+filesystem: a directory of lease files guarded by ``flock`` and a SQLite
+database. Leaders publish their result directory next to the backend, so
+followers do not depend on the Actions cache, which pull requests cannot
+share with each other.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple, TypeVar, Union
+
+DEFAULT_TTL = 120.0
+DEFAULT_WAIT_TIMEOUT = 1200.0
+DEFAULT_POLL = 2.0
+MAX_POLL = 30.0
+# How long a finished key keeps answering followers with its result.
+DONE_TTL = 86400.0
+
+LEADER = "leader"
+DONE = "done"
+FOLLOWER = "follower"
+TIMEOUT = "timeout"
+
+T = TypeVar("T")
+
+
+class SingleFlightError(RuntimeError):
+    """Raised for unusable backends or published results."""
+
+
+class LeaseState(NamedTuple):
+    owner: str
+    expires_at: float
+    done: bool = False
+    result: str = ""
+
+
+class Outcome(NamedTuple):
+    """What ``acquire`` means for the caller.
+
+    ``leader``: do the work, then finish. ``done``: ``result`` is ready.
+    ``follower``: someone else is working. ``timeout``: waiting gave up, so
+    do the work without a lease.
+    """
+
+    role: str
+    owner: str = ""
+    result: str = ""
+
+
+Change = Callable[[Optional[LeaseState]], Tuple[Optional[LeaseState], T]]
+
+
+def _file_stem(key: str) -> str:
+    readable = re.sub(r"[^A-Za-z0-9._-]", "_", key)[:80]
+    return f"{readable}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]}"
+
+
+class FileBackend:
+    """One JSON lease file per key; updates hold an ``flock`` on a lock file."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def update(self, key: str, change: Change) -> T:
+        stem = _file_stem(key)
+        lease_path = self.directory / f"{stem}.lease"
+        with open(self.directory / f"{stem}.lock", "a", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = LeaseState(**json.loads(lease_path.read_text("utf-8")))
+            except (OSError, ValueError, TypeError):
+                state = None
+            new_state, value = change(state)
+            if new_state is None:
+                if state is not None:
+                    lease_path.unlink()
+            elif new_state != state:
+                temporary = lease_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+                temporary.write_text(json.dumps(new_state._asdict()), "utf-8")
+                os.replace(temporary, lease_path)
+            return value
+
+
+class SQLiteBackend:
+    """Leases as rows, changed inside ``BEGIN IMMEDIATE`` transactions."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    done INTEGER NOT NULL,
+                    result TEXT NOT NULL
+                )
+                """)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def update(self, key: str, change: Change) -> T:
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT owner, expires_at, done, result FROM leases WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                state = None
+                if row:
+                    state = LeaseState(row[0], row[1], bool(row[2]), row[3])
+                new_state, value = change(state)
+                if new_state is None:
+                    connection.execute("DELETE FROM leases WHERE key = ?", (key,))
+                elif new_state != state:
+                    connection.execute(
+                        """
+                        INSERT OR REPLACE INTO leases
+                            (key, owner, expires_at, done, result)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        (key, *new_state[:2], int(new_state.done), new_state.result),
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return value
+
+
+LeaseBackend = Union[FileBackend, SQLiteBackend]
+
+
+def open_backend(spec: str) -> LeaseBackend:
+    """Backend for ``file:DIRECTORY`` or ``sqlite:DATABASE``."""
+    kind, _, location = spec.partition(":")
+    if kind == "file" and location:
+        return FileBackend(Path(location))
+    if kind == "sqlite" and location:
+        return SQLiteBackend(Path(location))
+    raise SingleFlightError(f"backend must be file:DIR or sqlite:PATH, got {spec!r}")
+
+
+def results_root(spec: str) -> Path:
+    """Where leaders publish result directories for a backend."""
+    location = Path(spec.partition(":")[2])
+    if spec.startswith("sqlite:"):
+        return location.parent / "results"
+    return location / "results"
+
+
+class SingleFlight:
+    """Lease protocol over any backend with an atomic ``update``."""
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        owner: str,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.backend = backend
+        self.owner = owner
+        self.ttl = ttl
+        self.clock = clock
+
+    def try_acquire(self, key: str) -> Outcome:
+        def change(state: Optional[LeaseState]):
+            now = self.clock()
+            if state is not None and state.expires_at > now:
+                if state.done:
+                    return state, Outcome(DONE, state.owner, state.result)
+                if state.owner != self.owner:
+                    return state, Outcome(FOLLOWER, state.owner)
+            # Free, ours already, finished too long ago, or its owner died.
+            return LeaseState(self.owner, now + self.ttl), Outcome(LEADER, self.owner)
+
+        return self.backend.update(key, change)
+
+    def wait(
+        self,
+        key: str,
+        timeout: float = DEFAULT_WAIT_TIMEOUT,
+        poll: float = DEFAULT_POLL,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> Outcome:
+        """Acquire, waiting up to ``timeout`` seconds while another job leads."""
+        deadline = self.clock() + timeout
+        delay = poll
+        while True:
+            outcome = self.try_acquire(key)
+            if outcome.role != FOLLOWER:
+                return outcome
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return Outcome(TIMEOUT, outcome.owner) if timeout > 0 else outcome
+            sleep(min(delay, remaining))
+            delay = min(delay * 2, MAX_POLL)
+
+    def _owned(
+        self, key: str, then: Callable[[LeaseState, float], Optional[LeaseState]]
+    ) -> bool:
+        def change(state: Optional[LeaseState]):
+            if state is None or state.owner != self.owner or state.done:
+                return state, False
+            return then(state, self.clock()), True
+
+        return self.backend.update(key, change)
+
+    def renew(self, key: str) -> bool:
+        """Extend our lease; False once it was lost, finished or released."""
+        return self._owned(
+            key, lambda state, now: state._replace(expires_at=now + self.ttl)
+        )
+
+    def complete(self, key: str, result: str = "") -> bool:
+        return self._owned(
+            key, lambda state, now: LeaseState(self.owner, now + DONE_TTL, True, result)
+        )
+
+    def release(self, key: str) -> bool:
+        """Give the key up without a result so a follower takes over."""
+        return self._owned(key, lambda state, now: None)
+
+
+def publish(source: Path, root: Path, key: str) -> Path:
+    """Copy ``source`` to the results root atomically; return its new path."""
+    destination = root / _file_stem(key)
+    staging = root / f".{_file_stem(key)}.{uuid.uuid4().hex}"
+    shutil.copytree(source, staging)
+    if destination.exists():
+        shutil.rmtree(destination)
+    os.replace(staging, destination)
+    return destination
+
+
+def prune(root: Path, older_than: float = DONE_TTL) -> None:
+    if not root.is_dir():
+        return
+    cutoff = time.time() - older_than
+    for entry in root.iterdir():
+        try:
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry)
+        except OSError:
+            continue
+
+
+def _write_outputs(path: Optional[Path], **outputs: str) -> None:
+    if path:
+        with path.open("a", encoding="utf-8") as handle:
+            for name, value in outputs.items():
+                handle.write(f"{name}={value}\n")
+
+
+def _start_heartbeat(args: argparse.Namespace) -> None:
+    # Detached so it outlives this step; it stops once the lease is finished
+    # or lost, and the runner kills it at the end of the job otherwise.
+    subprocess.Popen(
+        [
+            sys.executable,
+            str(Path(__file__).resolve()),
+            "renew",
+            args.key,
+            "--backend",
+            args.backend,
+            "--owner",
+            args.owner,
+            "--ttl",
+            str(args.ttl),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _acquire_command(args: argparse.Namespace) -> int:
+    flight = SingleFlight(open_backend(args.backend), args.owner, args.ttl)
+    prune(results_root(args.backend))
+    outcome = flight.wait(args.key, args.wait_timeout, args.poll)
+
+    if outcome.role == DONE and args.fetch_into:
+        try:
+            shutil.copytree(outcome.result, args.fetch_into, dirs_exist_ok=True)
+        except OSError as exc:
+            print(f"::warning::Results published by {outcome.owner} are gone: {exc}")
+            outcome = Outcome(TIMEOUT, outcome.owner)
+
+    if outcome.role == LEADER:
+        print(f"Leading {args.key}")
+        if args.heartbeat:
+            _start_heartbeat(args)
+    elif outcome.role == DONE:
+        print(f"Reusing the result of {outcome.owner} for {args.key}")
+    elif outcome.role == FOLLOWER:
+        print(f"{outcome.owner} is already working on {args.key}")
+    else:
+        print(
+            f"::warning::Gave up waiting for {outcome.owner} after "
+            f"{args.wait_timeout:.0f}s; running without a lease"
+        )
+    _write_outputs(args.github_output, role=outcome.role, result=outcome.result)
+    return 0
+
+
+def _renew_command(args: argparse.Namespace) -> int:
+    flight = SingleFlight(open_backend(args.backend), args.owner, args.ttl)
+    interval = args.every or args.ttl / 3
+    while flight.renew(args.key):
+        time.sleep(interval)
+    return 0
+
+
+def _finish_command(args: argparse.Namespace) -> int:
+    flight = SingleFlight(open_backend(args.backend), args.owner, args.ttl)
+    if args.publish and args.publish.is_dir() and any(args.publish.iterdir()):
+        published = publish(args.publish, results_root(args.backend), args.key)
+        if flight.complete(args.key, str(published)):
+            print(f"Published results for {args.key}")
+            return 0
+        print(f"::warning::Lease on {args.key} was lost before finishing")
+        return 0
+    flight.release(args.key)
+    print(f"Released {args.key} without results")
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Coalesce identical jobs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command: argparse.ArgumentParser) -> None:
+        command.add_argument("key")
+        command.add_argument(
+            "--backend", required=True, help="file:DIRECTORY or sqlite:DATABASE."
+        )
+        command.add_argument(
+            "--owner",
+            default=f"{os.uname().nodename}:{os.getpid()}",
+            help="Identity of this job; acquire and finish must agree on it.",
+        )
+        command.add_argument(
+            "--ttl",
+            type=float,
+            default=DEFAULT_TTL,
+            help="Seconds a lease lives without being renewed.",
+        )
+
+    acquire = commands.add_parser("acquire", help="Lead, or wait for the leader.")
+    add_common(acquire)
+    acquire.add_argument(
+        "--wait-timeout",
+        type=float,
+        default=DEFAULT_WAIT_TIMEOUT,
+        help="Seconds to wait for another leader; 0 returns 'follower' at once.",
+    )
+    acquire.add_argument("--poll", type=float, default=DEFAULT_POLL)
+    acquire.add_argument(
+        "--heartbeat",
+        action="store_true",
+        help="Keep renewing the lease in the background when leading.",
+    )
+    acquire.add_argument(
+        "--fetch-into",
+        type=Path,
+        default=None,
+        help="Copy a finished leader's published results here.",
+    )
+    acquire.add_argument("--github-output", type=Path, default=None)
+    acquire.set_defaults(handler=_acquire_command)
+
+    renew = commands.add_parser("renew", help="Renew a lease until it is gone.")
+    add_common(renew)
+    renew.add_argument("--every", type=float, default=0.0)
+    renew.set_defaults(handler=_renew_command)
+
+    finish = commands.add_parser(
+        "finish", help="Publish results and complete, or release the lease."
+    )
+    add_common(finish)
+    finish.add_argument(
+        "--publish",
+        type=Path,
+        default=None,
+        help="Result directory for followers; without it the lease is released.",
+    )
+    finish.set_defaults(handler=_finish_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, sqlite3.Error, SingleFlightError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,9 @@ import sys
 from pathlib import Path
 from typing import Dict, Iterator, List, MutableMapping, Optional, Sequence, Tuple
 
+import json_stream
+import results_format
+
 PASS_STATUSES: Tuple[str, ...] = (
     "passed",
     "pass",
@@ -35,6 +38,30 @@ XFAIL_STATUSES: Tuple[str, ...] = (
     "expected_fail",
 )
 
+NESTED_KEYS: Tuple[str, ...] = ("tests", "testResults", "results", "suites", "children")
+# Every key the normaliser reads. Streaming parses drop all other members
+# (failure messages, console output, coverage) before they are materialised.
+RELEVANT_KEYS = frozenset(
+    (
+        *NESTED_KEYS,
+        "assertionResults",
+        "name",
+        "file",
+        "testFilePath",
+        "test_file_path",
+        "fullName",
+        "full_name",
+        "title",
+        "ancestorTitles",
+        "ancestor_titles",
+        "status",
+        "outcome",
+        "result",
+        "warnings",
+    )
+)
+STREAMING_THRESHOLD_BYTES = 32 * 1024 * 1024
+
 
 def _normalise_status(raw: Optional[str]) -> str:
     if not raw:
@@ -74,50 +101,100 @@ def _format_name(
     return ""
 
 
-def _iter_test_entries(
-    payload: object, fallback: Optional[str] = None
-) -> Iterator[Tuple[str, str]]:
-    if isinstance(payload, dict):
-        assertion_results = payload.get("assertionResults")
-        if isinstance(assertion_results, list):
-            base = (
-                payload.get("name")
-                or payload.get("file")
-                or payload.get("testFilePath")
-                or payload.get("test_file_path")
-                or fallback
-            )
-            base_str = str(base) if base else None
-            for assertion in assertion_results:
-                if isinstance(assertion, dict):
-                    name = _format_name(assertion, base_str)
-                    status = _normalise_status(
-                        assertion.get("status") or assertion.get("outcome")
-                    )
-                    if name:
-                        yield name, status
-            return
-
-        nested_keys = ("tests", "testResults", "results", "suites", "children")
-        handled_nested = False
-        for key in nested_keys:
-            nested = payload.get(key)
-            if isinstance(nested, list):
-                handled_nested = True
-                for item in nested:
-                    yield from _iter_test_entries(item, fallback)
-
-        if not handled_nested:
-            name = _format_name(payload, fallback)
+# Fields read when an object is itself treated as a single test record.
+RECORD_KEYS: Tuple[str, ...] = (
+    "fullName",
+    "full_name",
+    "ancestorTitles",
+    "ancestor_titles",
+    "title",
+    "name",
+    "status",
+    "outcome",
+)
+
+
+class _CollapsedEntries(List[Tuple[str, str]]):
+    """Entries of a test-file object already resolved while streaming.
+
+    Only list elements are collapsed; an object under a key such as
+    ``results`` stays a dict, as it would be without streaming. ``record``
+    keeps the few fields needed should the object turn out to be an
+    assertion nested inside another file's ``assertionResults``.
+    """
+
+    def __init__(self, entries: List[Tuple[str, str]], record: Dict[str, object]):
+        super().__init__(entries)
+        self.record = record
+
+
+def _assertion_entries(node: MutableMapping[str, object]) -> List[Tuple[str, str]]:
+    base = (
+        node.get("name")
+        or node.get("file")
+        or node.get("testFilePath")
+        or node.get("test_file_path")
+    )
+    base_str = str(base) if base else None
+    entries: List[Tuple[str, str]] = []
+    for assertion in node["assertionResults"]:
+        if isinstance(assertion, _CollapsedEntries):
+            assertion = assertion.record
+        if isinstance(assertion, dict):
+            name = _format_name(assertion, base_str)
             status = _normalise_status(
-                payload.get("status") or payload.get("outcome") or payload.get("result")
+                assertion.get("status") or assertion.get("outcome")
             )
-            if name or status != "unknown":
-                yield name, status
+            if name:
+                entries.append((name, status))
+    return entries
+
+
+def _collapse_test_file(node: Dict[str, object]) -> object:
+    if isinstance(node.get("assertionResults"), list):
+        record = {key: node[key] for key in RECORD_KEYS if key in node}
+        return _CollapsedEntries(_assertion_entries(node), record)
+    return node
+
+
+def _iter_test_entries(payload: object) -> Iterator[Tuple[str, str]]:
+    # Depth-first walk with an explicit stack; children are pushed in reverse
+    # so entries come out in the same order a recursive walk would give.
+    stack: List[object] = [payload]
+    while stack:
+        node = stack.pop()
+
+        if isinstance(node, _CollapsedEntries):
+            yield from node
+            continue
 
-    elif isinstance(payload, list):
-        for item in payload:
-            yield from _iter_test_entries(item, fallback)
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+
+        if not isinstance(node, dict):
+            continue
+
+        if isinstance(node.get("assertionResults"), list):
+            yield from _assertion_entries(node)
+            continue
+
+        nested_lists = [
+            nested
+            for nested in (node.get(key) for key in NESTED_KEYS)
+            if isinstance(nested, list)
+        ]
+        if nested_lists:
+            for nested in reversed(nested_lists):
+                stack.extend(reversed(nested))
+            continue
+
+        name = _format_name(node)
+        status = _normalise_status(
+            node.get("status") or node.get("outcome") or node.get("result")
+        )
+        if name or status != "unknown":
+            yield name, status
 
 
 def _collect_tests(payload: object) -> Dict[str, List[str]]:
@@ -158,9 +235,29 @@ def _collect_tests(payload: object) -> Dict[str, List[str]]:
     }
 
 
-def _load_payload(path: Path) -> object:
+def _load_payload(path: Path, streaming: str = "auto") -> object:
     if not path.exists():
         return {}
+
+    if streaming == "auto":
+        use_stream = path.stat().st_size >= STREAMING_THRESHOLD_BYTES
+    else:
+        use_stream = streaming == "always"
+
+    if use_stream:
+        try:
+            return json_stream.load_path(
+                path,
+                keep_keys=RELEVANT_KEYS,
+                default={},
+                on_map=_collapse_test_file,
+            )
+        except json_stream.JSONStreamError as exc:
+            print(
+                f"::warning::Failed to parse JSON from {path}: {exc}", file=sys.stderr
+            )
+            return {}
+
     content = path.read_text(encoding="utf-8").strip()
     if not content:
         return {}
@@ -179,8 +276,37 @@ def _extract_warnings(payload: object) -> List[str]:
     return []
 
 
-def normalise_results(input_path: Path, output_path: Path) -> Dict[str, object]:
-    payload = _load_payload(input_path)
+def _compact_table(
+    tests: Dict[str, List[str]], warnings: List[str]
+) -> results_format.ResultsTable:
+    table = results_format.ResultsTable()
+    for name in tests["all_tests"]:
+        table.intern(name)
+    for key, status in (
+        ("passing_tests", "passed"),
+        ("failing_tests", "failed"),
+        ("skipped_tests", "skipped"),
+        ("xfailed_tests", "xfailed"),
+    ):
+        for name in tests[key]:
+            table.record(name, status)
+    table.warnings = warnings
+    return table
+
+
+def load_table(path: Path, streaming: str = "auto") -> results_format.ResultsTable:
+    """Compact table of a Jest or Storybook test-runner results file."""
+    payload = _load_payload(path, streaming)
+    return _compact_table(_collect_tests(payload), _extract_warnings(payload))
+
+
+def normalise_results(
+    input_path: Path,
+    output_path: Path,
+    streaming: str = "auto",
+    compact_output: Optional[Path] = None,
+) -> Dict[str, object]:
+    payload = _load_payload(input_path, streaming)
     tests = _collect_tests(payload)
     warnings = _extract_warnings(payload)
 
@@ -205,6 +331,8 @@ def normalise_results(input_path: Path, output_path: Path) -> Dict[str, object]:
     output_path.write_text(
         json.dumps(normalised, indent=2, sort_keys=True), encoding="utf-8"
     )
+    if compact_output:
+        results_format.write(_compact_table(tests, warnings), compact_output)
 
     return {
         "total": total,
@@ -249,12 +377,29 @@ def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
         default=None,
         help="Optional path to the GitHub Actions output file to append summary values.",
     )
+    parser.add_argument(
+        "--streaming",
+        choices=("auto", "always", "never"),
+        default="auto",
+        help=(
+            "Parse the input incrementally instead of loading it whole. 'auto' "
+            "streams files of at least 32 MiB."
+        ),
+    )
+    parser.add_argument(
+        "--compact-output",
+        type=Path,
+        default=None,
+        help="Optional path to also write the results in the compact layout.",
+    )
     return parser.parse_args(argv)
 
 
 def main(argv: Optional[Sequence[str]] = None) -> int:
     args = parse_args(argv)
-    summary = normalise_results(args.input, args.output)
+    summary = normalise_results(
+        args.input, args.output, args.streaming, args.compact_output
+    )
 
     if args.github_output:
         write_outputs(summary, args.github_output)
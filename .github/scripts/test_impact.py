@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Select the tests affected by a change from a per-test coverage index.
+
+``build`` reads a coverage.py data file recorded with per-test contexts
+(``pytest --cov --cov-context=test``) and writes an inverted index from each
+measured source file to the tests that executed it. ``select`` diffs the
+index's commit against the working tree and lists the tests that touched a
+changed file, every test in changed test files and the always-run patterns.
+It falls back to the full suite whenever the index cannot be trusted: it is
+missing, too old, built on an unknown commit, or the change touches test
+configuration, module-level code or any other file the index cannot
+attribute to tests.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import closing
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+FORMAT = "test-impact/1"
+SELECTION_FORMAT = "test-impact-selection/1"
+DEFAULT_MAX_AGE_DAYS = 14.0
+# Changes to these affect how every test runs, so they force the full suite.
+FULL_SUITE_TRIGGERS: Sequence[str] = (
+    "conftest.py",
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "tox.ini",
+    "pytest.ini",
+    "requirements*.txt",
+)
+TEST_FILE_PATTERNS: Sequence[str] = ("test_*.py", "*_test.py")
+
+
+class ImpactIndexError(ValueError):
+    """Raised when a coverage file or index cannot be used."""
+
+
+def _test_from_context(context: str) -> Optional[str]:
+    # pytest-cov names contexts "<nodeid>|setup", "<nodeid>|run", ...
+    if not context:
+        return None
+    return context.rsplit("|", 1)[0] if "|" in context else context
+
+
+def _relative(path: str, root: Path) -> Optional[str]:
+    try:
+        return Path(path).resolve().relative_to(root).as_posix()
+    except ValueError:
+        return None
+
+
+def _delta_encode(values: Sequence[int]) -> List[int]:
+    previous = 0
+    encoded = []
+    for value in values:
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+
+def _delta_decode(values: Iterable[int]) -> List[int]:
+    total = 0
+    decoded = []
+    for value in values:
+        total += value
+        decoded.append(total)
+    return decoded
+
+
+class ImpactIndex:
+    """Source file to test postings over an interned test table."""
+
+    def __init__(
+        self,
+        tests: List[str],
+        files: Dict[str, List[int]],
+        import_only: Set[str],
+        commit: str = "",
+        created_at: float = 0.0,
+    ):
+        self.tests = tests
+        self.files = files
+        self.import_only = import_only
+        self.commit = commit
+        self.created_at = created_at
+
+    def tests_for(self, path: str) -> List[str]:
+        return [self.tests[index] for index in self.files.get(path, ())]
+
+    def to_payload(self) -> Dict[str, object]:
+        # Postings are delta encoded so dense lists stay small as JSON.
+        return {
+            "format": FORMAT,
+            "commit": self.commit,
+            "created_at": self.created_at,
+            "tests": self.tests,
+            "files": {
+                path: _delta_encode(postings)
+                for path, postings in sorted(self.files.items())
+            },
+            "import_only": sorted(self.import_only),
+        }
+
+    @classmethod
+    def from_payload(cls, payload: object) -> "ImpactIndex":
+        if not isinstance(payload, dict) or payload.get("format") != FORMAT:
+            raise ImpactIndexError(f"index is not in {FORMAT} format")
+        tests = [str(test) for test in payload.get("tests", [])]
+        files = {
+            str(path): _delta_decode(postings)
+            for path, postings in dict(payload.get("files", {})).items()
+        }
+        for path, postings in files.items():
+            if postings and not 0 <= postings[-1] < len(tests):
+                raise ImpactIndexError(f"postings for {path} point past the tests")
+        return cls(
+            tests,
+            files,
+            {str(path) for path in payload.get("import_only", [])},
+            str(payload.get("commit", "")),
+            float(payload.get("created_at", 0.0)),
+        )
+
+
+def build_index(
+    coverage_file: Path, root: Path, commit: str = "", created_at: float = 0.0
+) -> ImpactIndex:
+    """Build an index from a coverage.py SQLite data file."""
+    if not coverage_file.exists():
+        raise ImpactIndexError(f"{coverage_file} not found")
+    root = root.resolve()
+    with closing(sqlite3.connect(f"file:{coverage_file}?mode=ro", uri=True)) as db:
+        try:
+            paths = dict(db.execute("SELECT id, path FROM file"))
+            contexts = dict(db.execute("SELECT id, context FROM context"))
+            pairs = db.execute("""
+                SELECT file_id, context_id FROM line_bits
+                UNION
+                SELECT DISTINCT file_id, context_id FROM arc
+                """).fetchall()
+        except sqlite3.Error as exc:
+            raise ImpactIndexError(f"{coverage_file}: {exc}") from None
+
+    test_names = {
+        context_id: _test_from_context(context)
+        for context_id, context in contexts.items()
+    }
+    covered: Dict[str, Set[str]] = {}
+    for file_id, context_id in pairs:
+        path = _relative(paths[file_id], root)
+        if path is None:
+            continue
+        tests = covered.setdefault(path, set())
+        test = test_names.get(context_id)
+        if test:
+            tests.add(test)
+    if not any(covered.values()):
+        raise ImpactIndexError(
+            f"{coverage_file} has no per-test contexts; record it with "
+            "--cov-context=test"
+        )
+
+    table = sorted(set().union(*covered.values()))
+    positions = {test: index for index, test in enumerate(table)}
+    files = {
+        path: sorted(positions[test] for test in tests)
+        for path, tests in covered.items()
+        if tests
+    }
+    import_only = {path for path, tests in covered.items() if not tests}
+    return ImpactIndex(table, files, import_only, commit, created_at)
+
+
+def load_index(path: Path) -> ImpactIndex:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as exc:
+        raise ImpactIndexError(f"{path} is not valid JSON: {exc}") from None
+    return ImpactIndex.from_payload(payload)
+
+
+def _matches(path: str, patterns: Iterable[str]) -> bool:
+    name = PurePosixPath(path).name
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def select_tests(
+    index: ImpactIndex,
+    changed: Iterable[str],
+    always: Sequence[str] = (),
+) -> Dict[str, object]:
+    """Return a selection payload for the pytest impact plugin."""
+    tests: Set[str] = set()
+    test_files: Set[str] = set()
+    for path in changed:
+        if _matches(path, FULL_SUITE_TRIGGERS):
+            return full_selection(f"{path} changed")
+        if path in index.import_only:
+            return full_selection(f"module-level code in {path} changed")
+        if _matches(path, TEST_FILE_PATTERNS):
+            test_files.add(path)
+        elif path not in index.files:
+            # New modules, data files and build scripts have no postings, so
+            # the index cannot tell which tests they affect.
+            return full_selection(f"{path} is not in the impact index")
+        tests.update(index.tests_for(path))
+    for test in index.tests:
+        if any(fnmatch.fnmatchcase(test, pattern) for pattern in always):
+            tests.add(test)
+    reason = f"{len(tests)} affected test(s), {len(test_files)} changed test file(s)"
+    return {
+        "format": SELECTION_FORMAT,
+        "full": False,
+        "reason": reason,
+        "commit": index.commit,
+        "tests": sorted(tests),
+        "files": sorted(test_files),
+        "always": list(always),
+    }
+
+
+def full_selection(reason: str) -> Dict[str, object]:
+    return {"format": SELECTION_FORMAT, "full": True, "reason": reason}
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", *args], check=True, capture_output=True, text=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout
+
+
+def changed_files(since: str) -> Optional[List[str]]:
+    """Files differing between ``since`` and the working tree, or None."""
+    if _git("cat-file", "-e", f"{since}^{{commit}}") is None:
+        return None
+    output = _git("diff", "--name-only", "--no-renames", since)
+    if output is None:
+        return None
+    return [line for line in output.splitlines() if line]
+
+
+def _build_command(args: argparse.Namespace) -> int:
+    commit = args.commit or (_git("rev-parse", "HEAD") or "").strip()
+    index = build_index(args.coverage_file, args.root, commit, time.time())
+    args.output.write_text(
+        json.dumps(index.to_payload(), separators=(",", ":")), encoding="utf-8"
+    )
+    print(
+        f"Indexed {len(index.tests)} test(s) over {len(index.files)} file(s) "
+        f"at {commit or 'unknown commit'}"
+    )
+    return 0
+
+
+def _choose(args: argparse.Namespace) -> Dict[str, object]:
+    if not args.index.exists():
+        return full_selection(f"no impact index at {args.index}")
+    try:
+        index = load_index(args.index)
+    except ImpactIndexError as exc:
+        return full_selection(str(exc))
+    age_days = (time.time() - index.created_at) / 86400
+    if age_days > args.max_age_days:
+        return full_selection(f"index is {age_days:.0f} days old")
+    if args.changed:
+        changed = _read_lines(args.changed)
+    elif index.commit:
+        changed = changed_files(index.commit)
+        if changed is None:
+            return full_selection(f"index commit {index.commit} is not available")
+    else:
+        return full_selection("index does not record its commit")
+    return select_tests(index, changed, args.always)
+
+
+def _read_lines(path: Path) -> List[str]:
+    content = sys.stdin.read() if str(path) == "-" else path.read_text("utf-8")
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+def _select_command(args: argparse.Namespace) -> int:
+    selection = _choose(args)
+    args.output.write_text(json.dumps(selection, indent=2), encoding="utf-8")
+    if selection["full"]:
+        print(f"Running the full suite: {selection['reason']}")
+    else:
+        print(f"Running impacted tests only: {selection['reason']}")
+    if args.github_output:
+        with args.github_output.open("a", encoding="utf-8") as handle:
+            handle.write(f"full_suite={'true' if selection['full'] else 'false'}\n")
+            handle.write(f"selected_count={len(selection.get('tests', []))}\n")
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Coverage-based test selection.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index a per-test coverage file.")
+    build.add_argument("coverage_file", type=Path, help="coverage.py data file.")
+    build.add_argument("--output", type=Path, required=True)
+    build.add_argument("--root", type=Path, default=Path.cwd(), help="Repository root.")
+    build.add_argument(
+        "--commit", default="", help="Commit the coverage was recorded on."
+    )
+    build.set_defaults(handler=_build_command)
+
+    select = commands.add_parser("select", help="Write the tests to run.")
+    select.add_argument("index", type=Path, help="Index written by 'build'.")
+    select.add_argument("--output", type=Path, required=True)
+    select.add_argument(
+        "--changed",
+        type=Path,
+        default=None,
+        help="File listing changed paths ('-' for stdin) instead of git diff.",
+    )
+    select.add_argument(
+        "--always",
+        action="append",
+        default=[],
+        help="Test ID glob that is always selected; repeatable.",
+    )
+    select.add_argument(
+        "--max-age-days",
+        type=float,
+        default=float(os.environ.get("TEST_IMPACT_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)),
+    )
+    select.add_argument("--github-output", type=Path, default=None)
+    select.set_defaults(handler=_select_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ImpactIndexError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Split tests into shards of similar total runtime.
+
+Shards are balanced with longest-processing-time-first bin packing over
+historical per-test durations: the slowest remaining unit always goes to the
+currently lightest shard. A plan can drive pytest-xdist groups on a single
+runner (see ``pytest_shard_plugin.py``) or independent matrix jobs, each
+running one shard.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import statistics
+import sys
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import DefaultDict, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import duration_regression
+
+FORMAT = "test-shards/1"
+GROUP_BY = ("test", "file")
+# Used for tests without any recorded duration when nothing else is known.
+FALLBACK_SECONDS = 1.0
+
+
+class ShardPlanError(ValueError):
+    """Raised when a plan file cannot be used."""
+
+
+def unit_of(test_id: str, group_by: str) -> str:
+    """Scheduling unit of a test: the test itself or its file."""
+    if group_by == "file":
+        return test_id.split("::", 1)[0]
+    return test_id
+
+
+def load_history(paths: Iterable[Path]) -> Dict[str, float]:
+    """Median duration per test over every results file given."""
+    per_test: DefaultDict[str, List[float]] = defaultdict(list)
+    for path in paths:
+        if not path.exists():
+            print(f"::warning::Duration history {path} not found.")
+            continue
+        for test, seconds in duration_regression.load_durations(path).items():
+            per_test[test].append(seconds)
+    return {test: statistics.median(values) for test, values in per_test.items()}
+
+
+class ShardPlan:
+    """Tests assigned to shards, with the estimated runtime of each shard."""
+
+    def __init__(self, shards: List[List[str]], seconds: List[float], group_by: str):
+        self.shards = shards
+        self.seconds = seconds
+        self.group_by = group_by
+        self._test_shard = {
+            test: index for index, tests in enumerate(shards) for test in tests
+        }
+        self._unit_shard = {
+            unit_of(test, group_by): index for test, index in self._test_shard.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def shard_for(self, test_id: str) -> int:
+        """Shard of ``test_id``; tests missing from the plan hash to one.
+
+        A test that is new but belongs to a planned file follows its file.
+        """
+        index = self._test_shard.get(test_id)
+        if index is None:
+            unit = unit_of(test_id, self.group_by)
+            index = self._unit_shard.get(unit)
+            if index is None:
+                index = zlib.crc32(unit.encode("utf-8")) % len(self.shards)
+        return index
+
+    def is_planned(self, test_id: str) -> bool:
+        return unit_of(test_id, self.group_by) in self._unit_shard
+
+    def to_payload(self) -> Dict[str, object]:
+        return {
+            "format": FORMAT,
+            "group_by": self.group_by,
+            "shards": [
+                {"seconds": round(seconds, 3), "tests": tests}
+                for tests, seconds in zip(self.shards, self.seconds)
+            ],
+        }
+
+    @classmethod
+    def from_payload(cls, payload: object) -> "ShardPlan":
+        if not isinstance(payload, dict) or payload.get("format") != FORMAT:
+            raise ShardPlanError(f"plan is not in {FORMAT} format")
+        group_by = payload.get("group_by", "test")
+        shards = payload.get("shards")
+        if group_by not in GROUP_BY or not isinstance(shards, list) or not shards:
+            raise ShardPlanError("plan needs a group_by mode and at least one shard")
+        tests = [[str(test) for test in shard.get("tests", [])] for shard in shards]
+        seconds = [float(shard.get("seconds", 0.0)) for shard in shards]
+        return cls(tests, seconds, group_by)
+
+
+def plan_shards(
+    tests: Sequence[str],
+    durations: Mapping[str, float],
+    shard_count: int,
+    group_by: str = "test",
+) -> ShardPlan:
+    """Balance ``tests`` over ``shard_count`` shards (LPT bin packing).
+
+    Tests without history are estimated at the median known duration. Ties
+    are broken by name so the same inputs always give the same plan.
+    """
+    if shard_count < 1:
+        raise ShardPlanError("shard count must be at least 1")
+    default = statistics.median(durations.values()) if durations else FALLBACK_SECONDS
+
+    units: Dict[str, List[str]] = {}
+    unit_seconds: Dict[str, float] = {}
+    for test in dict.fromkeys(tests):
+        unit = unit_of(test, group_by)
+        units.setdefault(unit, []).append(test)
+        unit_seconds[unit] = unit_seconds.get(unit, 0.0) + durations.get(test, default)
+
+    shards: List[List[str]] = [[] for _ in range(shard_count)]
+    seconds = [0.0] * shard_count
+    lightest = [(0.0, index) for index in range(shard_count)]
+    for unit in sorted(units, key=lambda name: (-unit_seconds[name], name)):
+        load, index = heapq.heappop(lightest)
+        shards[index].extend(units[unit])
+        seconds[index] = load + unit_seconds[unit]
+        heapq.heappush(lightest, (seconds[index], index))
+    return ShardPlan(shards, seconds, group_by)
+
+
+def load_plan(path: Path) -> ShardPlan:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as exc:
+        raise ShardPlanError(f"{path} is not valid JSON: {exc}") from None
+    return ShardPlan.from_payload(payload)
+
+
+def _read_tests(path: Path) -> List[str]:
+    content = sys.stdin.read() if str(path) == "-" else path.read_text("utf-8")
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+def _plan_command(args: argparse.Namespace) -> int:
+    durations = load_history(args.durations)
+    tests = _read_tests(args.tests) if args.tests else sorted(durations)
+    plan = plan_shards(tests, durations, args.shards, args.group_by)
+    args.output.write_text(json.dumps(plan.to_payload(), indent=2), encoding="utf-8")
+
+    for index, (shard, seconds) in enumerate(zip(plan.shards, plan.seconds)):
+        print(f"Shard {index}: {len(shard)} test(s), ~{seconds:.1f}s")
+    if args.github_output:
+        with args.github_output.open("a", encoding="utf-8") as handle:
+            handle.write(f"shard_count={len(plan)}\n")
+            handle.write(f"matrix={json.dumps(list(range(len(plan))))}\n")
+            handle.write(f"max_shard_seconds={max(plan.seconds):.1f}\n")
+    return 0
+
+
+def _select_command(args: argparse.Namespace) -> int:
+    plan = load_plan(args.plan)
+    if not 0 <= args.index < len(plan):
+        raise ShardPlanError(f"shard {args.index} is outside the plan's {len(plan)}")
+    tests = _read_tests(args.tests) if args.tests else plan.shards[args.index]
+    selected = [test for test in tests if plan.shard_for(test) == args.index]
+    if args.units:
+        selected = list(dict.fromkeys(unit_of(t, plan.group_by) for t in selected))
+    for item in selected:
+        print(item)
+    return 0
+
+
+def _record_command(args: argparse.Namespace) -> int:
+    durations = load_history([args.into]) if args.into.exists() else {}
+    recorded = load_history(args.results)
+    durations.update(recorded)
+    args.into.write_text(
+        json.dumps({"test_durations": dict(sorted(durations.items()))}),
+        encoding="utf-8",
+    )
+    print(f"Recorded {len(recorded)} duration(s); {len(durations)} known in total")
+    return 0
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Plan duration-balanced shards.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="Write a shard plan.")
+    plan.add_argument("--shards", type=int, required=True)
+    plan.add_argument(
+        "--durations",
+        type=Path,
+        action="append",
+        default=[],
+        help="Results or duration files with per-test timings; repeatable.",
+    )
+    plan.add_argument(
+        "--tests",
+        type=Path,
+        default=None,
+        help="File listing one test ID per line ('-' for stdin). Defaults to "
+        "every test with a recorded duration.",
+    )
+    plan.add_argument("--group-by", choices=GROUP_BY, default="test")
+    plan.add_argument("--output", type=Path, required=True)
+    plan.add_argument("--github-output", type=Path, default=None)
+    plan.set_defaults(handler=_plan_command)
+
+    select = commands.add_parser("select", help="Print the tests of one shard.")
+    select.add_argument("plan", type=Path)
+    select.add_argument("--index", type=int, required=True)
+    select.add_argument(
+        "--tests",
+        type=Path,
+        default=None,
+        help="Candidate test IDs, so tests missing from the plan are included.",
+    )
+    select.add_argument(
+        "--units", action="store_true", help="Print scheduling units (files)."
+    )
+    select.set_defaults(handler=_select_command)
+
+    record = commands.add_parser(
+        "record", help="Merge measured durations into a duration file."
+    )
+    record.add_argument("results", type=Path, nargs="+")
+    record.add_argument("--into", type=Path, required=True)
+    record.set_defaults(handler=_record_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ShardPlanError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Normalise the warnings raised by a test run.
+
+Warnings are compared between runs as keys of the form
+``path/to/file.py: DeprecationWarning: message``. Line numbers are left out,
+so editing a file above the code that warns does not make its warning look
+new, and so is the test that triggered it, which depends on test order.
+
+The keys come from the structured ``warnings`` list of a pytest-json-report
+file, which ``pytest_warnings_plugin`` fills with the test node ID of each
+warning. When the report has no such list, e.g. when it was rebuilt from a
+results stream after the run was killed, the "warnings summary" section of
+the pytest log is scanned instead, one bounded line at a time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, TextIO
+
+# Longer log lines are truncated; the rest of the line is skipped unread.
+MAX_LINE_LENGTH = 4096
+MAX_WARNINGS = 1000
+FIELDS = ("category", "message", "filename", "lineno", "nodeid", "when")
+
+_SUMMARY_START = re.compile(r"^=+ warnings summary")
+_LOCATION = re.compile(
+    r"^\s+(?P<filename>\S.*?):(?P<lineno>\d+): (?P<category>\w+): (?P<message>.*)$"
+)
+_COUNT_SUFFIX = re.compile(r": \d+ warnings?$")
+
+WarningRecord = Dict[str, object]
+
+
+def relative_path(filename: str, root: Optional[str] = None) -> str:
+    """``filename`` relative to ``root`` (the working directory) when inside it."""
+    root = os.path.abspath(root or os.getcwd())
+    absolute = os.path.abspath(filename)
+    if os.path.commonpath([root, absolute]) == root:
+        return os.path.relpath(absolute, root)
+    return filename
+
+
+def warning_key(warning: Mapping[str, object]) -> str:
+    message = str(warning.get("message", "")).strip().splitlines()
+    first = message[0] if message else ""
+    return f"{warning.get('filename', '')}: {warning.get('category', '')}: {first}"
+
+
+def from_report(report: Mapping[str, object]) -> Optional[List[WarningRecord]]:
+    """Structured warnings of a pytest-json-report payload, None if it has none."""
+    raw = report.get("warnings")
+    if not isinstance(raw, list):
+        return None
+    warnings = []
+    for entry in raw:
+        if isinstance(entry, dict) and entry.get("message"):
+            warning = {name: entry[name] for name in FIELDS if name in entry}
+            if warning.get("filename"):
+                warning["filename"] = relative_path(str(warning["filename"]))
+            warnings.append(warning)
+    return warnings
+
+
+def _bounded_lines(handle: TextIO) -> Iterator[str]:
+    while True:
+        line = handle.readline(MAX_LINE_LENGTH)
+        if not line:
+            return
+        if not line.endswith("\n"):
+            # Drain the rest of an overlong line without keeping it.
+            rest = line
+            while rest and not rest.endswith("\n"):
+                rest = handle.readline(MAX_LINE_LENGTH)
+        yield line.rstrip("\n")
+
+
+def scan_log(handle: TextIO) -> List[WarningRecord]:
+    """Warnings listed in the "warnings summary" section of a pytest log."""
+    warnings: List[WarningRecord] = []
+    seen = set()
+    in_summary = False
+    nodeid = ""
+    for line in _bounded_lines(handle):
+        if not in_summary:
+            in_summary = bool(_SUMMARY_START.match(line))
+            continue
+        if line.startswith("-- Docs:") or line.startswith("="):
+            break
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            nodeid = _COUNT_SUFFIX.sub("", line.strip())
+            continue
+        match = _LOCATION.match(line)
+        if not match:
+            continue
+        warning: WarningRecord = {
+            "category": match.group("category"),
+            "message": match.group("message").strip(),
+            "filename": relative_path(match.group("filename")),
+            "lineno": int(match.group("lineno")),
+        }
+        if nodeid:
+            warning["nodeid"] = nodeid
+        identity = (warning_key(warning), nodeid)
+        if identity not in seen:
+            seen.add(identity)
+            warnings.append(warning)
+            if len(warnings) >= MAX_WARNINGS:
+                print(
+                    f"::warning::Only the first {MAX_WARNINGS} warnings were read"
+                    " from the log.",
+                    file=sys.stderr,
+                )
+                break
+    return warnings
+
+
+def collect(
+    report_path: Optional[Path], log_path: Optional[Path]
+) -> List[WarningRecord]:
+    if report_path is not None and report_path.exists():
+        try:
+            report = json.loads(report_path.read_text(encoding="utf-8") or "{}")
+        except json.JSONDecodeError as exc:
+            print(f"::warning::Could not read {report_path}: {exc}", file=sys.stderr)
+        else:
+            if isinstance(report, dict):
+                warnings = from_report(report)
+                if warnings is not None:
+                    return warnings
+    if log_path is not None and log_path.exists():
+        with log_path.open("r", encoding="utf-8", errors="replace") as handle:
+            return scan_log(handle)
+    return []
+
+
+def keys(warnings: Sequence[Mapping[str, object]]) -> List[str]:
+    return sorted({warning_key(warning) for warning in warnings})
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Normalise test run warnings.")
+    parser.add_argument(
+        "report", type=Path, help="pytest-json-report file with structured warnings."
+    )
+    parser.add_argument(
+        "--log", type=Path, default=None, help="pytest output to scan as a fallback."
+    )
+    parser.add_argument("--output", type=Path, required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        warnings = collect(args.report, args.log)
+        payload = {"warnings": keys(warnings), "details": warnings}
+        args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    except OSError as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+    print(f"Found {len(payload['warnings'])} distinct warning(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Tests for cargo_results.py on recorded ``cargo test`` output."""
+
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import cargo_results  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+# libtest JSON events interleaved with cargo's stderr, as the workflow tees it.
+EVENTS = FIXTURES / "cargo_test.ndjson"
+# The same run on a stable toolchain, which prints plain text.
+TEXT = FIXTURES / "cargo_test.txt"
+
+CRASHED = "beta:src/lib.rs::tests::dereferences_null"
+
+
+def outcomes(path: Path) -> dict:
+    report = cargo_results.convert(path)
+    return {test["nodeid"]: test["outcome"] for test in report["tests"]}
+
+
+class CargoEventsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.report = cargo_results.convert(EVENTS)
+        self.tests = {test["nodeid"]: test for test in self.report["tests"]}
+
+    def test_colliding_names_stay_apart(self) -> None:
+        self.assertEqual(
+            [nodeid for nodeid in self.tests if nodeid.endswith("parses_empty_input")],
+            [
+                "alpha:src/lib.rs::tests::parses_empty_input",
+                "cli:tests/cli.rs::parses_empty_input",
+                "beta:src/lib.rs::tests::parses_empty_input",
+            ],
+        )
+
+    def test_doc_tests_are_scoped_by_crate(self) -> None:
+        doc = self.tests["alpha:doc::src/lib.rs - parse (line 12)"]
+        self.assertEqual(doc["outcome"], "passed")
+        self.assertEqual(doc["duration"], 0.2)
+
+    def test_unfinished_test_after_a_crash_is_an_error(self) -> None:
+        crashed = self.tests[CRASHED]
+        self.assertEqual(crashed["outcome"], "error")
+        self.assertEqual(crashed["longrepr"], cargo_results.UNFINISHED_REASON)
+        self.assertEqual(self.report["exitcode"], 1)
+
+    def test_failure_and_ignore_details(self) -> None:
+        failed = self.tests["alpha:src/lib.rs::tests::rejects_garbage"]
+        self.assertIn("panicked at src/lib.rs:40:9", failed["longrepr"])
+        skipped = self.tests["alpha:src/lib.rs::tests::slow"]
+        self.assertEqual(skipped["longrepr"], "needs network")
+
+    def test_summary(self) -> None:
+        self.assertEqual(
+            self.report["summary"],
+            {"total": 7, "passed": 4, "failed": 1, "skipped": 1, "error": 1},
+        )
+
+
+class CargoTextTest(unittest.TestCase):
+    def test_text_output_matches_the_events(self) -> None:
+        # Plain text only prints finished tests, so the crash leaves no trace.
+        expected = outcomes(EVENTS)
+        del expected[CRASHED]
+        self.assertEqual(outcomes(TEXT), expected)
+
+    def test_ignore_reason_is_kept(self) -> None:
+        report = cargo_results.convert(TEXT)
+        skipped = [test for test in report["tests"] if test["outcome"] == "skipped"]
+        self.assertEqual([test["longrepr"] for test in skipped], ["needs network"])
+
+    def test_written_output_is_stable(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            written = []
+            for run in range(2):
+                output = Path(directory) / f"results-{run}.json"
+                legacy = Path(directory) / f"test_data-{run}.json"
+                cargo_results.main(
+                    [str(TEXT), str(output), "--legacy-output", str(legacy)]
+                )
+                written.append((output.read_bytes(), legacy.read_bytes()))
+            self.assertEqual(written[0], written[1])
+            data = json.loads(written[0][1])
+            self.assertEqual(data["all_tests"], list(outcomes(TEXT)))
+
+
+if __name__ == "__main__":
+    unittest.main()
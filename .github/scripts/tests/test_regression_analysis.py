@@ -0,0 +1,112 @@
+"""Tests for regression_analysis.py in memory and out of core."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import regression_analysis  # noqa: E402
+import results_format  # noqa: E402
+import results_stream  # noqa: E402
+
+MIB = 1 << 20
+
+BASELINE = {
+    "passing_tests": ["a", "b", "c", "slow", "big"],
+    "failing_tests": ["d"],
+    "tests": [
+        {"nodeid": "slow", "outcome": "passed", "duration": 1.0},
+        {"nodeid": "big", "outcome": "passed", "memory": {"peak": 10 * MIB}},
+    ],
+    "test_durations": {"a": 0.5},
+    "warnings": ["old warning"],
+}
+
+
+def current_table() -> results_format.ResultsTable:
+    table = results_format.ResultsTable()
+    table.record("a", "passed", 0.5)
+    table.record("b", "failed")
+    table.record("d", "passed")
+    table.record("slow", "passed", 5.0)
+    index = table.record("big", "passed")
+    table.memory[index] = {"peak": 100 * MIB}
+    table.record("new", "skipped")
+    table.deselected = ["c"]
+    table.warnings = ["old warning", "new warning"]
+    return table
+
+
+class OutOfCoreParityTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.baseline = self.root / "baseline.json"
+        self.baseline.write_text(json.dumps(BASELINE), encoding="utf-8")
+
+    def analyse(self, current: Path, threshold: float) -> dict:
+        output = self.root / f"out-{threshold}"
+        output.mkdir()
+        with contextlib.redirect_stdout(io.StringIO()):
+            outputs = regression_analysis.analyse(
+                self.baseline,
+                current,
+                output,
+                "Baseline",
+                "Current",
+                github_output=output / "github_output",
+                out_of_core_threshold=threshold,
+            )
+        analysis = json.loads((output / "regression_analysis.json").read_text())
+        return {"outputs": outputs, "analysis": analysis}
+
+    def assert_parity(self, current: Path) -> dict:
+        in_memory = self.analyse(current, 1e9)
+        self.assertEqual(self.analyse(current, 0), in_memory)
+        return in_memory["analysis"]
+
+    def test_compact_current(self) -> None:
+        current = self.root / "current.json"
+        current.write_text(json.dumps(current_table().to_payload()), encoding="utf-8")
+        analysis = self.assert_parity(current)
+        self.assertEqual(analysis["transitions"]["Pass_to_Fail"], ["b"])
+        self.assertEqual(analysis["transitions"]["Fail_to_Pass"], ["d"])
+        self.assertEqual(analysis["transitions"]["Nonexistent_to_Skip"], ["new"])
+        self.assertEqual(analysis["transitions"]["Pass_to_Nonexistent"], [])
+        self.assertEqual(analysis["discovery_warnings"], ["new warning"])
+        self.assertEqual(
+            [item["test"] for item in analysis["duration_regressions"]], ["slow"]
+        )
+        self.assertEqual(
+            [item["test"] for item in analysis["memory_regressions"]], ["big"]
+        )
+
+    def test_results_stream_current(self) -> None:
+        current = self.root / "current.jsonl"
+        with results_stream.ResultsSink(current) as sink:
+            sink.write({"nodeid": "slow", "outcome": "failed", "duration": 0.1})
+            sink.write({"nodeid": "slow", "outcome": "passed"})
+            sink.write({"nodeid": "a", "outcome": "passed", "call": {"duration": 9}})
+        analysis = self.assert_parity(current)
+        self.assertEqual(analysis["transitions"]["Pass_to_Pass"], ["a", "slow"])
+        self.assertEqual(
+            [item["test"] for item in analysis["duration_regressions"]], ["a"]
+        )
+
+    def test_unreadable_current(self) -> None:
+        current = self.root / "current.json"
+        current.write_text('{"passing_tests": ["a"', encoding="utf-8")
+        analysis = self.assert_parity(current)
+        self.assertEqual(len(analysis["transitions"]["Pass_to_Nonexistent"]), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
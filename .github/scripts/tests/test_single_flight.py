@@ -0,0 +1,160 @@
+"""Tests for single_flight.py leases on both backends."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import single_flight  # noqa: E402
+
+KEY = "test-results-pytest-abc123"
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class LeaseProtocolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.clock = Clock()
+
+    def backends(self):
+        yield "file", single_flight.FileBackend(self.root / "leases")
+        yield "sqlite", single_flight.SQLiteBackend(self.root / "leases.db")
+
+    def flight(self, backend, owner: str) -> single_flight.SingleFlight:
+        return single_flight.SingleFlight(backend, owner, ttl=60, clock=self.clock)
+
+    def test_first_caller_leads_and_others_follow(self) -> None:
+        for name, backend in self.backends():
+            with self.subTest(backend=name):
+                leader = self.flight(backend, "a")
+                self.assertEqual(leader.try_acquire(KEY).role, single_flight.LEADER)
+                self.assertEqual(leader.try_acquire(KEY).role, single_flight.LEADER)
+                follower = self.flight(backend, "b").try_acquire(KEY)
+                self.assertEqual(follower, single_flight.Outcome("follower", "a"))
+
+    def test_stale_lease_is_taken_over(self) -> None:
+        for name, backend in self.backends():
+            with self.subTest(backend=name):
+                self.flight(backend, "a").try_acquire(KEY)
+                self.clock.now += 61
+                outcome = self.flight(backend, "b").try_acquire(KEY)
+                self.assertEqual(outcome.role, single_flight.LEADER)
+                self.assertFalse(self.flight(backend, "a").renew(KEY))
+
+    def test_renewal_keeps_the_lease(self) -> None:
+        for name, backend in self.backends():
+            with self.subTest(backend=name):
+                leader = self.flight(backend, "a")
+                leader.try_acquire(KEY)
+                self.clock.now += 50
+                self.assertTrue(leader.renew(KEY))
+                self.clock.now += 50
+                outcome = self.flight(backend, "b").try_acquire(KEY)
+                self.assertEqual(outcome.role, single_flight.FOLLOWER)
+
+    def test_followers_see_the_result(self) -> None:
+        for name, backend in self.backends():
+            with self.subTest(backend=name):
+                leader = self.flight(backend, "a")
+                leader.try_acquire(KEY)
+                self.assertTrue(leader.complete(KEY, "/results/a"))
+                outcome = self.flight(backend, "b").try_acquire(KEY)
+                self.assertEqual(
+                    outcome, single_flight.Outcome("done", "a", "/results/a")
+                )
+
+    def test_released_lease_goes_to_the_next_caller(self) -> None:
+        for name, backend in self.backends():
+            with self.subTest(backend=name):
+                leader = self.flight(backend, "a")
+                leader.try_acquire(KEY)
+                self.assertTrue(leader.release(KEY))
+                outcome = self.flight(backend, "b").try_acquire(KEY)
+                self.assertEqual(outcome.role, single_flight.LEADER)
+
+    def test_waiting_is_bounded(self) -> None:
+        backend = single_flight.FileBackend(self.root / "leases")
+        single_flight.SingleFlight(backend, "a", ttl=3600, clock=self.clock).wait(KEY)
+        follower = self.flight(backend, "b")
+        start = self.clock.now
+        outcome = follower.wait(KEY, timeout=30, poll=2, sleep=self.clock.sleep)
+        self.assertEqual(outcome, single_flight.Outcome("timeout", "a"))
+        self.assertEqual(self.clock.now - start, 30)
+        outcome = follower.wait(KEY, timeout=0, sleep=self.clock.sleep)
+        self.assertEqual(outcome.role, single_flight.FOLLOWER)
+
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.backend = f"file:{self.root / 'leases'}"
+
+    def run_main(self, command: str, owner: str, *argv: str) -> dict:
+        output = self.root / f"{owner}-output"
+        output.unlink(missing_ok=True)
+        arguments = [command, KEY, "--backend", self.backend, "--owner", owner]
+        if command == "acquire":
+            arguments += ["--github-output", str(output)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(single_flight.main(arguments + list(argv)), 0)
+        if not output.exists():
+            return {}
+        return dict(line.split("=", 1) for line in output.read_text().splitlines())
+
+    def test_published_results_are_fetched_by_followers(self) -> None:
+        self.assertEqual(self.run_main("acquire", "a")["role"], "leader")
+        self.assertEqual(
+            self.run_main("acquire", "b", "--wait-timeout", "0")["role"], "follower"
+        )
+        results = self.root / "results-a"
+        results.mkdir()
+        (results / "manifest.json").write_text("{}", encoding="utf-8")
+        self.run_main("finish", "a", "--publish", str(results))
+
+        fetched = self.root / "fetched"
+        outputs = self.run_main("acquire", "b", "--fetch-into", str(fetched))
+        self.assertEqual(outputs["role"], "done")
+        self.assertEqual((fetched / "manifest.json").read_text(), "{}")
+
+    def test_failed_leader_hands_the_key_on(self) -> None:
+        self.run_main("acquire", "a")
+        # A failed run finishes without results, which releases the key.
+        self.run_main("finish", "a")
+        self.assertEqual(self.run_main("acquire", "b")["role"], "leader")
+
+    def test_vanished_results_make_followers_run_themselves(self) -> None:
+        self.run_main("acquire", "a")
+        results = self.root / "results-a"
+        results.mkdir()
+        (results / "manifest.json").write_text("{}", encoding="utf-8")
+        self.run_main("finish", "a", "--publish", str(results))
+        for published in single_flight.results_root(self.backend).iterdir():
+            (published / "manifest.json").unlink()
+            published.rmdir()
+        fetched = self.root / "fetched"
+        outputs = self.run_main("acquire", "b", "--fetch-into", str(fetched))
+        self.assertEqual(outputs["role"], "timeout")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Tests for storybook_results_to_standard_json.py with and without streaming."""
+
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import storybook_results_to_standard_json as storybook  # noqa: E402
+
+RESULTS = {
+    "testResults": [
+        {
+            "name": "a.stories.tsx",
+            "assertionResults": [
+                {"fullName": "A renders", "status": "passed"},
+                {"fullName": "A clicks", "status": "failed"},
+            ],
+        },
+        # An object, not a list, under a nested key: the wrapper is a record.
+        {
+            "title": "wrapper",
+            "status": "failed",
+            "results": {
+                "name": "b.stories.tsx",
+                "assertionResults": [{"fullName": "B renders", "status": "passed"}],
+            },
+        },
+        {
+            "suites": [
+                {
+                    "title": "Suite",
+                    "status": "pending",
+                    "tests": {
+                        "assertionResults": [{"fullName": "C", "status": "passed"}]
+                    },
+                }
+            ]
+        },
+    ],
+    "warnings": ["slow story"],
+}
+
+
+class StreamingParityTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "results.json"
+        self.path.write_text(json.dumps(RESULTS), encoding="utf-8")
+
+    def collect(self, streaming: str) -> dict:
+        payload = storybook._load_payload(self.path, streaming)
+        return storybook._collect_tests(payload)
+
+    def test_in_memory_results(self) -> None:
+        tests = self.collect("never")
+        self.assertEqual(tests["passing_tests"], ["A renders"])
+        self.assertEqual(tests["failing_tests"], ["A clicks", "wrapper"])
+        self.assertEqual(tests["skipped_tests"], ["Suite"])
+
+    def test_streaming_keeps_objects_under_nested_keys(self) -> None:
+        self.assertEqual(self.collect("always"), self.collect("never"))
+
+    def test_tables_match(self) -> None:
+        self.assertEqual(
+            storybook.load_table(self.path, "always").to_payload(),
+            storybook.load_table(self.path, "never").to_payload(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Tests for test_impact.py selection rules."""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import test_impact  # noqa: E402
+
+TESTS = [
+    "tests/test_api.py::test_get",
+    "tests/test_api.py::test_post",
+    "tests/test_models.py::test_save",
+]
+
+
+def make_index() -> test_impact.ImpactIndex:
+    return test_impact.ImpactIndex(
+        TESTS,
+        {
+            "pkg/api.py": [0, 1],
+            "pkg/models.py": [2],
+            "tests/test_api.py": [0, 1],
+        },
+        {"pkg/constants.py"},
+        commit="abc123",
+    )
+
+
+class SelectTestsTest(unittest.TestCase):
+    def select(self, *changed: str, always=()) -> dict:
+        return test_impact.select_tests(make_index(), list(changed), always)
+
+    def test_covered_source_selects_its_tests(self) -> None:
+        selection = self.select("pkg/models.py")
+        self.assertFalse(selection["full"])
+        self.assertEqual(selection["tests"], [TESTS[2]])
+
+    def test_changed_test_files_are_selected_whole(self) -> None:
+        selection = self.select("tests/test_new.py")
+        self.assertFalse(selection["full"])
+        self.assertEqual(selection["files"], ["tests/test_new.py"])
+
+    def test_always_patterns_are_added(self) -> None:
+        selection = self.select("pkg/models.py", always=["*::test_get"])
+        self.assertEqual(selection["tests"], [TESTS[0], TESTS[2]])
+
+    def test_files_the_index_does_not_know_run_everything(self) -> None:
+        for path in ("pkg/data/schema.json", "pkg/new_module.py", "Makefile"):
+            with self.subTest(path=path):
+                selection = self.select("pkg/api.py", path)
+                self.assertTrue(selection["full"])
+                self.assertIn(path, selection["reason"])
+
+    def test_module_level_changes_run_everything(self) -> None:
+        self.assertTrue(self.select("pkg/constants.py")["full"])
+
+    def test_configuration_changes_run_everything(self) -> None:
+        self.assertTrue(self.select("tests/conftest.py")["full"])
+        self.assertTrue(self.select("requirements-dev.txt")["full"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+"""Tests for test_sharding.py plans and the pytest plugin applying them."""
+
+from __future__ import annotations
+
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SCRIPTS))
+
+import test_sharding  # noqa: E402
+
+HAS_PYTEST = importlib.util.find_spec("pytest") is not None
+
+DURATIONS = {
+    "tests/test_a.py::test_slow": 8.0,
+    "tests/test_a.py::test_fast": 1.0,
+    "tests/test_b.py::test_one": 4.0,
+    "tests/test_b.py::test_two": 3.0,
+    "tests/test_c.py::test_only": 2.0,
+}
+
+
+class PlanShardsTest(unittest.TestCase):
+    def test_longest_tests_are_spread_over_the_lightest_shards(self) -> None:
+        plan = test_sharding.plan_shards(sorted(DURATIONS), DURATIONS, 2)
+        self.assertEqual(plan.seconds, [9.0, 9.0])
+        self.assertEqual(
+            plan.shards[0], ["tests/test_a.py::test_slow", "tests/test_a.py::test_fast"]
+        )
+        planned = sorted(test for shard in plan.shards for test in shard)
+        self.assertEqual(planned, sorted(DURATIONS))
+
+    def test_same_inputs_give_the_same_plan(self) -> None:
+        tests = sorted(DURATIONS)
+        first = test_sharding.plan_shards(tests, DURATIONS, 3).to_payload()
+        again = test_sharding.plan_shards(tests[::-1], DURATIONS, 3).to_payload()
+        self.assertEqual(
+            [sorted(shard["tests"]) for shard in first["shards"]],
+            [sorted(shard["tests"]) for shard in again["shards"]],
+        )
+
+    def test_file_grouping_keeps_files_together(self) -> None:
+        plan = test_sharding.plan_shards(sorted(DURATIONS), DURATIONS, 3, "file")
+        shard_of_b = {
+            plan.shard_for("tests/test_b.py::test_one"),
+            plan.shard_for("tests/test_b.py::test_two"),
+        }
+        self.assertEqual(len(shard_of_b), 1)
+        self.assertEqual(sorted(plan.seconds), [2.0, 7.0, 9.0])
+
+    def test_unknown_tests_get_the_median_duration(self) -> None:
+        plan = test_sharding.plan_shards(["x", "y"], {"z": 5.0}, 1)
+        self.assertEqual(plan.seconds, [10.0])
+
+    def test_new_tests_follow_their_file_or_a_stable_hash(self) -> None:
+        plan = test_sharding.plan_shards(sorted(DURATIONS), DURATIONS, 3, "file")
+        self.assertEqual(
+            plan.shard_for("tests/test_b.py::test_new"),
+            plan.shard_for("tests/test_b.py::test_one"),
+        )
+        self.assertFalse(plan.is_planned("tests/test_new.py::test_new"))
+        index = plan.shard_for("tests/test_new.py::test_new")
+        self.assertIn(index, range(3))
+        again = test_sharding.ShardPlan.from_payload(plan.to_payload())
+        self.assertEqual(again.shard_for("tests/test_new.py::test_new"), index)
+
+    def test_payload_round_trip(self) -> None:
+        plan = test_sharding.plan_shards(sorted(DURATIONS), DURATIONS, 2, "file")
+        again = test_sharding.ShardPlan.from_payload(plan.to_payload())
+        self.assertEqual(again.shards, plan.shards)
+        self.assertEqual(again.group_by, "file")
+
+    def test_invalid_plans_are_rejected(self) -> None:
+        for payload in ([], {"format": "other"}, {"format": test_sharding.FORMAT}):
+            with self.subTest(payload=payload):
+                with self.assertRaises(test_sharding.ShardPlanError):
+                    test_sharding.ShardPlan.from_payload(payload)
+        with self.assertRaises(test_sharding.ShardPlanError):
+            test_sharding.plan_shards(["a"], {}, 0)
+
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.durations = self.root / "durations.json"
+        self.durations.write_text(
+            json.dumps({"test_durations": DURATIONS}), encoding="utf-8"
+        )
+
+    def run_main(self, *argv: str) -> int:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return test_sharding.main(list(argv))
+
+    def test_plan_writes_the_matrix_for_shard_jobs(self) -> None:
+        github_output = self.root / "github_output"
+        code = self.run_main(
+            "plan",
+            "--shards",
+            "3",
+            "--durations",
+            str(self.durations),
+            "--output",
+            str(self.root / "plan.json"),
+            "--github-output",
+            str(github_output),
+        )
+        self.assertEqual(code, 0)
+        outputs = dict(
+            line.split("=", 1) for line in github_output.read_text().splitlines()
+        )
+        self.assertEqual(outputs["shard_count"], "3")
+        self.assertEqual(json.loads(outputs["matrix"]), [0, 1, 2])
+        self.assertEqual(outputs["max_shard_seconds"], "8.0")
+        plan = test_sharding.load_plan(self.root / "plan.json")
+        self.assertEqual(len(plan), 3)
+
+    def test_record_merges_into_the_history(self) -> None:
+        results = self.root / "test_data.json"
+        results.write_text(
+            json.dumps({"test_durations": {"tests/test_c.py::test_only": 6.0}}),
+            encoding="utf-8",
+        )
+        self.assertEqual(
+            self.run_main("record", str(results), "--into", str(self.durations)), 0
+        )
+        history = test_sharding.load_history([self.durations])
+        self.assertEqual(history["tests/test_c.py::test_only"], 6.0)
+        self.assertEqual(history["tests/test_a.py::test_slow"], 8.0)
+
+
+@unittest.skipUnless(HAS_PYTEST, "pytest is not installed")
+class ShardPluginTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        for name in ("test_a.py", "test_b.py", "test_c.py"):
+            (self.root / name).write_text(
+                "def test_one():\n    pass\n\n\ndef test_two():\n    pass\n",
+                encoding="utf-8",
+            )
+        tests = [
+            f"{name}::{test}"
+            for name in ("test_a.py", "test_b.py")
+            for test in ("test_one", "test_two")
+        ]
+        plan = test_sharding.plan_shards(tests, {}, 2, "file")
+        self.plan = self.root / "plan.json"
+        self.plan.write_text(json.dumps(plan.to_payload()), encoding="utf-8")
+        self.expected = test_sharding.load_plan(self.plan)
+
+    def collect(self, index: str) -> list:
+        environ = dict(os.environ, TEST_SHARD_PLAN=str(self.plan))
+        environ["TEST_SHARD_INDEX"] = index
+        environ["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [str(SCRIPTS), environ.get("PYTHONPATH")])
+        )
+        completed = subprocess.run(
+            [sys.executable, "-m", "pytest", "-p", "pytest_shard_plugin"]
+            + ["--collect-only", "-q", "-p", "no:cacheprovider"],
+            cwd=self.root,
+            env=environ,
+            capture_output=True,
+            text=True,
+        )
+        return [line for line in completed.stdout.splitlines() if "::" in line]
+
+    def test_each_test_runs_in_exactly_one_shard(self) -> None:
+        shards = [self.collect("0"), self.collect("1")]
+        collected = sorted(shards[0] + shards[1])
+        self.assertEqual(len(collected), 6)
+        self.assertEqual(len(set(collected)), 6)
+        for index, tests in enumerate(shards):
+            for test in tests:
+                self.assertEqual(self.expected.shard_for(test), index)
+
+    def test_group_suffix_is_stripped_from_reports(self) -> None:
+        import pytest_shard_plugin
+
+        report = {"tests": [{"nodeid": "test_a.py::test_one@test-shard-1"}]}
+        pytest_shard_plugin.pytest_json_modifyreport(report)
+        self.assertEqual(report["tests"][0]["nodeid"], "test_a.py::test_one")
+        self.assertEqual(
+            pytest_shard_plugin.strip_group("a.py::t[x@test-shard-2]"),
+            "a.py::t[x@test-shard-2]",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+"""Tests for worker_sizing.py against fake cgroup and /proc trees."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import worker_sizing  # noqa: E402
+
+GIB = 1 << 30
+MIB = 1 << 20
+
+
+class FakeTree:
+    """A cgroup root and a /proc root in a temporary directory."""
+
+    def __init__(self, directory: Path) -> None:
+        self.root = directory / "cgroup"
+        self.proc = directory / "proc"
+        self.root.mkdir()
+        (self.proc / "self").mkdir(parents=True)
+
+    def write(self, relative: str, text: str, base: Path | None = None) -> None:
+        path = (base or self.root) / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+    def proc_file(self, relative: str, text: str) -> None:
+        self.write(relative, text, self.proc)
+
+    def meminfo(self, available: int) -> None:
+        self.proc_file(
+            "meminfo",
+            f"MemTotal:       {64 * GIB // 1024} kB\n"
+            f"MemAvailable:   {available // 1024} kB\n",
+        )
+
+
+class TreeTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tree = FakeTree(Path(directory.name))
+
+    def cpus(self, host_cpus: int = 16) -> int:
+        return worker_sizing.cpu_limit(self.tree.root, self.tree.proc, host_cpus)
+
+    def memory(self) -> int | None:
+        return worker_sizing.available_memory(self.tree.root, self.tree.proc)
+
+
+class CgroupV1Test(TreeTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tree.proc_file("self/cgroup", "4:memory:/job\n3:cpu,cpuacct:/job\n")
+        self.tree.meminfo(32 * GIB)
+
+    def test_cfs_quota_rounds_up(self) -> None:
+        self.tree.write("cpu/cpu.cfs_quota_us", "150000")
+        self.tree.write("cpu/cpu.cfs_period_us", "100000")
+        self.assertEqual(self.cpus(), 2)
+
+    def test_unlimited_quota_leaves_the_cpuset(self) -> None:
+        self.tree.write("cpu/cpu.cfs_quota_us", "-1")
+        self.tree.write("cpu/cpu.cfs_period_us", "100000")
+        self.tree.write("cpuset/cpuset.cpus", "0-3,8")
+        self.assertEqual(self.cpus(), 5)
+
+    def test_memory_limit_counts_inactive_cache_as_free(self) -> None:
+        self.tree.write("memory/memory.limit_in_bytes", str(4 * GIB))
+        self.tree.write("memory/memory.usage_in_bytes", str(3 * GIB))
+        self.tree.write("memory/memory.stat", f"total_inactive_file {GIB}\n")
+        self.assertEqual(self.memory(), 2 * GIB)
+
+    def test_unlimited_memory_falls_back_to_meminfo(self) -> None:
+        self.tree.write("memory/memory.limit_in_bytes", str(0x7FFFFFFFFFFFF000))
+        self.tree.write("memory/memory.usage_in_bytes", str(GIB))
+        self.assertEqual(self.memory(), 32 * GIB)
+
+
+class NestedCgroupV2Test(TreeTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tree.proc_file("self/cgroup", "0::/outer/inner\n")
+        self.tree.meminfo(32 * GIB)
+        (self.tree.root / "outer" / "inner").mkdir(parents=True)
+
+    def test_directories_run_from_the_process_up_to_the_root(self) -> None:
+        root = self.tree.root
+        self.assertEqual(
+            worker_sizing.cgroup_dirs(root, self.tree.proc),
+            [root / "outer" / "inner", root / "outer", root],
+        )
+
+    def test_an_ancestor_quota_applies(self) -> None:
+        self.tree.write("outer/cpu.max", "400000 100000")
+        self.tree.write("outer/inner/cpu.max", "max 100000")
+        self.tree.write("outer/inner/cpuset.cpus.effective", "0-5")
+        self.assertEqual(self.cpus(), 4)
+
+    def test_the_tightest_memory_limit_wins(self) -> None:
+        self.tree.write("outer/memory.max", str(8 * GIB))
+        self.tree.write("outer/memory.current", str(2 * GIB))
+        self.tree.write("outer/inner/memory.max", "max")
+        self.tree.write("outer/inner/memory.high", str(3 * GIB))
+        self.tree.write("outer/inner/memory.current", str(GIB))
+        self.tree.write("outer/inner/memory.stat", f"inactive_file {512 * MIB}\n")
+        self.assertEqual(self.memory(), 3 * GIB - 512 * MIB)
+
+    def test_missing_process_directory_falls_back_to_the_root(self) -> None:
+        self.tree.proc_file("self/cgroup", "0::/elsewhere\n")
+        self.tree.write("cpu.max", "200000 100000")
+        self.assertEqual(self.cpus(), 2)
+
+
+class NoCgroupTest(TreeTestCase):
+    def test_host_cpus_are_the_limit(self) -> None:
+        self.assertEqual(self.cpus(host_cpus=6), 6)
+
+    def test_meminfo_is_the_limit(self) -> None:
+        self.tree.meminfo(12 * GIB)
+        self.assertEqual(self.memory(), 12 * GIB)
+
+    def test_nothing_known_about_memory(self) -> None:
+        self.assertIsNone(self.memory())
+
+
+class ChooseWorkersTest(unittest.TestCase):
+    def test_memory_bounds_the_cpu_count(self) -> None:
+        runs = [{"workers": 8, "peak_rss": GIB, "killed": False}]
+        workers, _ = worker_sizing.choose_workers(16, 4 * GIB, runs)
+        self.assertEqual(workers, 3)
+
+    def test_halves_after_a_run_killed_with_exit_137(self) -> None:
+        runs = [{"workers": 8, "peak_rss": 100 * MIB, "killed": True}]
+        workers, reasons = worker_sizing.choose_workers(16, 64 * GIB, runs)
+        self.assertEqual(workers, 4)
+        self.assertIn("killed with 8 worker(s)", reasons[-1])
+
+    def test_never_drops_below_one(self) -> None:
+        runs = [{"workers": 1, "peak_rss": 100 * MIB, "killed": True}]
+        self.assertEqual(worker_sizing.choose_workers(16, None, runs)[0], 1)
+
+    def test_measure_records_the_kill_and_auto_halves(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            history = Path(directory) / "history.json"
+            command = [sys.executable, "-c", "import os; os.kill(os.getpid(), 9)"]
+            with contextlib.redirect_stderr(io.StringIO()):
+                returncode = worker_sizing.main(
+                    ["measure", "--history", str(history), "--workers", "6", "--"]
+                    + command
+                )
+            self.assertEqual(returncode, worker_sizing.OOM_EXIT)
+            runs = json.loads(history.read_text(encoding="utf-8"))["runs"]
+            self.assertTrue(runs[-1]["killed"])
+
+            loaded = worker_sizing.load_history(history)
+            self.assertEqual(worker_sizing.choose_workers(16, None, loaded)[0], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,14 @@
 
 from __future__ import annotations
 
+import argparse
 import json
 import sys
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import results_format
 
 NS = {"ns": "http://microsoft.com/schemas/VisualStudio/TeamTest/2010"}
 
@@ -19,55 +22,77 @@ def _safe_int(value: str | None) -> int:
         return 0
 
 
-def _collect_test_metadata(root: ET.Element) -> Dict[str, str]:
-    mapping: Dict[str, str] = {}
-    for unit_test in root.findall(".//ns:UnitTest", NS):
-        test_id = unit_test.get("id") or unit_test.get("Id")
-        if not test_id:
-            continue
-        name = unit_test.get("name") or unit_test.get("Name")
-        method = unit_test.find("ns:TestMethod", NS)
-        class_name = method.get("className") if method is not None else None
-        method_name = method.get("name") if method is not None else None
-        storage = unit_test.get("storage") or unit_test.get("Storage")
-
-        parts: List[str] = []
-        if storage:
-            parts.append(Path(storage).stem)
-        if class_name:
-            parts.append(class_name)
-        if method_name:
-            parts.append(method_name)
-        elif name:
-            parts.append(name)
-
-        if parts:
-            mapping[test_id] = "::".join(parts)
-        elif name:
-            mapping[test_id] = name
-        else:
-            mapping[test_id] = test_id
-    return mapping
-
-
-def _build_test_entry(
-    result: ET.Element, id_to_name: Dict[str, str]
-) -> Dict[str, object]:
-    test_id = result.get("testId") or result.get("testID") or ""
-    display_name = id_to_name.get(
-        test_id, result.get("testName") or test_id or "unknown"
-    )
+def _tag(name: str) -> str:
+    return "{%s}%s" % (NS["ns"], name)
+
+
+UNIT_TEST_TAG = _tag("UnitTest")
+UNIT_TEST_RESULT_TAG = _tag("UnitTestResult")
+RESULT_SUMMARY_TAG = _tag("ResultSummary")
+CAPTURED_TAGS = frozenset((UNIT_TEST_TAG, UNIT_TEST_RESULT_TAG, RESULT_SUMMARY_TAG))
+# Captured output can dwarf everything else in a TRX file and is never part
+# of the converted report, so it is discarded as soon as it is parsed.
+DISCARDED_TEXT_TAGS = frozenset(
+    _tag(name) for name in ("StdOut", "StdErr", "DebugTrace", "TextMessages")
+)
+
+
+def _test_name(unit_test: ET.Element) -> Tuple[str, str] | None:
+    test_id = unit_test.get("id") or unit_test.get("Id")
+    if not test_id:
+        return None
+    name = unit_test.get("name") or unit_test.get("Name")
+    method = unit_test.find("ns:TestMethod", NS)
+    class_name = method.get("className") if method is not None else None
+    method_name = method.get("name") if method is not None else None
+    storage = unit_test.get("storage") or unit_test.get("Storage")
+
+    parts: List[str] = []
+    if storage:
+        parts.append(Path(storage).stem)
+    if class_name:
+        parts.append(class_name)
+    if method_name:
+        parts.append(method_name)
+    elif name:
+        parts.append(name)
+
+    if parts:
+        return test_id, "::".join(parts)
+    if name:
+        return test_id, name
+    return test_id, test_id
+
+
+def _outcome_label(result: ET.Element) -> str:
     outcome = (result.get("outcome") or "unknown").lower()
 
     if outcome == "notexecuted" or outcome == "inconclusive":
-        outcome_label = "skipped"
-    elif outcome == "passed":
-        outcome_label = "passed"
-    elif outcome == "failed":
-        outcome_label = "failed"
-    else:
-        outcome_label = outcome or "unknown"
+        return "skipped"
+    if outcome == "passed":
+        return "passed"
+    if outcome == "failed":
+        return "failed"
+    return outcome or "unknown"
+
 
+def _duration(result: ET.Element) -> Optional[float]:
+    """Seconds from a TRX ``duration`` such as ``00:00:01.2345678``."""
+    value = result.get("duration")
+    if not value:
+        return None
+    days = 0
+    if "." in value.split(":", 1)[0]:
+        day_part, value = value.split(".", 1)
+        days = _safe_int(day_part)
+    try:
+        hours, minutes, seconds = value.split(":")
+        return days * 86400 + int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+
+def _longrepr(result: ET.Element) -> List[str]:
     longrepr: List[str] = []
     output = result.find("ns:Output", NS)
     if output is not None:
@@ -79,12 +104,7 @@ def _build_test_entry(
                 longrepr.append(message.strip())
             if stack:
                 longrepr.append(stack.strip())
-
-    return {
-        "nodeid": display_name,
-        "outcome": outcome_label,
-        "longrepr": longrepr,
-    }
+    return longrepr
 
 
 def _default_report() -> Dict[str, object]:
@@ -95,29 +115,94 @@ def _default_report() -> Dict[str, object]:
     }
 
 
+def _scan_trx(
+    trx_path: Path,
+) -> Tuple[Dict[str, str], List[Dict[str, object]], Dict[str, str]]:
+    """Stream the TRX file once, keeping only per-test data.
+
+    Results are recorded in document order (the order ``findall`` would have
+    returned them, including nested data-driven results) and every element is
+    detached from its parent once consumed, so memory tracks the number of
+    tests rather than the size of the file.
+    """
+    id_to_name: Dict[str, str] = {}
+    rows: List[Dict[str, object]] = []
+    counters: Dict[str, str] = {}
+
+    stack: List[ET.Element] = []
+    pending: List[int] = []
+    capturing = 0
+    summary_seen = False
+
+    for event, elem in ET.iterparse(str(trx_path), events=("start", "end")):
+        if event == "start":
+            if elem.tag in CAPTURED_TAGS:
+                capturing += 1
+                if elem.tag == UNIT_TEST_RESULT_TAG:
+                    pending.append(len(rows))
+                    rows.append({})
+            stack.append(elem)
+            continue
+
+        stack.pop()
+
+        if elem.tag in CAPTURED_TAGS:
+            capturing -= 1
+            if elem.tag == UNIT_TEST_RESULT_TAG:
+                rows[pending.pop()] = {
+                    "testId": elem.get("testId") or elem.get("testID") or "",
+                    "testName": elem.get("testName"),
+                    "outcome": _outcome_label(elem),
+                    "duration": _duration(elem),
+                    "longrepr": _longrepr(elem),
+                }
+            elif elem.tag == UNIT_TEST_TAG:
+                mapped = _test_name(elem)
+                if mapped is not None:
+                    id_to_name[mapped[0]] = mapped[1]
+            elif len(stack) == 1 and not summary_seen:
+                summary_seen = True
+                found = elem.find("ns:Counters", NS)
+                if found is not None:
+                    counters = dict(found.attrib)
+        elif capturing:
+            # Still needed by the enclosing result/definition lookup.
+            if elem.tag in DISCARDED_TEXT_TAGS:
+                elem.clear()
+            continue
+
+        if stack:
+            stack[-1].remove(elem)
+        elem.clear()
+
+    return id_to_name, rows, counters
+
+
 def convert_trx(trx_path: Path) -> Dict[str, object]:
     if not trx_path.exists():
         return _default_report()
 
     try:
-        tree = ET.parse(trx_path)
+        id_to_name, rows, counters = _scan_trx(trx_path)
     except ET.ParseError:
         return _default_report()
 
-    root = tree.getroot()
-    summary = root.find("ns:ResultSummary", NS)
-    counters = summary.find("ns:Counters", NS) if summary is not None else None
-
-    total = _safe_int(counters.get("total")) if counters is not None else 0
-    passed = _safe_int(counters.get("passed")) if counters is not None else 0
-    failed = _safe_int(counters.get("failed")) if counters is not None else 0
-    skipped = _safe_int(counters.get("notExecuted")) if counters is not None else 0
+    total = _safe_int(counters.get("total"))
+    passed = _safe_int(counters.get("passed"))
+    failed = _safe_int(counters.get("failed"))
+    skipped = _safe_int(counters.get("notExecuted"))
 
-    id_to_name = _collect_test_metadata(root)
-    tests = [
-        _build_test_entry(result, id_to_name)
-        for result in root.findall(".//ns:UnitTestResult", NS)
-    ]
+    tests = []
+    for row in rows:
+        test_id = row["testId"]
+        test = {
+            "nodeid": id_to_name.get(test_id, row["testName"] or test_id or "unknown"),
+            "outcome": row["outcome"],
+            "longrepr": row["longrepr"],
+        }
+        if row["duration"] is not None:
+            test["duration"] = row["duration"]
+        tests.append(test)
 
     exitcode = 0 if failed == 0 else 1
 
@@ -133,17 +218,39 @@ def convert_trx(trx_path: Path) -> Dict[str, object]:
     }
 
 
-def main() -> int:
-    if len(sys.argv) != 3:
-        print("Usage: trx_to_pytest_json.py <input.trx> <output.json>", file=sys.stderr)
-        return 2
+def compact_table(report: Dict[str, object]) -> results_format.ResultsTable:
+    """Compact layout of the converted report, keeping failure details."""
+    table = results_format.ResultsTable()
+    for test in report["tests"]:
+        longrepr = test["longrepr"]
+        reason = "\n".join(longrepr) if test["outcome"] != "passed" else None
+        table.record(
+            test["nodeid"], test["outcome"], test.get("duration"), reason=reason
+        )
+    return table
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", type=Path, help="Path to the .trx report.")
+    parser.add_argument("output", type=Path, help="Destination JSON file.")
+    parser.add_argument(
+        "--compact-output",
+        type=Path,
+        default=None,
+        help="Optional path to also write the results in the compact layout.",
+    )
+    return parser.parse_args(argv)
+
 
-    trx_path = Path(sys.argv[1])
-    output_path = Path(sys.argv[2])
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
 
-    report = convert_trx(trx_path)
+    report = convert_trx(args.input)
 
-    output_path.write_text(json.dumps(report, indent=2))
+    args.output.write_text(json.dumps(report, indent=2))
+    if args.compact_output:
+        results_format.write(compact_table(report), args.compact_output)
     return 0
 
 
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Pick a test worker count that fits the runner's CPU and memory limits.
+
+``auto`` bounds the worker count by the CPUs the job may use (cgroup v2
+``cpu.max`` or v1 CFS quota, the cpuset and the scheduler affinity) and, once
+the per-worker peak memory of earlier runs is known, by the memory it may
+still allocate (``memory.max``/``memory.high`` or the v1 limit, less what is
+in use, and the host's ``MemAvailable``). ``measure`` runs the test command
+and records the peak RSS of its largest process in a small history file,
+typically kept with ``actions/cache``. After a run killed with exit 137 the
+next ``auto`` run uses at most half as many workers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import resource
+import signal
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+FORMAT = "worker-memory/1"
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+PROC_ROOT = Path("/proc")
+# Share of the available memory left unused, for page cache and the runner.
+HEADROOM = 0.15
+MAX_RUNS = 10
+# cgroup v1 reports "no limit" as a huge page-aligned number.
+V1_UNLIMITED = 1 << 60
+OOM_EXIT = 128 + signal.SIGKILL
+UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+class WorkerSizingError(ValueError):
+    """Raised for unusable sizes or history files."""
+
+
+def parse_size(value: str) -> int:
+    """Bytes in ``value``, e.g. ``1536M``, ``1.5G`` or ``1610612736``."""
+    match = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*([kmgt]?)i?b?\s*", value, re.I)
+    if not match:
+        raise WorkerSizingError(f"not a size: {value!r}")
+    return int(float(match.group(1)) * UNITS[match.group(2).lower()])
+
+
+def format_size(size: int) -> str:
+    return f"{size / (1 << 20):.0f} MiB"
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def _read_int(path: Path) -> Optional[int]:
+    text = _read(path)
+    try:
+        return int(text) if text is not None else None
+    except ValueError:
+        return None
+
+
+def _read_stat(path: Path, name: str) -> int:
+    for line in (_read(path) or "").splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[0] == name and fields[1].isdigit():
+            return int(fields[1])
+    return 0
+
+
+def cgroup_dirs(root: Path = CGROUP_ROOT, proc: Path = PROC_ROOT) -> List[Path]:
+    """This process's cgroup v2 directory and its ancestors, innermost first.
+
+    Limits set on any ancestor apply too. Inside a container with its own
+    cgroup namespace the path is ``/`` and only ``root`` itself is left.
+    """
+    relative = ""
+    for line in (_read(proc / "self" / "cgroup") or "").splitlines():
+        if line.startswith("0::"):
+            relative = line[3:].strip("/")
+    dirs = []
+    current = root / relative if relative else root
+    if not current.is_dir():
+        current = root
+    while True:
+        dirs.append(current)
+        if current == root:
+            return dirs
+        current = current.parent
+
+
+def count_cpuset(spec: str) -> int:
+    """Number of CPUs in a cpuset list such as ``0-3,8,10-11``."""
+    count = 0
+    for part in spec.replace(" ", "").split(","):
+        first, _, last = part.partition("-")
+        if first.isdigit() and (not last or last.isdigit()):
+            count += int(last) - int(first) + 1 if last else 1
+    return max(count, 0)
+
+
+def _host_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def cpu_limit(
+    root: Path = CGROUP_ROOT,
+    proc: Path = PROC_ROOT,
+    host_cpus: Optional[int] = None,
+) -> int:
+    """CPUs the job may use: the tightest quota, cpuset or affinity limit."""
+    limits = [host_cpus if host_cpus is not None else _host_cpus()]
+    for directory in cgroup_dirs(root, proc):
+        fields = (_read(directory / "cpu.max") or "").split()
+        if len(fields) == 2 and fields[0].isdigit() and fields[1].isdigit():
+            quota, period = int(fields[0]), int(fields[1])
+            if quota > 0 and period > 0:
+                limits.append(-(-quota // period))
+        for name in ("cpuset.cpus.effective", "cpuset.cpus"):
+            cpus = count_cpuset(_read(directory / name) or "")
+            if cpus:
+                limits.append(cpus)
+                break
+
+    quota = _read_int(root / "cpu" / "cpu.cfs_quota_us")
+    period = _read_int(root / "cpu" / "cpu.cfs_period_us")
+    if quota and period and quota > 0 and period > 0:
+        limits.append(-(-quota // period))
+    cpus = count_cpuset(_read(root / "cpuset" / "cpuset.cpus") or "")
+    if cpus:
+        limits.append(cpus)
+    return max(1, min(limits))
+
+
+def available_memory(root: Path = CGROUP_ROOT, proc: Path = PROC_ROOT) -> Optional[int]:
+    """Bytes the job may still allocate, or None when nothing says.
+
+    Inactive page cache counts as free: the kernel reclaims it before
+    killing anything.
+    """
+    candidates = []
+    for directory in cgroup_dirs(root, proc):
+        values = (_read(directory / "memory.max"), _read(directory / "memory.high"))
+        limits = [int(value) for value in values if value and value.isdigit()]
+        current = _read_int(directory / "memory.current")
+        if limits and current is not None:
+            reclaimable = _read_stat(directory / "memory.stat", "inactive_file")
+            candidates.append(min(limits) - max(current - reclaimable, 0))
+
+    v1 = root / "memory"
+    limit = _read_int(v1 / "memory.limit_in_bytes")
+    usage = _read_int(v1 / "memory.usage_in_bytes")
+    if limit is not None and limit < V1_UNLIMITED and usage is not None:
+        reclaimable = _read_stat(v1 / "memory.stat", "total_inactive_file")
+        candidates.append(limit - max(usage - reclaimable, 0))
+
+    for line in (_read(proc / "meminfo") or "").splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] == "MemAvailable:" and fields[1].isdigit():
+            candidates.append(int(fields[1]) * 1024)
+    return max(min(candidates), 0) if candidates else None
+
+
+def load_history(path: Optional[Path]) -> List[Dict[str, object]]:
+    if path is None or not path.exists():
+        return []
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        print(
+            f"::warning::Ignoring worker memory history {path}: {exc}", file=sys.stderr
+        )
+        return []
+    if not isinstance(payload, dict) or payload.get("format") != FORMAT:
+        return []
+    return [run for run in payload.get("runs", []) if isinstance(run, dict)]
+
+
+def record_run(path: Path, workers: int, peak_rss: int, killed: bool) -> None:
+    runs = load_history(path)
+    runs.append({"workers": workers, "peak_rss": peak_rss, "killed": killed})
+    payload = {"format": FORMAT, "runs": runs[-MAX_RUNS:]}
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+def choose_workers(
+    cpus: int,
+    available: Optional[int],
+    runs: Sequence[Dict[str, object]],
+    worker_memory: Optional[int] = None,
+    maximum: Optional[int] = None,
+) -> Tuple[int, List[str]]:
+    """Worker count and the reasons that limited it.
+
+    The per-worker estimate is ``worker_memory`` when given, else the largest
+    peak recorded by recent runs, which is the conservative choice while
+    memory use drifts.
+    """
+    workers = cpus
+    reasons = [f"{cpus} CPU(s) available"]
+    peaks = [int(run.get("peak_rss", 0)) for run in runs]
+    per_worker = worker_memory or max(peaks, default=0)
+    if per_worker and available is not None:
+        by_memory = max(1, int(available * (1 - HEADROOM)) // per_worker)
+        reasons.append(
+            f"{format_size(available)} free at {format_size(per_worker)} per worker"
+            f" fits {by_memory}"
+        )
+        workers = min(workers, by_memory)
+    if runs and runs[-1].get("killed"):
+        halved = max(1, int(runs[-1].get("workers", 1)) // 2)
+        reasons.append(
+            f"the last run was killed with {runs[-1].get('workers')} worker(s)"
+        )
+        workers = min(workers, halved)
+    if maximum:
+        workers = min(workers, maximum)
+    return max(1, workers), reasons
+
+
+def peak_child_rss() -> int:
+    """Peak RSS in bytes of the largest child process waited for so far."""
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _auto_command(args: argparse.Namespace) -> int:
+    cpus = cpu_limit(args.cgroup_root, args.proc_root)
+    available = available_memory(args.cgroup_root, args.proc_root)
+    workers, reasons = choose_workers(
+        cpus,
+        available,
+        load_history(args.history),
+        parse_size(args.worker_memory) if args.worker_memory else None,
+        args.max,
+    )
+    print(f"Using {workers} worker(s): {'; '.join(reasons)}", file=sys.stderr)
+    print(workers)
+    if args.github_output:
+        with args.github_output.open("a", encoding="utf-8") as handle:
+            handle.write(f"workers={workers}\n")
+    return 0
+
+
+def _measure_command(args: argparse.Namespace) -> int:
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        raise WorkerSizingError("measure needs a command to run")
+    process = subprocess.Popen(command)
+
+    def forward(signum: int, _frame: object) -> None:
+        process.send_signal(signum)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, forward)
+    returncode = process.wait()
+    if returncode < 0:
+        returncode = 128 - returncode
+
+    peak = peak_child_rss()
+    if args.threads:
+        # Workers are threads of one process sharing its peak.
+        peak //= max(args.workers, 1)
+    killed = returncode == OOM_EXIT
+    record_run(args.history, args.workers, peak, killed)
+    print(
+        f"Peak memory per worker: {format_size(peak)}"
+        + (" (killed, likely out of memory)" if killed else ""),
+        file=sys.stderr,
+    )
+    return returncode
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Size test workers to the runner.")
+    commands = parser.add_subparsers(dest="command_name", required=True)
+
+    auto = commands.add_parser("auto", help="Print the worker count to use.")
+    auto.add_argument(
+        "--history", type=Path, default=None, help="Written by 'measure'."
+    )
+    auto.add_argument(
+        "--worker-memory",
+        default="",
+        help="Known peak memory per worker, e.g. 1.5G; overrides the history.",
+    )
+    auto.add_argument("--max", type=int, default=None, help="Upper bound.")
+    auto.add_argument("--cgroup-root", type=Path, default=CGROUP_ROOT)
+    auto.add_argument("--proc-root", type=Path, default=PROC_ROOT)
+    auto.add_argument("--github-output", type=Path, default=None)
+    auto.set_defaults(handler=_auto_command)
+
+    measure = commands.add_parser(
+        "measure",
+        help="Run a command and record its peak memory per worker.",
+    )
+    measure.add_argument("--history", type=Path, required=True)
+    measure.add_argument("--workers", type=int, required=True)
+    measure.add_argument(
+        "--threads",
+        action="store_true",
+        help="Workers are threads of a single process, e.g. cargo test.",
+    )
+    measure.add_argument("command", nargs=argparse.REMAINDER)
+    measure.set_defaults(handler=_measure_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, WorkerSizingError) as exc:
+        print(f"::error::{exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
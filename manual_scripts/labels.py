@@ -1,74 +1,197 @@
 #!/usr/bin/env python3
+"""Synchronize GitHub labels from labels.json.
+
+Requests go through ``scripts/github_api.py``, the request layer of the sync
+scripts, which needs the ``requests`` package (``pip install requests``).
+``GITHUB_API_URL`` or ``--api-url`` points the script at another API root,
+such as GitHub Enterprise or a local fake server.
+"""
 
 import argparse
+import concurrent.futures
 import json
 import os
-import subprocess
 import sys
+import urllib.parse
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts")
+)
+
+from github_api import (  # noqa: E402
+    API_URL,
+    GitHubAPI,
+    GitHubError,
+    error_messages,
+    get_token,
+)
+
+LABELS_QUERY = """
+query($owner: String!, $name: String!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    id
+    labels(first: 100, after: $after) {
+      nodes { id name color description }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+# Label mutations sent in one GraphQL request.
+MUTATION_BATCH = 50
+DEFAULT_WORKERS = 4
+
+MUTATIONS = {
+    "create": ("createLabel", "CreateLabelInput"),
+    "update": ("updateLabel", "UpdateLabelInput"),
+    "delete": ("deleteLabel", "DeleteLabelInput"),
+}
+DONE = {"create": "Created", "update": "Updated", "delete": "Deleted"}
+
+
+def get_labels(client, repo):
+    """Return the repository's node ID and its labels."""
+    owner, name = repo.split("/", 1)
+    labels = []
+    after = None
+    while True:
+        data, errors = client.graphql(
+            LABELS_QUERY, {"owner": owner, "name": name, "after": after}
+        )
+        if errors:
+            raise GitHubError("; ".join(error_messages(errors).values()))
+        repository = data.get("repository")
+        if repository is None:
+            raise GitHubError(f"Repository {repo} not found")
+        labels.extend(repository["labels"]["nodes"])
+        page = repository["labels"]["pageInfo"]
+        if not page["hasNextPage"]:
+            return repository["id"], labels
+        after = page["endCursor"]
+
+
+def plan_changes(labels_to_apply, current_labels, delete_unmanaged):
+    current_label_map = {label["name"]: label for label in current_labels}
+    # GitHub label names are case-insensitive, so "Bug" is an edit of "bug".
+    folded_map = {label["name"].lower(): label for label in current_labels}
+    changes = []
+    matched = set()
+    for label_name, label_data in labels_to_apply.items():
+        existing = current_label_map.get(label_name) or folded_map.get(
+            label_name.lower()
+        )
+        change = {"name": label_name, **label_data}
+        if existing is None:
+            change["action"] = "create"
+        else:
+            matched.add(existing["name"])
+            change["id"] = existing["id"]
+            change["current_name"] = existing["name"]
+            unchanged = (
+                existing["name"] == label_name
+                and existing["color"].lower() == label_data["color"].lower()
+                and (existing.get("description") or "") == label_data["description"]
+            )
+            change["action"] = "unchanged" if unchanged else "update"
+        changes.append(change)
 
+    if delete_unmanaged:
+        for label in current_labels:
+            if label["name"] not in matched:
+                changes.append(
+                    {
+                        "action": "delete",
+                        "name": label["name"],
+                        "id": label["id"],
+                        "current_name": label["name"],
+                    }
+                )
+    return changes
+
+
+def mutation_input(change, repository_id):
+    if change["action"] == "create":
+        return {
+            "repositoryId": repository_id,
+            "name": change["name"],
+            "color": change["color"],
+            "description": change["description"],
+        }
+    if change["action"] == "update":
+        return {
+            "id": change["id"],
+            "name": change["name"],
+            "color": change["color"],
+            "description": change["description"],
+        }
+    return {"id": change["id"]}
+
+
+def apply_graphql(client, repository_id, changes):
+    """Send ``changes`` as one aliased mutation; return an error per change."""
+    fields = []
+    declarations = []
+    variables = {}
+    for index, change in enumerate(changes):
+        mutation, input_type = MUTATIONS[change["action"]]
+        declarations.append(f"$i{index}: {input_type}!")
+        fields.append(f"  l{index}: {mutation}(input: $i{index}) {{ __typename }}")
+        variables[f"i{index}"] = mutation_input(change, repository_id)
+    query = "mutation({}) {{\n{}\n}}".format(", ".join(declarations), "\n".join(fields))
+
+    # Each mutation counts against the write limits on its own.
+    data, errors = client.graphql(query, variables, write=len(changes))
+    messages = error_messages(errors)
+    if None in messages and not data:
+        # Rejected as a whole, e.g. when the API lacks the label mutations.
+        raise GitHubError(messages[None])
+    results = []
+    for index in range(len(changes)):
+        alias = f"l{index}"
+        if alias in messages:
+            results.append(messages[alias])
+        elif data.get(alias) is None:
+            results.append(messages.get(None, "no result returned"))
+        else:
+            results.append(None)
+    return results
 
-def run_gh_command(args, input_data=None):
-    result = subprocess.run(
-        ["gh"] + args, capture_output=True, text=True, input=input_data
-    )
-    if result.returncode != 0:
-        print(f"Error: {result.stderr}")
-        sys.exit(1)
-    return result.stdout
-
-
-def get_labels(repo):
-    output = run_gh_command(
-        [
-            "label",
-            "list",
-            "--repo",
-            repo,
-            "--json",
-            "name,color,description",
-            "--limit",
-            "1000",
-        ]
-    )
-    return json.loads(output)
-
-
-def create_label(repo, name, color, description):
-    args = ["label", "create", name, "--repo", repo, "--color", color, "--force"]
-    if description:
-        args.extend(["--description", description])
-
-    try:
-        run_gh_command(args)
-        print(f"Created/Updated label: {name}")
-        return True
-    except SystemExit:
-        print(f"Failed to create label: {name}")
-        return False
-
-
-def update_label(repo, name, color, description):
-    args = ["label", "edit", name, "--repo", repo, "--color", color]
-    if description is not None:
-        args.extend(["--description", description])
 
+def apply_rest(client, repo, change):
+    """Apply one change through the REST API; return an error or None."""
+    path = f"/repos/{repo}/labels"
+    if change["action"] != "create":
+        path += "/" + urllib.parse.quote(change["current_name"], safe="")
     try:
-        run_gh_command(args)
-        print(f"Updated label: {name}")
-        return True
-    except SystemExit:
-        print(f"Failed to update label: {name}")
-        return False
+        if change["action"] == "create":
+            response = client.post(path, json=mutation_input(change, None))
+        elif change["action"] == "update":
+            response = client.patch(
+                path,
+                json={
+                    "new_name": change["name"],
+                    "color": change["color"],
+                    "description": change["description"],
+                },
+            )
+        else:
+            response = client.delete(path)
+        client.check(response)
+    except (GitHubError, OSError) as e:
+        return str(e)
+    return None
 
 
-def delete_label(repo, label_name):
-    try:
-        run_gh_command(["label", "delete", label_name, "--repo", repo, "--yes"])
-        print(f"Deleted label: {label_name}")
-        return True
-    except SystemExit:
-        print(f"Failed to delete label: {label_name}")
-        return False
+def apply_changes(client, repo, repository_id, changes):
+    """Apply ``changes`` in batches; return the error, or None, for each."""
+    results = []
+    for start in range(0, len(changes), MUTATION_BATCH):
+        batch = changes[start : start + MUTATION_BATCH]
+        try:
+            results.extend(apply_graphql(client, repository_id, batch))
+        except (GitHubError, OSError):
+            results.extend(apply_rest(client, repo, change) for change in batch)
+    return results
 
 
 def load_labels_config(filepath):
@@ -107,51 +230,46 @@ def get_labels_for_repo(config, repo_name):
     return labels_to_apply
 
 
-def sync_labels_from_json(repo, config_file, delete_unmanaged=False):
-    print(f"Loading label configuration from {config_file}")
-    config = load_labels_config(config_file)
-
-    print(f"Repository: {repo}")
-    labels_to_apply = get_labels_for_repo(config, repo)
-    print(f"Found {len(labels_to_apply)} labels to apply based on configuration")
-
-    print(f"\nFetching current labels from repository...")
-    current_labels = get_labels(repo)
-    current_label_map = {label["name"]: label for label in current_labels}
-    print(f"Found {len(current_labels)} existing labels in repository")
-
-    print(f"\nSynchronizing labels...")
+def sync_labels(client, repo, labels_to_apply, delete_unmanaged=False):
+    """Synchronise one repository; return its output lines and failure count."""
+    lines = [
+        f"Repository: {repo}",
+        f"Found {len(labels_to_apply)} labels to apply based on configuration",
+    ]
+    try:
+        repository_id, current_labels = get_labels(client, repo)
+    except (GitHubError, OSError) as e:
+        lines.append(f"Failed to fetch labels: {e}")
+        return lines, 1
+    lines.append(f"Found {len(current_labels)} existing labels in repository")
+
+    changes = plan_changes(labels_to_apply, current_labels, delete_unmanaged)
+    pending = [change for change in changes if change["action"] != "unchanged"]
+    for change, error in zip(
+        pending, apply_changes(client, repo, repository_id, pending)
+    ):
+        change["error"] = error
 
     success_count = 0
-    for label_name, label_data in labels_to_apply.items():
-        if label_name in current_label_map:
-            existing = current_label_map[label_name]
-            if (
-                existing["color"] != label_data["color"]
-                or existing.get("description", "") != label_data["description"]
-            ):
-                if update_label(
-                    repo, label_name, label_data["color"], label_data["description"]
-                ):
-                    success_count += 1
-            else:
-                print(f"Label already up to date: {label_name}")
-                success_count += 1
+    failures = 0
+    for change in changes:
+        action = change["action"]
+        error = change.get("error")
+        if action == "unchanged":
+            lines.append(f"Label already up to date: {change['name']}")
+        elif error:
+            lines.append(f"Failed to {action} label: {change['name']} ({error})")
+            failures += 1
+            continue
         else:
-            if create_label(
-                repo, label_name, label_data["color"], label_data["description"]
-            ):
-                success_count += 1
-
-    if delete_unmanaged:
-        print(f"\nDeleting unmanaged labels...")
-        for label in current_labels:
-            if label["name"] not in labels_to_apply:
-                delete_label(repo, label["name"])
+            lines.append(f"{DONE[action]} label: {change['name']}")
+        if action != "delete":
+            success_count += 1
 
-    print(
-        f"\nSynchronization complete! Applied {success_count}/{len(labels_to_apply)} labels."
+    lines.append(
+        f"Synchronization complete! Applied {success_count}/{len(labels_to_apply)} labels."
     )
+    return lines, failures
 
 
 def list_repos(config_file):
@@ -205,6 +323,18 @@ def main():
     parser.add_argument(
         "--preview", "-p", action="store_true", help="Preview labels without applying"
     )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Repositories synchronized at once (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--api-url",
+        default=None,
+        help="GitHub API root (default: $GITHUB_API_URL or https://api.github.com)",
+    )
 
     args = parser.parse_args()
 
@@ -249,13 +379,36 @@ def main():
         print("Operation cancelled")
         sys.exit(0)
 
-    for i, repo in enumerate(repositories):
-        if len(repositories) > 1:
-            print(f"\n{'='*80}")
-            print(f"Processing repository {i+1}/{len(repositories)}: {repo}")
-            print(f"{'='*80}")
-        sync_labels_from_json(repo, args.config, args.delete_unmanaged)
+    token = get_token()
+    if not token:
+        print("Error: set GH_TOKEN or GITHUB_TOKEN, or log in with 'gh auth login'")
+        sys.exit(1)
 
+    plans = [(repo, get_labels_for_repo(config, repo)) for repo in repositories]
+    workers = max(1, min(args.workers, len(plans)))
+    client = GitHubAPI(token, args.api_url or API_URL, workers=workers)
+    failed_repos = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(sync_labels, client, repo, labels, args.delete_unmanaged)
+            for repo, labels in plans
+        ]
+        # Output is printed per repository, in order, as each one finishes.
+        for i, (future, (repo, _)) in enumerate(zip(futures, plans)):
+            lines, failures = future.result()
+            if len(repositories) > 1:
+                print(f"\n{'='*80}")
+                print(f"Repository {i+1}/{len(repositories)}: {repo}")
+                print(f"{'='*80}")
+            print("\n".join(lines))
+            if failures:
+                failed_repos.append(f"{repo} ({failures} failed)")
+    client.close()
+
+    client.report()
+    if failed_repos:
+        print(f"Label changes failed in: {', '.join(failed_repos)}")
+        sys.exit(1)
     if len(repositories) > 1:
         print(f"\n{'='*80}")
         print(f"Completed synchronization for all {len(repositories)} repositories!")
@@ -0,0 +1,305 @@
+"""Tests for labels.py against a local fake of the GitHub API."""
+
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+MANUAL_SCRIPTS = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(MANUAL_SCRIPTS))
+
+HAS_REQUESTS = importlib.util.find_spec("requests") is not None
+if HAS_REQUESTS:
+    import labels  # noqa: E402
+    from github_api import GitHubAPI, GitHubError  # noqa: E402
+
+TOKEN = "test-token"
+
+
+class FakeGitHub:
+    """Labels of a few repositories behind the GraphQL and REST label APIs."""
+
+    def __init__(self, repositories, graphql_mutations=True):
+        self.labels = {repo: {} for repo in repositories}
+        self.graphql_mutations = graphql_mutations
+        self.requests = []
+        self.lock = threading.Lock()
+        self.next_id = 0
+        for repo, names in repositories.items():
+            for name in names:
+                self.add(repo, name, "ededed", "")
+
+    def add(self, repo, name, color, description):
+        self.next_id += 1
+        label = {
+            "id": f"L{self.next_id}",
+            "name": name,
+            "color": color,
+            "description": description,
+        }
+        self.labels[repo][name] = label
+        return label
+
+    def find(self, label_id):
+        for repo, labels_by_name in self.labels.items():
+            for label in labels_by_name.values():
+                if label["id"] == label_id:
+                    return repo, label
+        raise KeyError(label_id)
+
+    def rename(self, repo, label, name, color, description):
+        del self.labels[repo][label["name"]]
+        label.update(name=name, color=color, description=description)
+        self.labels[repo][name] = label
+
+    def names(self, repo):
+        return sorted(self.labels[repo])
+
+    def graphql(self, query, variables):
+        if query.lstrip().startswith("query"):
+            repo = f"{variables['owner']}/{variables['name']}"
+            if repo not in self.labels:
+                error = {"path": ["repository"], "message": f"Could not resolve {repo}"}
+                return {"data": {"repository": None}, "errors": [error]}
+            nodes = sorted(self.labels[repo].values(), key=lambda label: label["id"])
+            start = int(variables["after"] or 0)
+            page = {
+                "hasNextPage": start + 100 < len(nodes),
+                "endCursor": str(start + 100),
+            }
+            repository = {
+                "id": f"R:{repo}",
+                "labels": {"nodes": nodes[start : start + 100], "pageInfo": page},
+            }
+            return {"data": {"repository": repository}}
+        if not self.graphql_mutations:
+            return {"errors": [{"message": "Field 'createLabel' doesn't exist"}]}
+
+        data, errors = {}, []
+        for alias, mutation, variable in re.findall(
+            r"(l\d+): (\w+)\(input: \$(i\d+)\)", query
+        ):
+            change = variables[variable]
+            if change.get("name") == "invalid":
+                data[alias] = None
+                errors.append({"path": [alias], "message": "Name is invalid"})
+                continue
+            if mutation == "createLabel":
+                repo = change["repositoryId"].split(":", 1)[1]
+                self.add(repo, change["name"], change["color"], change["description"])
+            elif mutation == "updateLabel":
+                repo, label = self.find(change["id"])
+                self.rename(
+                    repo, label, change["name"], change["color"], change["description"]
+                )
+            else:
+                repo, label = self.find(change["id"])
+                del self.labels[repo][label["name"]]
+            data[alias] = {"__typename": "Label"}
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+    def rest(self, method, path, body):
+        match = re.fullmatch(r"/repos/([^/]+/[^/]+)/labels(?:/(.+))?", path)
+        if not match or match.group(1) not in self.labels:
+            return 404, {"message": "Not Found"}
+        repo, name = match.group(1), urllib.parse.unquote(match.group(2) or "")
+        if method == "POST":
+            if body["name"] == "invalid":
+                return 422, {"message": "Validation Failed"}
+            self.add(repo, body["name"], body["color"], body["description"])
+            return 201, {}
+        label = self.labels[repo].get(name)
+        if label is None:
+            return 404, {"message": "Not Found"}
+        if method == "PATCH":
+            self.rename(
+                repo, label, body["new_name"], body["color"], body["description"]
+            )
+            return 200, {}
+        del self.labels[repo][name]
+        return 204, None
+
+    def serve(self, test):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def handle_request(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length)) if length else None
+                with fake.lock:
+                    fake.requests.append((self.command, self.path))
+                    if self.headers.get("Authorization") != f"token {TOKEN}":
+                        status, payload = 401, {"message": "Bad credentials"}
+                    elif self.path == "/graphql":
+                        status, payload = 200, fake.graphql(
+                            body["query"], body["variables"]
+                        )
+                    else:
+                        status, payload = fake.rest(self.command, self.path, body)
+                content = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_POST = do_PATCH = do_DELETE = handle_request
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        test.addCleanup(server.server_close)
+        test.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def labels_config(*names):
+    return {name: {"color": "00ff00", "description": f"{name} label"} for name in names}
+
+
+@unittest.skipUnless(HAS_REQUESTS, "requests is not installed")
+class LabelSyncTest(unittest.TestCase):
+    def connect(self, fake):
+        client = GitHubAPI(TOKEN, fake.serve(self), cache_dir=None)
+        self.addCleanup(client.close)
+        return client
+
+    def graphql_requests(self, fake):
+        return [request for request in fake.requests if request[1] == "/graphql"]
+
+    def test_get_labels_follows_pages(self):
+        fake = FakeGitHub({"o/big": [f"label-{index}" for index in range(130)]})
+        repository_id, current = labels.get_labels(self.connect(fake), "o/big")
+        self.assertEqual(repository_id, "R:o/big")
+        self.assertEqual(len(current), 130)
+        self.assertEqual(len(fake.requests), 2)
+
+    def test_missing_repository_raises(self):
+        client = self.connect(FakeGitHub({}))
+        with self.assertRaises(GitHubError):
+            labels.get_labels(client, "o/missing")
+
+    def test_plan_changes(self):
+        current = [
+            {"id": "1", "name": "bug", "color": "00FF00", "description": "bug label"},
+            {"id": "2", "name": "docs", "color": "00ff00", "description": "docs label"},
+            {"id": "3", "name": "stale", "color": "ffffff", "description": ""},
+        ]
+        config = labels_config("Bug", "docs", "new")
+        changes = labels.plan_changes(config, current, delete_unmanaged=True)
+        actions = {change["name"]: change["action"] for change in changes}
+        self.assertEqual(
+            actions,
+            {"Bug": "update", "docs": "unchanged", "new": "create", "stale": "delete"},
+        )
+        # A case-only rename edits the existing label instead of adding one.
+        rename = changes[0]
+        self.assertEqual((rename["id"], rename["current_name"]), ("1", "bug"))
+        kept = labels.plan_changes(config, current, delete_unmanaged=False)
+        self.assertNotIn("delete", [change["action"] for change in kept])
+
+    def test_changes_are_batched_with_errors_per_alias(self):
+        fake = FakeGitHub({"o/a": ["bug", "old"]})
+        client = self.connect(fake)
+        repository_id, current = labels.get_labels(client, "o/a")
+        config = labels_config("Bug", "invalid", *[f"new-{i}" for i in range(60)])
+        changes = labels.plan_changes(config, current, delete_unmanaged=True)
+        fake.requests.clear()
+
+        results = labels.apply_changes(client, "o/a", repository_id, changes)
+        self.assertEqual(len(self.graphql_requests(fake)), 2)
+        errors = {
+            change["name"]: error
+            for change, error in zip(changes, results)
+            if error is not None
+        }
+        self.assertEqual(errors, {"invalid": "Name is invalid"})
+        self.assertIn("Bug", fake.names("o/a"))
+        self.assertNotIn("old", fake.names("o/a"))
+        self.assertEqual(len(fake.names("o/a")), 61)
+
+    def test_rest_fallback_when_mutations_are_unavailable(self):
+        fake = FakeGitHub({"o/a": ["bug", "old"]}, graphql_mutations=False)
+        client = self.connect(fake)
+        repository_id, current = labels.get_labels(client, "o/a")
+        changes = labels.plan_changes(
+            labels_config("Bug", "invalid", "new"), current, delete_unmanaged=True
+        )
+        fake.requests.clear()
+
+        results = labels.apply_changes(client, "o/a", repository_id, changes)
+        self.assertEqual(
+            fake.requests[1:],
+            [
+                ("PATCH", "/repos/o/a/labels/bug"),
+                ("POST", "/repos/o/a/labels"),
+                ("POST", "/repos/o/a/labels"),
+                ("DELETE", "/repos/o/a/labels/old"),
+            ],
+        )
+        self.assertEqual(
+            [error is None for error in results], [True, False, True, True]
+        )
+        self.assertIn("422", results[1])
+        self.assertEqual(fake.names("o/a"), ["Bug", "new"])
+
+
+@unittest.skipUnless(HAS_REQUESTS, "requests is not installed")
+class CommandLineTest(unittest.TestCase):
+    def test_one_failing_repository_does_not_stop_the_others(self):
+        fake = FakeGitHub({"o/a": ["bug"], "o/c": []})
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config = Path(directory.name) / "labels.json"
+        config.write_text(
+            json.dumps(
+                {
+                    "repositories": {"o/a": ["base"], "o/b": ["base"], "o/c": ["base"]},
+                    "labels": {
+                        "base": {
+                            "type": {"color": "#00ff00", "labels": {"Bug": "A bug"}}
+                        }
+                    },
+                }
+            ),
+            encoding="utf-8",
+        )
+        environ = dict(
+            os.environ,
+            GITHUB_API_URL=fake.serve(self),
+            GH_TOKEN=TOKEN,
+            GITHUB_API_CACHE="",
+        )
+        completed = subprocess.run(
+            [
+                sys.executable,
+                str(MANUAL_SCRIPTS / "labels.py"),
+                "--config",
+                str(config),
+            ],
+            input="yes\n",
+            env=environ,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(completed.returncode, 1, completed.stderr)
+        self.assertIn("Label changes failed in: o/b (1 failed)", completed.stdout)
+        self.assertEqual(completed.stdout.count("Applied 1/1 labels."), 2)
+        self.assertEqual(fake.names("o/a"), ["Bug"])
+        self.assertEqual(fake.names("o/c"), ["Bug"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,410 @@
+"""Shared GitHub REST layer for the sync scripts.
+
+All requests of a run go through one ``requests.Session``. GET responses are
+cached on disk with their ETag or Last-Modified and revalidated with a
+conditional request, so an unchanged resource comes back as 304 Not Modified,
+which does not count against the primary rate limit.
+
+A scheduler shared by every worker thread paces the requests:
+
+- token buckets keep to GitHub's secondary limits: points per minute, where a
+  GET costs 1 and a write 5, and content-creating requests per minute and
+  per hour. A GraphQL request carrying several mutations costs as many
+  writes;
+- once little of the primary quota is left, the remaining requests are spread
+  over the time until it resets;
+- a Retry-After, exhausted-quota or secondary-limit response pauses every
+  worker until it expires, and the request is then retried.
+
+``GitHubAPI.graphql`` sends GraphQL requests through the same session and
+scheduler. ``GitHubAPI.report`` prints how many requests were sent, how many
+were answered from the cache and how long workers waited.
+
+The sync scripts and the manual scripts share this layer. Environment:
+``GH_TOKEN``, ``GITHUB_TOKEN`` or ``PAT_TOKEN`` for the token, falling back to
+``gh auth token``; ``GITHUB_API_URL``, which may be an ``http://`` root such
+as a local fake server; ``GITHUB_API_CACHE`` for the cache directory (empty
+to disable) and ``SYNC_WORKERS`` for the number of repositories synced at
+once.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+CACHE_DIR = os.path.expanduser(os.getenv("GITHUB_API_CACHE", "~/.cache/github-api"))
+WORKERS = max(1, int(os.getenv("SYNC_WORKERS", "4")))
+
+# Secondary limits documented by GitHub.
+POINTS_PER_MINUTE = 900
+READ_POINTS = 1
+WRITE_POINTS = 5
+WRITES_PER_MINUTE = 80
+WRITES_PER_HOUR = 500
+# Share of the primary quota below which requests are spread until the reset.
+PACING_THRESHOLD = 0.1
+# GitHub asks for at least a minute's pause after a secondary-limit response
+# that gives no Retry-After.
+SECONDARY_LIMIT_PAUSE = 60
+MAX_RETRIES = 5
+TIMEOUT = 30
+WRITE_METHODS = {"POST", "PATCH", "PUT", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+
+
+class GitHubError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def get_token():
+    token = os.getenv("GH_TOKEN") or os.getenv("GITHUB_TOKEN") or os.getenv("PAT_TOKEN")
+    if token:
+        return token
+    try:
+        result = subprocess.run(["gh", "auth", "token"], capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def graphql_url(api_url):
+    """GraphQL endpoint for a REST root; GitHub Enterprise uses /api/graphql."""
+    api_url = api_url.rstrip("/")
+    if api_url.endswith("/api/v3"):
+        return api_url[: -len("v3")] + "graphql"
+    return api_url + "/graphql"
+
+
+def error_messages(errors):
+    """GraphQL error messages keyed by the top-level alias they concern."""
+    messages = {}
+    for error in errors:
+        path = error.get("path") or ()
+        alias = str(path[0]) if path else None
+        message = str(error.get("message", "unknown error"))
+        messages[alias] = (
+            f"{messages[alias]}; {message}" if alias in messages else message
+        )
+    return messages
+
+
+class TokenBucket:
+    """Admits at most ``limit`` units in any ``period`` seconds."""
+
+    def __init__(self, limit, period, burst):
+        self.rate = (limit - burst) / period
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take ``amount`` units and return how long to wait before using them.
+
+        The bucket may go into debt, so concurrent callers queue up behind each
+        other instead of all waking at the same moment.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+
+class Scheduler:
+    def __init__(self):
+        self.points = TokenBucket(POINTS_PER_MINUTE, 60, burst=60)
+        self.writes = [
+            TokenBucket(WRITES_PER_MINUTE, 60, burst=5),
+            TokenBucket(WRITES_PER_HOUR, 3600, burst=400),
+        ]
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.next_slot = 0.0
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def _primary_delay(self, now):
+        if self.remaining is None or self.reset is None:
+            return 0.0
+        if self.remaining > self.limit * PACING_THRESHOLD:
+            return 0.0
+        if self.remaining <= 0:
+            return max(0.0, self.reset - now)
+        interval = max(0.0, self.reset - now) / self.remaining
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + interval
+        return slot - now
+
+    def wait(self, writes=0):
+        """Block until a read, or ``writes`` writes, may be sent.
+
+        Returns the seconds waited.
+        """
+        delay = self.points.reserve(WRITE_POINTS * writes if writes else READ_POINTS)
+        if writes:
+            delay = max([delay] + [bucket.reserve(writes) for bucket in self.writes])
+        with self.lock:
+            now = time.time()
+            delay = max(delay, self.paused_until - now, self._primary_delay(now))
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def observe(self, response):
+        headers = response.headers
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        with self.lock:
+            self.limit, self.remaining, self.reset = limit, remaining, reset
+
+    @staticmethod
+    def retry_delay(response, attempt):
+        """Seconds to pause before retrying ``response``, or None."""
+        status = response.status_code
+        if status in RETRY_STATUSES:
+            return 2**attempt
+        if status not in (403, 429):
+            return None
+        if "Retry-After" in response.headers:
+            try:
+                return float(response.headers["Retry-After"])
+            except ValueError:
+                return SECONDARY_LIMIT_PAUSE
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(response.headers.get("X-RateLimit-Reset", time.time()))
+            return max(1.0, reset - time.time())
+        if "secondary rate limit" in response.text.lower():
+            return SECONDARY_LIMIT_PAUSE * 2**attempt
+        return None
+
+
+class ResponseCache:
+    """GET bodies with their validators, one file per URL."""
+
+    def __init__(self, directory, token):
+        self.directory = directory
+        # Responses depend on who asks, so the token is part of every key.
+        self.salt = hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        key = hashlib.sha256(f"{self.salt}\n{url}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, url):
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url, response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "next": response.links.get("next", {}).get("url"),
+            "body": response.text,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(url))
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.writes = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.waits = 0
+        self.waited = 0.0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+class GitHubAPI:
+    def __init__(
+        self, token=None, api_url=API_URL, cache_dir=CACHE_DIR, workers=WORKERS
+    ):
+        token = token or get_token()
+        self.api_url = api_url.rstrip("/")
+        self.graphql_url = graphql_url(self.api_url)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            }
+        )
+        if token:
+            self.session.headers["Authorization"] = f"token {token}"
+        self.cache = ResponseCache(cache_dir, token) if cache_dir else None
+        self.scheduler = Scheduler()
+        self.stats = Stats()
+
+    def url(self, path, params=None):
+        url = path if path.startswith("http") else self.api_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(sorted(params.items()))
+        return url
+
+    def request(self, method, path, write=None, **kwargs):
+        """Send a request, waiting and retrying as the rate limits require.
+
+        ``write`` overrides whether the request counts as content-creating,
+        which otherwise follows from the method; a number counts it as that
+        many writes.
+        """
+        method = method.upper()
+        url = self.url(path)
+        if write is None:
+            write = method in WRITE_METHODS
+        writes = int(write)
+        for attempt in range(MAX_RETRIES + 1):
+            waited = self.scheduler.wait(writes)
+            if waited:
+                self.stats.add(waits=1, waited=waited)
+            response = self.session.request(method, url, timeout=TIMEOUT, **kwargs)
+            self.stats.add(requests=1, writes=int(writes > 0))
+            self.scheduler.observe(response)
+            delay = self.scheduler.retry_delay(response, attempt)
+            if delay is None or attempt == MAX_RETRIES:
+                return response
+            self.stats.add(retries=1)
+            self.scheduler.pause(delay)
+        return response
+
+    def _get(self, url):
+        """Return the decoded body of ``url`` and the next page's URL."""
+        cached = self.cache.load(url) if self.cache else None
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        elif cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        response = self.request("GET", url, headers=headers)
+        if response.status_code == 304 and cached:
+            self.stats.add(cache_hits=1)
+            return json.loads(cached["body"]), cached.get("next")
+        response.raise_for_status()
+        if self.cache:
+            self.cache.store(url, response)
+        return response.json(), response.links.get("next", {}).get("url")
+
+    def get(self, path, **params):
+        return self._get(self.url(path, params))[0]
+
+    def paginate(self, path, **params):
+        params.setdefault("per_page", 100)
+        url = self.url(path, params)
+        while url:
+            items, url = self._get(url)
+            yield from items
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    @staticmethod
+    def check(response):
+        """Return the decoded body of ``response``, or raise GitHubError."""
+        try:
+            body = response.json() if response.content else None
+        except ValueError:
+            body = None
+            if response.ok:
+                raise GitHubError(
+                    f"{response.request.method} {response.url}: response is not JSON",
+                    response.status_code,
+                )
+        if not response.ok:
+            message = body.get("message") if isinstance(body, dict) else None
+            message = message or response.text[:200]
+            raise GitHubError(
+                f"{response.request.method} {response.url}: "
+                f"HTTP {response.status_code}: {message}",
+                response.status_code,
+            )
+        return body
+
+    def graphql(self, query, variables=None, write=None):
+        """Return ``(data, errors)``; errors do not raise, data may be partial.
+
+        ``write`` is the number of mutations the request carries. By default
+        a query costs points like a GET and a mutation counts as one write.
+        """
+        if write is None:
+            write = query.lstrip().startswith("mutation")
+        response = self.request(
+            "POST",
+            self.graphql_url,
+            write=write,
+            json={"query": query, "variables": variables or {}},
+        )
+        result = self.check(response)
+        if not isinstance(result, dict):
+            raise GitHubError("GraphQL response is not an object")
+        return result.get("data") or {}, result.get("errors") or []
+
+    def close(self):
+        self.session.close()
+
+    def report(self):
+        stats = self.stats
+        reads = stats.requests - stats.writes
+        print(
+            f"\nGitHub API: {stats.requests} requests ({stats.writes} writes), "
+            f"{stats.cache_hits}/{reads} reads answered from cache, "
+            f"{stats.retries} retries, {stats.waits} requests held back for rate "
+            f"limits ({stats.waited:.1f}s in total across workers)."
+        )
+        if self.scheduler.remaining is not None:
+            print(
+                f"Primary rate limit: {self.scheduler.remaining}/"
+                f"{self.scheduler.limit} remaining."
+            )
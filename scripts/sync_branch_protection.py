@@ -1,13 +1,22 @@
-import os
-from github import Github
+import concurrent.futures
 
-TOKEN = os.getenv("GH_TOKEN")
-g = Github(TOKEN)
+from github_api import WORKERS, GitHubAPI
+
+api = GitHubAPI()
 
-SOURCE_REPO = g.get_repo("JamesonRGrieve/Workflows")
 TARGET_REPOS = [
-    "AGInfrastructure", "AGInteractive", "AGInterface", "AGInYourPC", "AGIteration",
-    "nursegpt", "nursegpt_web", "ServerFramework", "auth", "zod2gql", "dynamic-form", "ClientFramework"
+    "AGInfrastructure",
+    "AGInteractive",
+    "AGInterface",
+    "AGInYourPC",
+    "AGIteration",
+    "nursegpt",
+    "nursegpt_web",
+    "ServerFramework",
+    "auth",
+    "zod2gql",
+    "dynamic-form",
+    "ClientFramework",
 ]
 ORG = "JamesonRGrieve"
 
@@ -25,15 +34,22 @@ rules = {
     "allow_force_pushes": False,
     "allow_deletions": False,
     "required_linear_history": True,
-    "required_conversation_resolution": True
+    "required_conversation_resolution": True,
 }
 
-for repo_name in TARGET_REPOS:
-    repo = g.get_repo(f"{ORG}/{repo_name}")
+
+def sync_repo(repo_name):
     for branch in PROTECTED_BRANCHES:
-        try:
-            print(f" Protecting {branch} in {repo_name}")
-            b = repo.get_branch(branch)
-            b.edit_protection(**rules)
-        except Exception as e:
-            print(f" Error protecting {branch} in {repo_name}: {e}")
+        print(f" Protecting {branch} in {repo_name}")
+        res = api.put(
+            f"/repos/{ORG}/{repo_name}/branches/{branch}/protection", json=rules
+        )
+        if res.status_code != 200:
+            print(
+                f" Error protecting {branch} in {repo_name}: {res.status_code} {res.text}"
+            )
+
+
+with concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS) as pool:
+    list(pool.map(sync_repo, TARGET_REPOS))
+api.report()
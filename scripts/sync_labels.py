@@ -1,8 +1,10 @@
+import concurrent.futures
+
 import requests
-import os
 
-TOKEN = os.getenv("GITHUB_TOKEN")
-HEADERS = {"Authorization": f"token {TOKEN}"}
+from github_api import WORKERS, GitHubAPI
+
+api = GitHubAPI()
 
 SOURCE_REPO = "JamesonRGrieve/Workflows"
 TARGET_REPOS = [
@@ -17,24 +19,27 @@ TARGET_REPOS = [
     "JamesonRGrieve/auth",
     "JamesonRGrieve/zod2gql",
     "JamesonRGrieve/dynamic-form",
-    "JamesonRGrieve/ClientFramework"
+    "JamesonRGrieve/ClientFramework",
 ]
 
+
 def get_labels(repo):
-    url = f"https://api.github.com/repos/{repo}/labels"
-    res = requests.get(url, headers=HEADERS)
-    if res.status_code == 200:
-        return res.json()
-    print(f" Failed to fetch labels from {repo}")
-    return []
+    try:
+        return list(api.paginate(f"/repos/{repo}/labels"))
+    except requests.RequestException:
+        print(f" Failed to fetch labels from {repo}")
+        return None
+
 
 def create_or_update_label(repo, label):
-    url = f"https://api.github.com/repos/{repo}/labels"
-    res = requests.post(url, headers=HEADERS, json={
-        "name": label["name"],
-        "color": label["color"],
-        "description": label.get("description", "")
-    })
+    res = api.post(
+        f"/repos/{repo}/labels",
+        json={
+            "name": label["name"],
+            "color": label["color"],
+            "description": label.get("description", ""),
+        },
+    )
     if res.status_code == 422 and "already_exists" in str(res.text):
         print(f" Label '{label['name']}' already exists in {repo}")
     elif res.status_code != 201:
@@ -42,12 +47,24 @@ def create_or_update_label(repo, label):
     else:
         print(f" Synced label '{label['name']}' to {repo}")
 
-def sync_labels():
-    labels = get_labels(SOURCE_REPO)
-    for target_repo in TARGET_REPOS:
-        print(f"\nSyncing labels to {target_repo}")
-        for label in labels:
+
+def sync_repo(target_repo, labels):
+    print(f"\nSyncing labels to {target_repo}")
+    # Usually a cached 304, and it saves a write per label that already exists.
+    existing = {label["name"].lower() for label in get_labels(target_repo) or []}
+    for label in labels:
+        if label["name"].lower() in existing:
+            print(f" Label '{label['name']}' already exists in {target_repo}")
+        else:
             create_or_update_label(target_repo, label)
 
+
+def sync_labels():
+    labels = get_labels(SOURCE_REPO) or []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(lambda repo: sync_repo(repo, labels), TARGET_REPOS))
+    api.report()
+
+
 if __name__ == "__main__":
-    sync_labels()
\ No newline at end of file
+    sync_labels()
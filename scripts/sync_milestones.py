@@ -1,28 +1,50 @@
-import os
-from github import Github
+import concurrent.futures
 
-TOKEN = os.getenv("GH_TOKEN")
-g = Github(TOKEN)
+from github_api import WORKERS, GitHubAPI
 
-SOURCE_REPO = g.get_repo("JamesonRGrieve/Workflows")
+api = GitHubAPI()
+
+SOURCE_REPO = "JamesonRGrieve/Workflows"
 TARGET_REPOS = [
-    "AGInfrastructure", "AGInteractive", "AGInterface", "AGInYourPC", "AGIteration",
-    "nursegpt", "nursegpt_web", "ServerFramework", "auth", "zod2gql", "dynamic-form", "ClientFramework"
+    "AGInfrastructure",
+    "AGInteractive",
+    "AGInterface",
+    "AGInYourPC",
+    "AGIteration",
+    "nursegpt",
+    "nursegpt_web",
+    "ServerFramework",
+    "auth",
+    "zod2gql",
+    "dynamic-form",
+    "ClientFramework",
 ]
 ORG = "JamesonRGrieve"
 
-source_milestones = SOURCE_REPO.get_milestones()
+source_milestones = list(api.paginate(f"/repos/{SOURCE_REPO}/milestones"))
+
 
-for repo_name in TARGET_REPOS:
-    target_repo = g.get_repo(f"{ORG}/{repo_name}")
-    target_milestones = {m.title: m for m in target_repo.get_milestones(state="all")}
+def sync_repo(repo_name):
+    target_repo = f"{ORG}/{repo_name}"
+    target_milestones = {
+        m["title"]: m
+        for m in api.paginate(f"/repos/{target_repo}/milestones", state="all")
+    }
 
     for m in source_milestones:
-        if m.title not in target_milestones:
-            print(f"Creating milestone {m.title} in {repo_name}")
-            target_repo.create_milestone(
-                title=m.title,
-                state=m.state,
-                description=m.description,
-                due_on=m.due_on
+        if m["title"] not in target_milestones:
+            print(f"Creating milestone {m['title']} in {repo_name}")
+            fields = ("title", "state", "description", "due_on")
+            res = api.post(
+                f"/repos/{target_repo}/milestones",
+                json={key: m[key] for key in fields if m.get(key) is not None},
             )
+            if res.status_code != 201:
+                print(
+                    f"Failed to create milestone {m['title']} in {repo_name}: {res.status_code}"
+                )
+
+
+with concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS) as pool:
+    list(pool.map(sync_repo, TARGET_REPOS))
+api.report()
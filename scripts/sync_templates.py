@@ -1,35 +1,86 @@
-import os
-import shutil
-from github import Github
+import base64
+import concurrent.futures
+import urllib.parse
 
-TOKEN = os.getenv("GH_TOKEN")
-g = Github(TOKEN)
+import requests
 
-SOURCE_REPO = g.get_repo("JamesonRGrieve/Workflows")
+from github_api import WORKERS, GitHubAPI
+
+api = GitHubAPI()
+
+SOURCE_REPO = "JamesonRGrieve/Workflows"
 TARGET_REPOS = [
-    "AGInfrastructure", "AGInteractive", "AGInterface", "AGInYourPC", "AGIteration",
-    "nursegpt", "nursegpt_web", "ServerFramework", "auth", "zod2gql", "dynamic-form", "ClientFramework"
+    "AGInfrastructure",
+    "AGInteractive",
+    "AGInterface",
+    "AGInYourPC",
+    "AGIteration",
+    "nursegpt",
+    "nursegpt_web",
+    "ServerFramework",
+    "auth",
+    "zod2gql",
+    "dynamic-form",
+    "ClientFramework",
 ]
 ORG = "JamesonRGrieve"
 
 TEMPLATE_DIRS = [".github/ISSUE_TEMPLATE", ".github/PULL_REQUEST_TEMPLATE"]
 
-for repo_name in TARGET_REPOS:
-    target_repo = g.get_repo(f"{ORG}/{repo_name}")
-    contents = target_repo.get_contents(".github")
-    existing_files = [c.path for c in contents]
-    
+
+def contents_path(repo, path):
+    return f"/repos/{repo}/contents/{urllib.parse.quote(path)}"
+
+
+def get_templates():
+    templates = {}
     for dir_name in TEMPLATE_DIRS:
         try:
-            source_files = SOURCE_REPO.get_contents(dir_name)
-            for file in source_files:
-                print(f"\nSyncing {file.path} to {repo_name}")
-                content = file.decoded_content.decode("utf-8")
-                target_repo.create_file(
-                    path=file.path,
-                    message=f"sync: update template {file.name}",
-                    content=content,
-                    branch="main"
-                )
-        except Exception as e:
-            print(f"Skipping {dir_name} for {repo_name}: {e}")
+            for entry in api.get(contents_path(SOURCE_REPO, dir_name)):
+                if entry["type"] == "file":
+                    file = api.get(contents_path(SOURCE_REPO, entry["path"]))
+                    templates[file["path"]] = (file["name"], file["content"])
+        except requests.RequestException as e:
+            print(f"Skipping {dir_name}: {e}")
+    return templates
+
+
+def existing_files(repo):
+    files = set()
+    for dir_name in TEMPLATE_DIRS:
+        try:
+            files.update(
+                entry["path"] for entry in api.get(contents_path(repo, dir_name))
+            )
+        except requests.RequestException:
+            # The directory does not exist yet.
+            pass
+    return files
+
+
+templates = get_templates()
+
+
+def sync_repo(repo_name):
+    target_repo = f"{ORG}/{repo_name}"
+    existing = existing_files(target_repo)
+    for path, (name, content) in templates.items():
+        if path in existing:
+            continue
+        print(f"\nSyncing {path} to {repo_name}")
+        res = api.put(
+            contents_path(target_repo, path),
+            json={
+                "message": f"sync: update template {name}",
+                # The API returns the content base64-encoded with line breaks.
+                "content": base64.b64encode(base64.b64decode(content)).decode("ascii"),
+                "branch": "main",
+            },
+        )
+        if res.status_code != 201:
+            print(f"Skipping {path} for {repo_name}: {res.status_code} {res.text}")
+
+
+with concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS) as pool:
+    list(pool.map(sync_repo, TARGET_REPOS))
+api.report()
@@ -0,0 +1,192 @@
+"""Tests for github_api.py rate limiting and response caching."""
+
+import importlib.util
+import json
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+HAS_REQUESTS = importlib.util.find_spec("requests") is not None
+if HAS_REQUESTS:
+    import github_api  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None, text=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = json.dumps(body) if text is None else text
+        self.content = self.text.encode()
+        self.links = {}
+        self.ok = status_code < 400
+        self.url = ""
+        self.request = mock.Mock(method="GET")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise OSError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """Answers requests from a list of responses and records what was sent."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.sent.append((method, url, kwargs))
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@unittest.skipUnless(HAS_REQUESTS, "requests is not installed")
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(github_api.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_is_free_then_callers_queue(self):
+        bucket = github_api.TokenBucket(limit=70, period=60, burst=10)
+        self.assertEqual([bucket.reserve() for _ in range(10)], [0.0] * 10)
+        # One unit per second once the burst is spent; each caller queues.
+        self.assertEqual(bucket.reserve(), 1.0)
+        self.assertEqual(bucket.reserve(), 2.0)
+        self.assertEqual(bucket.reserve(5), 7.0)
+
+    def test_tokens_refill_up_to_the_burst(self):
+        bucket = github_api.TokenBucket(limit=70, period=60, burst=10)
+        bucket.reserve(10)
+        self.clock.now += 3600
+        self.assertEqual(bucket.reserve(10), 0.0)
+        self.assertEqual(bucket.reserve(), 1.0)
+
+
+@unittest.skipUnless(HAS_REQUESTS, "requests is not installed")
+class RetryDelayTest(unittest.TestCase):
+    def delay(self, status, headers=None, text="", attempt=0):
+        response = FakeResponse(status, headers=headers, text=text)
+        return github_api.Scheduler.retry_delay(response, attempt)
+
+    def test_server_errors_back_off_exponentially(self):
+        self.assertEqual(self.delay(502), 1)
+        self.assertEqual(self.delay(503, attempt=3), 8)
+
+    def test_retry_after_is_honoured(self):
+        self.assertEqual(self.delay(429, {"Retry-After": "12"}), 12.0)
+        self.assertEqual(
+            self.delay(403, {"Retry-After": "soon"}), github_api.SECONDARY_LIMIT_PAUSE
+        )
+
+    def test_exhausted_quota_waits_for_the_reset(self):
+        headers = {
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(time.time() + 30),
+        }
+        self.assertAlmostEqual(self.delay(403, headers), 30, delta=1)
+
+    def test_secondary_limit_without_retry_after(self):
+        text = "You have exceeded a secondary rate limit."
+        self.assertEqual(
+            self.delay(403, text=text, attempt=1),
+            github_api.SECONDARY_LIMIT_PAUSE * 2,
+        )
+
+    def test_other_responses_are_not_retried(self):
+        for status in (200, 404, 422):
+            self.assertIsNone(self.delay(status))
+        self.assertIsNone(self.delay(403, text="Resource not accessible"))
+
+
+@unittest.skipUnless(HAS_REQUESTS, "requests is not installed")
+class GitHubAPITest(unittest.TestCase):
+    def client(self, *responses, cache=True):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        client = github_api.GitHubAPI(
+            "token", "https://api.example", directory.name if cache else None
+        )
+        client.session = FakeSession(*responses)
+        return client
+
+    def test_unchanged_resources_come_from_the_cache(self):
+        client = self.client(
+            FakeResponse(200, {"name": "repo"}, {"ETag": '"v1"'}),
+            FakeResponse(304),
+        )
+        self.assertEqual(client.get("/repos/o/r"), {"name": "repo"})
+        self.assertEqual(client.get("/repos/o/r"), {"name": "repo"})
+        first, second = client.session.sent
+        self.assertEqual(first[2]["headers"], {})
+        self.assertEqual(second[2]["headers"], {"If-None-Match": '"v1"'})
+        self.assertEqual(client.stats.cache_hits, 1)
+
+    def test_changed_resources_replace_the_cache(self):
+        client = self.client(
+            FakeResponse(200, [1], {"ETag": '"v1"'}),
+            FakeResponse(200, [2], {"ETag": '"v2"'}),
+            FakeResponse(304),
+        )
+        self.assertEqual(client.get("/items"), [1])
+        self.assertEqual(client.get("/items"), [2])
+        self.assertEqual(client.get("/items"), [2])
+        self.assertEqual(client.session.sent[2][2]["headers"]["If-None-Match"], '"v2"')
+
+    def test_retries_after_a_pause(self):
+        client = self.client(
+            FakeResponse(502), FakeResponse(200, {"ok": True}), cache=False
+        )
+        with mock.patch.object(client.scheduler, "pause") as pause:
+            self.assertEqual(client.get("/rate_limit"), {"ok": True})
+        pause.assert_called_once_with(1)
+        self.assertEqual(client.stats.retries, 1)
+
+    def test_graphql_reserves_one_write_per_mutation(self):
+        client = self.client(
+            FakeResponse(200, {"data": {}}),
+            FakeResponse(200, {"data": {}}),
+            FakeResponse(200, {"data": {}}),
+            cache=False,
+        )
+        with mock.patch.object(client.scheduler, "wait", return_value=0) as wait:
+            client.graphql("query { viewer { login } }")
+            client.graphql("mutation { a: addStar }")
+            client.graphql("mutation { a: addStar b: addStar }", write=2)
+        self.assertEqual(
+            [call.args for call in wait.call_args_list], [(0,), (1,), (2,)]
+        )
+        self.assertEqual(client.stats.writes, 2)
+
+    def test_writes_take_points_and_write_tokens(self):
+        scheduler = github_api.Scheduler()
+        with mock.patch.object(github_api.time, "sleep"):
+            scheduler.wait(3)
+        self.assertAlmostEqual(
+            scheduler.points.tokens, 60 - 3 * github_api.WRITE_POINTS, delta=0.1
+        )
+        self.assertAlmostEqual(scheduler.writes[0].tokens, 5 - 3, delta=0.1)
+        self.assertAlmostEqual(scheduler.writes[1].tokens, 400 - 3, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()